@@ -34,21 +34,27 @@ double Max_servo_Angle = Max_Actuator_Angle * Actuator_reduction;
 float theta, servo_command, Alt_prev;
 int parachute = 0;
 float GyroY, AccX, AccZ, Alt;
+// Lockstep runs on the simulation's time, false runs in real time
+bool lockstep = true;
+// Binary frames are faster and also carry the GNSS, false uses text
+bool binary_frames = true;
 
 void setup() {
   Serial.begin(1000000);   
   servo.attach(10);
   servo.write(90);
-  Sim.StartSITL();
+  Sim.StartSITL(lockstep, binary_frames);
 }
 
 void loop() {
+// Waits for the simulation in lockstep
+Sim.tick();
 // Sample time
-if (micros() >= timer_run + T_Program_micros){  
-  double dt = double(micros() - timer_run);
+if (Sim.micros() >= timer_run + T_Program_micros){  
+  double dt = double(Sim.micros() - timer_run);
   // micros to seconds
   dt /= 1000000;
-  timer_run = micros();  
+  timer_run = Sim.micros();  
 
   // SinL Simulation
   Sim.getSimData(GyroY, AccX, AccZ, Alt);
@@ -74,7 +80,7 @@ if (micros() >= timer_run + T_Program_micros){
 
 
 double PID(double set_point, double inp){
-  currentTime = micros();  //get current time
+  currentTime = Sim.micros();  //get current time
   elapsedTime = (double)(currentTime - previousTime);  // compute time elapsed from previous computation
   elapsedTimeSeg = elapsedTime / 1000000;
     
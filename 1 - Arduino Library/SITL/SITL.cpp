@@ -4,12 +4,96 @@
 const unsigned int MAX_INPUT = 100;
 
 SITL::SITL(bool hello){
-
+  _lockstep = false;
+  _frame_pending = false;
+  _t_us = 0;
+  _servo = 0;
+  _parachute = 0;
+  _binary = false;
+  _seq = 0;
+  _rx_seq = 0;
+  _rx_pos = 0;
+  for (int i = 0; i < 6; i++){
+    _sensors[i] = 0;
+  }
 }
-// Starts the Simulation
-void SITL::StartSITL(){
+// Starts the Simulation, in lockstep the board runs on the simulation's time
+void SITL::StartSITL(bool lockstep, bool binary){
+  _lockstep = lockstep;
+  _binary = binary;
   delay(100);
-  Serial.println("A");
+  if (_binary){
+    byte flags = _lockstep ? 1 : 0;
+    sendFrame(SITL_HELLO, 0, &flags, 1);
+  }
+  else if (_lockstep){
+    Serial.println("L");
+  }
+  else{
+    Serial.println("A");
+  }
+}
+
+
+
+// Lockstep, acknowledges the previous sensor frame with the last command
+// and waits for the next one. Does nothing in real time.
+bool SITL::tick(){
+  if (!_lockstep){
+    return true;
+  }
+  if (_frame_pending && _binary){
+    // The COMMAND has the seq of the SENSOR frame it acknowledges
+    byte payload[5];
+    byte parachute = _parachute;
+    memcpy(payload, &_servo, 4);
+    payload[4] = parachute;
+    sendFrame(SITL_COMMAND, _rx_seq, payload, 5);
+    _frame_pending = false;
+  }
+  else if (_frame_pending){
+    Serial.print("K,");
+    Serial.print(_servo,6);
+    Serial.print(",");
+    Serial.print(_parachute);
+    Serial.print('\n');
+    _frame_pending = false;
+  }
+  if (_binary){
+    while (!readFrame()){
+    }
+    _frame_pending = true;
+    return true;
+  }
+  while (true)
+  {
+    while (Serial.available()>0)
+    {
+      if (processIncomingByte (Serial.read ()) && _strArr[0] == "S")
+      {
+        _t_us = strtoul(_strArr[1].c_str(), NULL, 10);
+        _frame_pending = true;
+        return true;
+      }
+    }
+  }
+}
+
+
+
+// Simulation time in lockstep, board time in real time
+unsigned long SITL::millis(){
+  if (_lockstep){
+    return _t_us / 1000UL;
+  }
+  return ::millis();
+}
+
+unsigned long SITL::micros(){
+  if (_lockstep){
+    return _t_us;
+  }
+  return ::micros();
 }
 
 
@@ -24,7 +108,7 @@ void SITL::process_data (const char * data) // here to process incoming serial d
 
   for (int i = 0; i  < _rxString.length(); i++) {
       //Get character and check if it's our "special" character.
-      if (_rxString.charAt(i) == ',') {
+      if (_rxString.charAt(i) == ',' && arrayIndex < 6) {
           //Clear previous values from array.
           _strArr[arrayIndex] = "";
           //Save substring into array.
@@ -39,7 +123,7 @@ void SITL::process_data (const char * data) // here to process incoming serial d
 
 
 
-void SITL::processIncomingByte (const byte inByte)
+bool SITL::processIncomingByte (const byte inByte)
   {
   static char input_line [MAX_INPUT];
   static unsigned int input_pos = 0;
@@ -55,7 +139,7 @@ void SITL::processIncomingByte (const byte inByte)
 
       // reset buffer for next time
       input_pos = 0;
-      break;
+      return true;
 
     case '\r':   // discard carriage return
       break;
@@ -67,18 +151,159 @@ void SITL::processIncomingByte (const byte inByte)
       break;
 
     }  // end of switch
+  return false;
 
   } // end of processIncomingByte
 
 
+// Binary frames
+uint16_t SITL::crc16 (const byte * data, byte len)
+{
+  // CRC16-CCITT, 0x1021 starting at 0xFFFF
+  uint16_t crc = 0xFFFF;
+  for (byte i = 0; i < len; i++){
+    crc ^= (uint16_t) data[i] << 8;
+    for (byte j = 0; j < 8; j++){
+      if (crc & 0x8000){
+        crc = (crc << 1) ^ 0x1021;
+      }
+      else{
+        crc <<= 1;
+      }
+    }
+  }
+  return crc;
+}
+
+
+
+void SITL::sendFrame (byte type, uint16_t seq, const byte * payload, byte len)
+{
+  byte frame[SITL_MAX_PAYLOAD + 9];
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = SITL_VERSION;
+  frame[3] = type;
+  frame[4] = seq & 0xFF;
+  frame[5] = seq >> 8;
+  frame[6] = len;
+  memcpy(frame + 7, payload, len);
+  uint16_t crc = crc16(frame + 2, len + 5);
+  frame[7 + len] = crc & 0xFF;
+  frame[8 + len] = crc >> 8;
+  Serial.write(frame, len + 9);
+}
+
+
+
+// Returns true when a valid frame is complete, stores the SENSOR frames
+bool SITL::processBinaryByte (const byte inByte)
+{
+  // Looks for the magic number, then the header, payload and CRC
+  if (_rx_pos == 0 && inByte != 0xA5){
+    return false;
+  }
+  if (_rx_pos == 1 && inByte != 0x5A){
+    _rx_pos = (inByte == 0xA5) ? 1 : 0;
+    return false;
+  }
+  _rx_buf[_rx_pos++] = inByte;
+  if (_rx_pos < 7){
+    return false;
+  }
+  byte len = _rx_buf[6];
+  if (len > SITL_MAX_PAYLOAD){
+    _rx_pos = 0;
+    return false;
+  }
+  if (_rx_pos < len + 9){
+    return false;
+  }
+  _rx_pos = 0;
+  uint16_t crc = _rx_buf[7 + len] | ((uint16_t) _rx_buf[8 + len] << 8);
+  if (crc != crc16(_rx_buf + 2, len + 5) || _rx_buf[2] != SITL_VERSION){
+    return false;
+  }
+  if (_rx_buf[3] == SITL_SENSOR && len == 28){
+    uint32_t t_us;
+    _rx_seq = _rx_buf[4] | ((uint16_t) _rx_buf[5] << 8);
+    memcpy(&t_us, _rx_buf + 7, 4);
+    memcpy(_sensors, _rx_buf + 11, 24);
+    _t_us = t_us;
+    return true;
+  }
+  return false;
+}
+
+
+
+// Reads the available bytes, true if a SENSOR frame arrived
+bool SITL::readFrame ()
+{
+  while (Serial.available()>0)
+  {
+    if (processBinaryByte (Serial.read ()))
+    {
+      return true;
+    }
+  }
+  return false;
+}
+
+
+
+void SITL::getSimData(float & SimGiroY, float & SimAccX, float & SimAccZ, float & SimAlt,
+                      float & SimGnssPos, float & SimGnssVel)
+{
+  if (_binary)
+  {
+    if (!_lockstep)
+    {
+      // Requests the data and waits for it, 3 ms at most
+      sendFrame(SITL_REQUEST, ++_seq, NULL, 0);
+      unsigned long timer_send = ::micros();
+      while (::micros() < timer_send+3UL*1000UL && !readFrame())
+      {
+      }
+    }
+    SimGiroY = _sensors[0];
+    SimAccX = _sensors[1];
+    SimAccZ = _sensors[2];
+    SimAlt = _sensors[3];
+    SimGnssPos = _sensors[4];
+    SimGnssVel = _sensors[5];
+    return;
+  }
+  getSimData(SimGiroY, SimAccX, SimAccZ, SimAlt);
+  SimGnssPos = 0;
+  SimGnssVel = 0;
+}
+
+
+
 void SITL::getSimData(float & SimGiroY, float & SimAccX, float & SimAccZ, float & SimAlt)
 {
+  if (_binary)
+  {
+    float gnss_pos, gnss_vel;
+    getSimData(SimGiroY, SimAccX, SimAccZ, SimAlt, gnss_pos, gnss_vel);
+    return;
+  }
+  if (_lockstep)
+  {
+    // The data came with the last frame, "S,t_us,gyro,accx,accz,alt,"
+    SimGiroY = _strArr[2].toFloat();
+    SimAccX = _strArr[3].toFloat();
+    SimAccZ = _strArr[4].toFloat();
+    SimAlt = _strArr[5].toFloat();
+    return;
+  }
 
   Serial.println("R");
 
-  unsigned long timer_send = micros();
+  unsigned long timer_send = ::micros();
 
-  while (micros() < timer_send+3UL*1000UL)
+  while (::micros() < timer_send+3UL*1000UL)
   {
     while (Serial.available()>0)
     {
@@ -99,6 +324,22 @@ void SITL::getSimData(float & SimGiroY, float & SimAccX, float & SimAccZ, float
 // Send the Servo and Parachute commands
 void SITL::sendCommand (float servo, int parachute)
 {
+  if (_lockstep)
+  {
+    // Sent with the acknowledge in tick()
+    _servo = servo;
+    _parachute = parachute;
+    return;
+  }
+  if (_binary)
+  {
+    // The COMMAND has the seq of the SENSOR frame it used
+    byte payload[5];
+    memcpy(payload, &servo, 4);
+    payload[4] = parachute;
+    sendFrame(SITL_COMMAND, _rx_seq, payload, 5);
+    return;
+  }
   Serial.print(servo,6);
   Serial.print(",");
   Serial.print(parachute);
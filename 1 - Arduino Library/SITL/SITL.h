@@ -7,6 +7,14 @@
 #include "WProgram.h"
 #endif
 
+// Binary frames, see src/simulation/sitl_protocol.py
+#define SITL_VERSION 1
+#define SITL_HELLO 0x01
+#define SITL_REQUEST 0x02
+#define SITL_SENSOR 0x03
+#define SITL_COMMAND 0x04
+#define SITL_MAX_PAYLOAD 32
+
 class SITL {
   public:
     // Constructor
@@ -15,15 +23,38 @@ class SITL {
     // Methods
     void sendCommand (float servo, int parachute);
     void getSimData (float & SimGiroY, float & SimAccX, float & SimAccZ, float & SimAlt);
-    void StartSITL();
+    // The GNSS is only sent with binary frames
+    void getSimData (float & SimGiroY, float & SimAccX, float & SimAccZ, float & SimAlt,
+                     float & SimGnssPos, float & SimGnssVel);
+    void StartSITL(bool lockstep = false, bool binary = false);
+    // Lockstep, call tick() at the beginning of loop() and use
+    // Sim.millis()/Sim.micros() instead of millis()/micros()
+    bool tick();
+    unsigned long millis();
+    unsigned long micros();
 
   private:
     String _rxString;
-    String _strArr[4];
+    String _strArr[6];
+    bool _lockstep;
+    bool _frame_pending;
+    unsigned long _t_us;
+    float _servo;
+    int _parachute;
+    bool _binary;
+    uint16_t _seq;
+    uint16_t _rx_seq;
+    float _sensors[6];
+    byte _rx_buf[SITL_MAX_PAYLOAD + 9];
+    byte _rx_pos;
 
 
     void process_data (const char * data);
-    void processIncomingByte (const byte inByte);
+    bool processIncomingByte (const byte inByte);
+    bool processBinaryByte (const byte inByte);
+    bool readFrame ();
+    void sendFrame (byte type, uint16_t seq, const byte * payload, byte len);
+    uint16_t crc16 (const byte * data, byte len);
 };
 
 
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:02:31 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import numpy as np
+from src.control import Controller, BatchController
+
+
+"""
+The BatchController gives the same outputs as one Controller per member.
+"""
+
+
+DEG2RAD = np.pi / 180
+
+
+def make_configurations(n, rng):
+    configurations = []
+    for i in range(n):
+        conf_controller = [bool(i % 2), bool((i//2) % 2), "Step [º]",
+                           rng.uniform(0.1, 2.), rng.uniform(0., 1.),
+                           rng.uniform(0., 0.5), rng.uniform(0.5, 2.),
+                           rng.uniform(0., 0.2), rng.uniform(5., 40.)]
+        actuator_reduction = rng.uniform(1., 5.)
+        tvc_max = rng.uniform(2., 10.) * DEG2RAD
+        invert_gains = bool((i//4) % 2)
+        configurations.append((conf_controller, actuator_reduction, tvc_max,
+                               invert_gains))
+    return configurations
+
+
+def test_same_as_controller():
+    rng = np.random.default_rng(0)
+    n = 16
+    configurations = make_configurations(n, rng)
+    controllers = []
+    for configuration in configurations:
+        controller = Controller()
+        controller.setup_controller(*configuration)
+        controllers.append(controller)
+    batch = BatchController(n)
+    # One list per value of the configuration, the input type is shared
+    conf_columns = [[c[0][j] for c in configurations] for j in range(9)]
+    conf_columns[2] = "Step [º]"
+    batch.setup_controller(conf_columns, [c[1] for c in configurations],
+                           [c[2] for c in configurations],
+                           [c[3] for c in configurations])
+    for step in range(1, 400):
+        t = step * 0.01
+        setpoint = rng.uniform(-0.2, 0.2, n) if step % 50 == 0 else np.full(n, 0.1)
+        theta = rng.normal(0., 0.3, n)
+        Q = rng.normal(0., 2., n)
+        # Includes the coast, zero thrust
+        thrust = np.where(rng.uniform(size=n) < 0.2, 0., rng.uniform(0., 30., n))
+        outputs = batch.control_theta(setpoint, theta, Q, thrust, t)
+        for output in outputs:
+            assert np.all(np.isfinite(output))
+        for i, controller in enumerate(controllers):
+            expected = controller.control_theta(setpoint[i], theta[i], Q[i],
+                                                thrust[i], t)
+            got = [output[i] for output in outputs]
+            assert np.allclose(got, expected, rtol=1e-12, atol=1e-12), (step, i)
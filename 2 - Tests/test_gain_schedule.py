@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:25:48 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import re
+import json
+from pathlib import Path
+import numpy as np
+from src import configuration
+from src.control import GainSchedule
+
+
+"""
+The Gain Schedule interpolates on the rows of the table, and the
+example of the .json in src/configuration.py is a valid section.
+"""
+
+
+def test_json_example_round_trips():
+    source = Path(configuration.__file__).read_text(encoding="utf-8")
+    example = re.search(r'"optional_sections": (\{.*?\})\}', source, re.DOTALL)
+    optional_sections = json.loads(example.group(1))
+    section = optional_sections["Gain Schedule"]
+    gain_schedule = GainSchedule()
+    gain_schedule.read_save_file_section(section)
+    assert gain_schedule.is_valid is True
+    assert gain_schedule.get_save_file_section() == section
+    # And through the .json
+    empty = {name: [] for name in configuration.SECTIONS}
+    text = configuration.dumps(configuration.Configuration(empty, optional_sections),
+                               empty)
+    loaded = configuration.loads(text, empty)
+    assert loaded.optional_sections == optional_sections
+
+
+def test_close_rows_are_not_smoothed():
+    table = [[0., 1., 0., 0.1], [1., 2., 0.5, 0.2], [1.001, 0.2, 0., 0.3],
+             [3., 0.4, 0.1, 0.3], [1000., 0.1, 0., 0.05]]
+    gain_schedule = GainSchedule()
+    gain_schedule.setup("Thrust [N]", table)
+    data = np.array(table)
+    x = np.concatenate([np.linspace(-10, 1010, 5001), data[:, 0],
+                        np.linspace(0.999, 1.002, 301)])
+    for x_i in x:
+        gains = gain_schedule.get_gains(0., x_i, 0.)
+        expected = [np.interp(x_i, data[:, 0], data[:, j]) for j in range(1, 4)]
+        assert np.allclose(gains, expected, rtol=0, atol=1e-12)
+
+
+def test_repeated_x_is_a_step():
+    gain_schedule = GainSchedule()
+    gain_schedule.setup("Time [s]", [[0., 1., 0., 0.], [2., 1., 0., 0.],
+                                     [2., 3., 0., 0.], [4., 3., 0., 0.]])
+    assert gain_schedule.get_gains(0., 0., 1.999)[0] == 1.
+    assert gain_schedule.get_gains(0., 0., 2.)[0] == 3.
+    assert gain_schedule.get_gains(0., 0., 5.)[0] == 3.
+
+
+def test_single_row():
+    gain_schedule = GainSchedule()
+    gain_schedule.setup("Dynamic Pressure [Pa]", [[100., 0.3, 0.01, 0.1]])
+    assert gain_schedule.get_gains(0., 0., 0.) == (0.3, 0.01, 0.1)
+    assert gain_schedule.get_gains(1e6, 0., 0.) == (0.3, 0.01, 0.1)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:07:40 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import pytest
+from src.simulation import main_simulation as sim
+from src.aerodynamics import rocket_functions as rkt
+
+
+"""
+The gains of a rocket with control fins are inverted only if the fins
+are ahead of the CG.
+"""
+
+
+ACTIVE_FINS = "3 - Examples/Others/Example Rocket Active Fins.txt"
+
+
+def setup_with_cg(xcg, previous_cp=None, use_fins=True):
+    sim.gui.savefile.update_path(ACTIVE_FINS)
+    sim.gui.savefile.read_file()
+    sim.reset_variables()
+    parameters, conf_3d, conf_controller, conf_sitl, rocket_dim = \
+        sim.gui.savefile.get_configuration_destringed()
+    if xcg is not None:
+        parameters[5] = xcg
+        parameters[6] = xcg
+    # Use Fins, the control fins are only flown with it
+    rocket_dim[1] = use_fins
+    if previous_cp is not None:
+        # Left by another rocket
+        rkt.fin[1].cp = previous_cp
+    sim.update_all_parameters(parameters, conf_3d, conf_controller, conf_sitl,
+                              rocket_dim, sim.gui.savefile.get_conf_plots())
+    return conf_controller[6]
+
+
+@pytest.mark.parametrize("previous_cp", [None, 0., 10.])
+def test_fins_ahead_of_the_cg(previous_cp):
+    k_all = setup_with_cg(None, previous_cp)
+    assert sim.rocket.use_fins_control is True
+    assert 0 < rkt.fin[1].cp < sim.xcg
+    assert sim.controller.k_all == -k_all
+
+
+@pytest.mark.parametrize("previous_cp", [None, 0., 10.])
+def test_fins_behind_the_cg(previous_cp):
+    k_all = setup_with_cg(0.15, previous_cp)
+    assert sim.xcg < rkt.fin[1].cp
+    assert sim.controller.k_all == k_all
+
+
+def test_control_fins_without_fins():
+    # The control fins are not flown, their cp is zero
+    k_all = setup_with_cg(None, use_fins=False)
+    assert sim.rocket.use_fins_control is True
+    assert sim.controller.k_all == k_all
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:40:12 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import numpy as np
+from src.simulation.linearization import LinearPitchModel
+
+
+"""
+Stability margins of plants that can be solved by hand, a double
+integrator (theta_dot_dot = u) with a PD, u = -(kp*theta + kd*Q).
+L(s) = (kp + kd*s) / s^2
+"""
+
+
+def pd_model(a=0., kp=1., kd=1., sample_delay=0.):
+    # theta_dot_dot = a*theta + u, a > 0 is an unstable rocket
+    A = np.array([[0., 1.], [a, 0.]])
+    B = np.array([[0.], [1.]])
+    F = np.array([[-kp, -kd]])
+    return LinearPitchModel(A, B, F, ["theta", "Q"], {}, sample_delay)
+
+
+def assert_gain_margins_match_poles(model, margins):
+    k_upper = 10**(margins["gain_margin_upper"]/20)
+    k_lower = 10**(-margins["gain_margin_lower"]/20)
+    assert model.is_stable(k_upper/1.01) and not model.is_stable(k_upper*1.01)
+    assert model.is_stable(k_lower*1.01) and not model.is_stable(k_lower/1.01)
+
+
+def test_double_integrator_pd():
+    margins = pd_model().stability_margins()
+    # |L(jw)| = 1 -> w^2 = (1+sqrt(5))/2, PM = atan(w)
+    w_c = np.sqrt((1+np.sqrt(5)) / 2)
+    assert margins["stable"] is True
+    assert np.isclose(margins["w_phase_margin"], w_c, rtol=1e-3)
+    assert np.isclose(margins["phase_margin"], np.degrees(np.arctan(w_c)), atol=0.05)
+    # The phase never reaches -180º, there is no gain margin
+    assert np.isnan(margins["gain_margin_upper"])
+    assert np.isnan(margins["gain_margin_lower"])
+
+
+def test_double_integrator_pd_with_delay():
+    model = pd_model(sample_delay=0.1)
+    margins = model.stability_margins()
+    w_c = np.sqrt((1+np.sqrt(5)) / 2)
+    pade_lag = 2 * np.degrees(np.arctan(w_c*0.1/2))
+    assert margins["stable"] is True
+    assert np.isclose(margins["phase_margin"],
+                      np.degrees(np.arctan(w_c)) - pade_lag, atol=0.05)
+    k_upper = 10**(margins["gain_margin_upper"]/20)
+    assert model.is_stable(k_upper/1.01) and not model.is_stable(k_upper*1.01)
+    assert np.isnan(margins["gain_margin_lower"])
+
+
+def test_unstable_plant_is_conditionally_stable():
+    # s^2 - 4 with 8 + 2s, k < 0.5 can't hold the rocket (L(0) = -2)
+    model = pd_model(a=4., kp=8., kd=2., sample_delay=0.05)
+    margins = model.stability_margins()
+    assert margins["stable"] is True
+    assert np.isclose(margins["gain_margin_lower"], 20*np.log10(2))
+    assert margins["gain_margin"] == min(margins["gain_margin_lower"],
+                                         margins["gain_margin_upper"])
+    assert_gain_margins_match_poles(model, margins)
+
+
+def test_unstable_loop_has_no_margins():
+    margins = pd_model(a=4., kp=2., kd=2.).stability_margins()
+    assert margins["stable"] is False
+    assert np.isnan(margins["gain_margin"])
+    assert np.isnan(margins["phase_margin"])
+
+
+def test_no_control_authority():
+    # Marginal poles at the origin are not stable, and there's no crossover
+    margins = pd_model(kp=0., kd=0.).stability_margins()
+    assert margins["stable"] is False
+    assert np.isnan(margins["gain_margin"])
+    assert np.isnan(margins["phase_margin"])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:31:55 2026
+
+@author: Guido di Pasquo
+"""
+
+
+from src.simulation.sensors import SensorSet
+
+
+"""
+The "Sensor Models" section of the save file, a header row and one row
+per sensor.
+"""
+
+
+HEADER = "sensor, bias_instability, bias_correlation_time, random_walk, quantization, latency"
+
+
+def test_round_trip():
+    section = [HEADER,
+               "gyro, 0.1, 50.0, 0.01, 0.0, 0.002",
+               "alt, 0.0, 100.0, 0.0, 0.1, 0.0"]
+    sensors = SensorSet(0)
+    sensors.read_save_file_section(section)
+    assert sensors.models["gyro"]["latency"] == 0.002
+    assert sensors.get_save_file_section() == section
+    assert SensorSet(0).get_save_file_section() == []
+
+
+def test_columns_by_name():
+    sensors = SensorSet(0)
+    sensors.read_save_file_section(["sensor, latency, quantization",
+                                    "accx, 0.005, 0.01"])
+    model = sensors.models["accx"]
+    assert model["latency"] == 0.005
+    assert model["quantization"] == 0.01
+    # Not in the header, the default
+    assert model["bias_correlation_time"] == 100.
+    assert model["random_walk"] == 0.
+
+
+def test_errors_say_row_and_sensor(capsys):
+    sensors = SensorSet(0)
+    sensors.read_save_file_section([HEADER,
+                                    "gyro, 0.1, 50.0, 0.01, 0.0, 0.002",
+                                    "accz, 0.1, x, 0.01, 0.0, 0.002",
+                                    "alt, 0.1, 50.0",
+                                    "baro, 0.1, 50.0, 0.01, 0.0, 0.002",
+                                    "gyro, 0.2, 50.0, 0.01, 0.0, 0.002"])
+    out = capsys.readouterr().out
+    assert "row 3 (accz)" in out
+    assert "row 4 (alt)" in out
+    assert "row 5 (baro)" in out
+    assert "row 6 (gyro)" in out
+    assert list(sensors.models) == ["gyro"]
+    assert sensors.models["gyro"]["bias_instability"] == 0.1
+
+
+def test_without_header(capsys):
+    sensors = SensorSet(0)
+    sensors.read_save_file_section(["gyro, 0.1, 50.0, 0.01, 0.0, 0.002"])
+    assert "row 1" in capsys.readouterr().out
+    assert sensors.models == {}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:14:06 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import time
+import numpy as np
+import pytest
+from src.simulation import serial_link
+from src.simulation import sitl_latency
+from src.simulation import sitl_protocol
+from src.simulation import virtual_board
+
+
+"""
+The round trip of the real time hardware SITL, measured against a
+virtual board, is never negative.
+"""
+
+
+def run_real_time(binary, duration=1.):
+    pc_port, board_port = virtual_board.create_virtual_serial_pair()
+    program = virtual_board.ExampleRocketProgram(lockstep=False, binary=binary)
+    board = virtual_board.VirtualBoard(program, board_port)
+    recorder = sitl_latency.LatencyRecorder(program.T_Program)
+    link = serial_link.SerialLink(pc_port, binary, latency_recorder=recorder)
+    board.start()
+    pc_port.timeout = 5
+    assert sitl_protocol.wait_handshake(pc_port) == (binary, False)
+    link.start()
+    t0 = time.perf_counter()
+    t = 0.
+    while t < duration:
+        t_us = int(round(t*1000000))
+        recorder.sample(t_us)
+        link.publish_sensors(t_us, [1., 0., 1., t, 0., 0.])
+        for command in link.get_commands():
+            if command[2] is not None:
+                recorder.command_applied(command[2])
+        # Busy like the simulation, the link threads wait for the GIL
+        x = 0.
+        while time.perf_counter() < t0 + t + 0.001:
+            x += 1.
+        t += 0.001
+    link.stop()
+    board.stop()
+    return recorder, duration
+
+
+@pytest.mark.parametrize("binary", [True, False], ids=["binary", "text"])
+def test_round_trip_is_not_negative(binary):
+    recorder, duration = run_real_time(binary)
+    frames = recorder.get_frames()
+    answered = frames[~np.isnan(frames[:, 3])]
+    assert len(answered) > 20
+    round_trip = answered[:, 3] - answered[:, 2]
+    assert np.all(round_trip >= 0), np.sort(round_trip)[:5]
+    assert recorder.get_statistics(duration)["negative_round_trips"] == 0
+
+
+def test_negative_round_trips_are_not_latencies():
+    recorder = sitl_latency.LatencyRecorder(0.01)
+    for t_us in (1000, 2000, 3000):
+        recorder.sample(t_us)
+    recorder.sent(1000)
+    recorder.command_received(1000)
+    # Answer read before the frame was sent, matched to the wrong frame
+    recorder.command_received(2000)
+    recorder.sent(2000)
+    recorder.sent(3000)
+    stats = recorder.get_statistics(1.)
+    assert stats["negative_round_trips"] == 1
+    assert stats["commands"] == 1
+    assert stats["frames_dropped"] == 1
+    assert np.all(stats["round_trip"] >= 0)
+    counts, _ = recorder.histogram(bins=5)
+    assert np.sum(counts) == 1
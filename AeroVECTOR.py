@@ -42,25 +42,62 @@ unless you are using SITL.
 
 import sys
 import os
+import argparse
 #os.chdir(os.path.dirname(sys.argv[0]))
 import matplotlib
 import tkinter as tk
 from tkinter import ttk
-from src import gui_setup
-matplotlib.use('TkAgg')
+from src.gui import gui_setup
+from src.simulation import main_simulation as sim
 
-print("Loading")
-# Main
-root = tk.Tk()
-root.title("AeroVECTOR - The Model Rocket Simulator & Tuner")
-root.geometry("600x600")
-notebook = ttk.Notebook(root)
-gui_setup.create_file_tab(notebook)
-gui_setup.create_parameters_tab(notebook)
-gui_setup.create_draw_rocket_tab(notebook)
-gui_setup.create_conf_3d_tab(notebook)
-gui_setup.create_sitl_tab(notebook)
-gui_setup.create_simulation_setup_tab(notebook)
-gui_setup.create_run_sim_tab(notebook)
-gui_setup.configure_root(root, notebook)
-root.mainloop()
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="AeroVECTOR - The Model Rocket Simulator & Tuner")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time of each stage of the simulation")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="with --profile, save the calls as a Chrome trace (.json)")
+    parser.add_argument("--run", metavar="SAVE_FILE",
+                        help="run the simulation of a save file without the GUI")
+    parser.add_argument("--linearize", metavar="SAVE_FILE",
+                        help="run a save file without the GUI and print the "
+                        "stability margins along its trajectory")
+    parser.add_argument("--points", type=int, default=10,
+                        help="with --linearize, points of the trajectory (default 10)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    sim.profile_run = args.profile
+    sim.profile_trace_path = args.trace
+    if args.run is not None:
+        sim.run_simulation_headless(args.run)
+        return
+    if args.linearize is not None:
+        sim.run_simulation_headless(args.linearize)
+        sim.linearize_nominal_trajectory(args.points)
+        return
+    # Only the GUI needs Tk, --run and --linearize work without a display
+    matplotlib.use('TkAgg')
+    print("Loading")
+    root = tk.Tk()
+    root.title("AeroVECTOR - The Model Rocket Simulator & Tuner")
+    root.geometry("600x600")
+    notebook = ttk.Notebook(root)
+    gui_setup.create_file_tab(notebook)
+    gui_setup.create_parameters_tab(notebook)
+    gui_setup.create_draw_rocket_tab(notebook)
+    gui_setup.create_conf_3d_tab(notebook)
+    gui_setup.create_sitl_tab(notebook)
+    gui_setup.create_simulation_setup_tab(notebook)
+    gui_setup.create_run_sim_tab(notebook)
+    gui_setup.configure_root(root, notebook)
+    root.mainloop()
+
+
+# Guarded because the processes of the Python SITL modules import this
+# file again
+if __name__ == "__main__":
+    main()
@@ -1 +0,0 @@
-from src.gui import gui_setup
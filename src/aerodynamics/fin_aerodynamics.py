@@ -74,6 +74,8 @@ class Fin:
         None.
         """
         self.fin_attached = fin_attached
+        # Computed with the coefficients, not the one of the last rocket
+        self.cp = 0
         self._check_which_fin(which_fin)
         self.pp.update(li, fin_attached, roughness, self.type_of_fin)
         self._check_if_fins_are_correct()
@@ -9,6 +9,7 @@ import copy
 import numpy as np
 from scipy.interpolate import interp1d
 from src import ISA_calculator as atm
+from src import motor
 from src.aerodynamics import fin_aerodynamics as fin_aero
 from src import warnings_and_cautions
 
@@ -50,6 +51,7 @@ class Rocket:
         calculate_aero_coef -- Compute the aerodynamics of the rocket.
         set_motor -- Set the rocket's motor.
         get_thrust -- Returns the motor's thrust.
+        get_motor_state -- Thrust, mass, Iy and xcg with one lookup.
         is_in_the_pad -- Check if the rocket is in the pad.
         burnout_time -- Returns burnout time of the motor.
         reset_variables -- Resets some variables of the rocket.
@@ -59,6 +61,7 @@ class Rocket:
         self.xcg = 1
         self.ogive_flag = False
         self.motor = [[], []]
+        self.motor_model = motor.Motor()
         self.t_burnout = 1
         self.reynolds = 1
         # Empirical method to calculate the ca from the cd, it should use a
@@ -142,6 +145,9 @@ class Rocket:
         self.use_fins_control = False
         self.is_in_the_pad_flag = True
         self.is_supersonic = False
+        # Only computed with fins, the Cf of a rocket without them uses this
+        # one, not the one of the last rocket
+        self.reynolds = 1
 
     def _set_variables(self, l):
         self.ogive_flag = l[0]
@@ -742,7 +748,8 @@ class Rocket:
         Parameters
         ----------
         data : nested list
-            [time, thrust].
+            [time, thrust], they aren't copied (the motor files are read
+            only arrays).
 
         Returns
         -------
@@ -750,8 +757,9 @@ class Rocket:
         """
         # Motor data from text files
         # t, thrust
-        self.motor[0] = copy.deepcopy(data[0])
-        self.motor[1] = copy.deepcopy(data[1])
+        self.motor[0] = data[0]
+        self.motor[1] = data[1]
+        self.motor_model.setup(data[0], data[1])
         self.t_burnout = self.burnout_time()
 
     def get_thrust(self, t, t_launch):
@@ -771,12 +779,36 @@ class Rocket:
         thrust : float
             thrust.
         """
-        x = t - t_launch
-        self.thrust = np.interp(x, self.motor[0], self.motor[1])
+        self.thrust = self.motor_model.get_thrust(t - t_launch)
         if self.thrust < 0.001:
             self.thrust = 0.001
         return float(self.thrust)
 
+    def get_motor_state(self, t, t_launch):
+        """
+        Thrust, mass, Iy and xcg from one lookup of the motor, updates the
+        internal ones as get_thrust() and get_mass_parameters().
+
+        Parameters
+        ----------
+        t : float
+            current time.
+        t_launch : float
+            ignition time.
+
+        Returns
+        -------
+        tuple
+            thrust, m, Iy, xcg.
+        """
+        self.thrust, mass_time = self.motor_model.get_state(t - t_launch)
+        if self.thrust < 0.001:
+            self.thrust = 0.001
+        self.m = self._deplete(self.m_liftoff, self.m_burnout, mass_time)
+        self.Iy = self._deplete(self.Iy_liftoff, self.Iy_burnout, mass_time)
+        self.xcg = self._deplete(self.xcg_liftoff, self.xcg_burnout, mass_time)
+        return float(self.thrust), self.m, self.Iy, self.xcg
+
     def is_in_the_pad(self, alt):
         """
         Check if the rocket is in the pad.
@@ -806,19 +838,21 @@ class Rocket:
         """
         return self.motor[0][-1]
 
+    def _deplete(self, liftoff, burnout, mass_time):
+        # From liftoff to burnout, as np.interp(mass_time, [0, t_burnout], ...)
+        if mass_time >= self.t_burnout:
+            return float(burnout)
+        return float((burnout-liftoff) / self.t_burnout * mass_time + liftoff)
+
     def get_mass(self, t, t_launch):
-        x = t - t_launch
-        yp = [self.m_liftoff, self.m_burnout]
-        xp = [0, self.t_burnout]
-        self.m = np.interp(x, xp, yp)
-        return float(self.m)
+        mass_time = self.motor_model.get_mass_time(t - t_launch)
+        self.m = self._deplete(self.m_liftoff, self.m_burnout, mass_time)
+        return self.m
 
     def get_Iy(self, t, t_launch):
-        x = t - t_launch
-        yp = [self.Iy_liftoff, self.Iy_burnout]
-        xp = [0, self.t_burnout]
-        self.Iy = np.interp(x, xp, yp)
-        return float(self.Iy)
+        mass_time = self.motor_model.get_mass_time(t - t_launch)
+        self.Iy = self._deplete(self.Iy_liftoff, self.Iy_burnout, mass_time)
+        return self.Iy
 
     def get_xcg(self, t, t_launch):
         """
@@ -837,18 +871,17 @@ class Rocket:
         thrust : float
             xcg.
         """
-        x = t - t_launch
-        yp = [self.xcg_liftoff, self.xcg_burnout]
-        xp = [0, self.t_burnout]
-        self.xcg = np.interp(x, xp, yp)
+        mass_time = self.motor_model.get_mass_time(t - t_launch)
+        self.xcg = self._deplete(self.xcg_liftoff, self.xcg_burnout, mass_time)
         return self.xcg
 
     def get_mass_parameters(self, t, t_launch):
         """Get mass, Iy and xcg and updates the internal ones."""
-        m = self.get_mass(t, t_launch)
-        Iy = self.get_Iy(t, t_launch)
-        xcg = self.get_xcg(t, t_launch)
-        return m, Iy, xcg
+        mass_time = self.motor_model.get_mass_time(t - t_launch)
+        self.m = self._deplete(self.m_liftoff, self.m_burnout, mass_time)
+        self.Iy = self._deplete(self.Iy_liftoff, self.Iy_burnout, mass_time)
+        self.xcg = self._deplete(self.xcg_liftoff, self.xcg_burnout, mass_time)
+        return self.m, self.Iy, self.xcg
 
     """ END ROCKET ========================================================#"""
 
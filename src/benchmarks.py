@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 12:04:51 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import statistics
+import subprocess
+from pathlib import Path
+import numpy as np
+
+
+"""
+Benchmarks of the hot paths of the simulator.
+
+Functions:
+    run_benchmarks -- Time the cases.
+    save_results -- Store the times of a commit.
+    load_results -- Read the times of a commit.
+    compare -- Print the change between two results.
+
+Run from the folder of AeroVECTOR.py:
+    python -m src.benchmarks                       all the cases
+    python -m src.benchmarks -k aero servo         only some of them
+    python -m src.benchmarks --compare 1a2b3c4     and compare with a commit
+"""
+
+"""
+Each case is timed in several repeats, a repeat calls the function as
+many times as it takes to last about min_time. The minimum and the median
+of the time per call are kept, the minimum is the one that is compared
+(the least disturbed by the rest of the computer).
+
+The results are stored in Benchmarks/<commit>.json (<commit>-dirty if
+there are uncommitted changes), so a speedup or a regression is measured
+against the results of another commit of the same computer. compare()
+marks the cases that are slower than the threshold, the command returns
+1 if there is one.
+"""
+
+
+ROCKET_NORMAL_FINS = "3 - Examples/Example Rocket SITL/Example Rocket SITL.txt"
+ROCKET_ULAR_FINS = "3 - Examples/Others/Example Rocket Active Fins.txt"
+RESULTS_PATH = Path("Benchmarks/")
+
+
+def _load(filepath):
+    from src.simulation import main_simulation as sim
+    with contextlib.redirect_stdout(io.StringIO()):
+        if sim.load_save_file(filepath) is False:
+            raise FileNotFoundError(filepath)
+    return sim
+
+
+def _aero_case(filepath):
+    def setup():
+        sim = _load(filepath)
+        rocket = sim.rocket
+
+        def run():
+            rocket.calculate_aero_coef([50., 2.], 0.1, 100., 0.05)
+        return run
+    return setup
+
+
+def _atmosphere():
+    from src.aerodynamics import rocket_functions as rkt
+    atmosphere = rkt.atmosphere
+    h = [0., 100., 500., 1500.]
+    i = [0]
+
+    def run():
+        i[0] += 1
+        atmosphere.calculate(h[i[0] % 4])
+    return run
+
+
+def _servo():
+    sim = _load(ROCKET_NORMAL_FINS)
+    servo = sim.servo
+    state = [0.]
+
+    def run():
+        # Steps of 1 ms, the command changes every 50 ms
+        state[0] += 0.001
+        servo.simulate(0.1 if int(state[0]*20) % 2 == 0 else -0.1, state[0])
+    return run
+
+
+def _controller():
+    sim = _load(ROCKET_NORMAL_FINS)
+    controller = sim.controller
+    state = [0.]
+
+    def run():
+        state[0] += 0.001
+        controller.control_theta(0., 0.05, 0.1, 10., state[0], q=500.)
+    return run
+
+
+def _flight():
+    sim = _load(ROCKET_NORMAL_FINS)
+    sim.Activate_SITL = False
+    sim.sim_duration = 6.
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.run_sim_local()
+    return run
+
+
+def _export_plots():
+    from src import files
+    t = np.arange(0, 6, 0.001)
+    names = ["Time"] + ["Plot " + str(i) for i in range(10)]
+    data = [t.tolist()] + [np.sin(t*(i+1)).tolist() for i in range(10)]
+    folder = tempfile.mkdtemp()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            files.write_export(folder + "/export.csv", names, data, 0.)
+    return run
+
+
+def _import_time():
+    def run():
+        subprocess.run([sys.executable, "-c", "import src.simulation.main_simulation"],
+                       check=True, capture_output=True)
+    return run
+
+
+# name: (setup, min_time [s]), setup() returns the function that is timed,
+# it's called again before each repeat
+CASES = {
+    "aero_normal_fins": (_aero_case(ROCKET_NORMAL_FINS), 0.2),
+    "aero_ular_fins": (_aero_case(ROCKET_ULAR_FINS), 0.2),
+    "atmosphere": (_atmosphere, 0.2),
+    "servo": (_servo, 0.2),
+    "controller": (_controller, 0.2),
+    "flight_6s": (_flight, 0.),
+    "export_plots": (_export_plots, 0.),
+    "import": (_import_time, 0.),
+}
+
+
+def _calibrate(run, min_time):
+    # Calls that last at least min_time
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            return number
+        number *= max(2, int(min_time / max(elapsed, 1e-9) * 1.1))
+
+
+def _time_case(setup, min_time, repeats):
+    times = []
+    number = _calibrate(setup(), min_time)
+    for _ in range(repeats):
+        run = setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - t0) / number)
+    return {"min": min(times), "median": statistics.median(times),
+            "repeats": repeats, "number": number}
+
+
+def run_benchmarks(names=None, repeats=5):
+    """
+    Time the cases.
+
+    Parameters
+    ----------
+    names : list, optional
+        Cases to run, a case runs if its name contains one of them. The
+        default is None (all of them).
+    repeats : int, optional
+        Repeats of each case. The default is 5.
+
+    Returns
+    -------
+    dict
+        {case: {"min", "median" [s per call], "repeats", "number"}}.
+    """
+    results = {}
+    for name, (setup, min_time) in CASES.items():
+        if names and not any(e in name for e in names):
+            continue
+        results[name] = _time_case(setup, min_time, repeats)
+        print("{:<20}{:>14}  (median {})".format(name, _format_time(results[name]["min"]),
+                                                 _format_time(results[name]["median"])))
+    return results
+
+
+def _format_time(t):
+    if t < 1e-3:
+        return "{:.2f} us".format(t*1e6)
+    if t < 1:
+        return "{:.2f} ms".format(t*1e3)
+    return "{:.3f} s".format(t)
+
+
+def _get_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                 capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "no-commit"
+    if changes.strip() != "":
+        commit += "-dirty"
+    return commit
+
+
+def save_results(results, path=RESULTS_PATH):
+    """
+    Store the times of the current commit, the cases that weren't run
+    are kept from the previous results of the commit.
+
+    Parameters
+    ----------
+    results : dict
+        Returned by run_benchmarks().
+    path : Path, optional
+        Folder of the results. The default is Benchmarks/.
+
+    Returns
+    -------
+    string
+        The commit.
+    """
+    commit = _get_commit()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    previous = load_results(commit, path)
+    cases = previous["cases"] if previous is not None else {}
+    cases.update(results)
+    data = {"commit": commit,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.node() + " " + platform.machine(),
+            "cases": cases}
+    with open(path / (commit + ".json"), "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    return commit
+
+
+def load_results(commit, path=RESULTS_PATH):
+    """
+    Read the results of a commit (or the start of its hash).
+
+    Returns
+    -------
+    dict or None
+        None if there are no results.
+    """
+    path = Path(path)
+    candidates = [path / (commit + ".json")]
+    if candidates[0].exists() is False:
+        candidates = sorted(path.glob(commit + "*.json"))
+    if len(candidates) == 0:
+        return None
+    with open(candidates[0], "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(base, new, threshold=0.1):
+    """
+    Print the change of the cases between two results.
+
+    Parameters
+    ----------
+    base : dict
+        Results of the reference commit, from load_results().
+    new : dict
+        {case: times}, from run_benchmarks().
+    threshold : float, optional
+        Relative change that is reported. The default is 0.1.
+
+    Returns
+    -------
+    list
+        Cases that got slower than the threshold.
+    """
+    regressions = []
+    print("\nCompared with", base["commit"])
+    for name, times in new.items():
+        if name not in base["cases"]:
+            continue
+        ratio = times["min"] / base["cases"][name]["min"]
+        if ratio > 1 + threshold:
+            label = "SLOWER"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            label = "faster"
+        else:
+            label = ""
+        print("{:<20}{:>14}{:>14}{:>8.2f}x  {}".format(
+            name, _format_time(base["cases"][name]["min"]),
+            _format_time(times["min"]), ratio, label))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR benchmarks")
+    parser.add_argument("-k", nargs="*", metavar="NAME",
+                        help="run the cases that contain these names")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--compare", metavar="COMMIT",
+                        help="compare with the results of a commit")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change reported by --compare")
+    parser.add_argument("--no-save", action="store_true",
+                        help="don't store the results")
+    args = parser.parse_args()
+    # Read before saving, it can be the same commit
+    base = None
+    if args.compare is not None:
+        base = load_results(args.compare)
+        if base is None:
+            print("There are no results of", args.compare)
+    results = run_benchmarks(args.k, args.repeats)
+    if args.no_save is False:
+        print("Results of", save_results(results))
+    if base is not None and len(compare(base, results, args.threshold)) > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 19:03:16 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+
+
+"""
+Structured save files (.json) and the cache of the parsed save files.
+
+Classes:
+    Configuration -- Sections of a save file, as text and typed.
+
+Functions:
+    dumps -- Configuration as .json text.
+    loads -- Configuration of a .json text.
+    validate -- Problems of the structure of a configuration.
+    load -- Parse a save file once, cached while it doesn't change.
+    clear_cache -- Forget the cached save files.
+    convert -- Convert a save file between .txt and .json.
+    check -- Check that a save file reads the same as .json, in any order.
+"""
+
+"""
+The .txt save files are lines "Name = value" with ###=# between the
+sections, and every value is text: a file is split, and then each value
+is converted to a number, a bool or a string (gui_functions.
+destring_data) every time the configuration is used.
+
+A Configuration has the text of every value (what the GUI shows and
+saves) and, computed once by SaveFile when it's parsed, the typed
+values. load() keeps the parsed files of this process, a save file is
+read again only if it changed (its modification time and size), so a
+batch that loads the same configurations many times parses each once.
+
+The .json has the same sections as objects {"name": value}, the rocket
+dimensions as a list of lines and the optional sections as lists. The
+values are read by name and put in the order of the .txt, so the keys
+can be in any order, and a key that is unknown, missing or repeated is an
+error (a typo would otherwise move every value after it). The numbers
+are written as they are in the .txt and read back as the same text, so a
+conversion to .json and back gives the same save file:
+
+    {"format": "AeroVECTOR", "version": 1,
+     "parameters": {"Motor": "Estes_D12.csv", "Mass Liftoff": 0.451, ...},
+     "conf_3d": {"Toggle 3D": true, ...},
+     ...
+     "rocket_dim": ["True", "False", ..., "0,0", "0.2,0.066", ...],
+     "optional_sections": {"Gain Schedule": ["Dynamic Pressure [Pa]",
+                                             "0.0, 0.4, 0.0, 0.136",
+                                             "2000.0, 0.1, 0.0, 0.034"]}}
+
+Convert from the folder of AeroVECTOR.py:
+    python -m src.configuration "Rocket.txt"            writes Rocket.json
+    python -m src.configuration "Rocket.json" "Rocket.txt"
+    python -m src.configuration --check "Rocket.txt"    check the .json
+"""
+
+
+FORMAT = "AeroVECTOR"
+VERSION = 1
+SECTIONS = ["parameters", "conf_3d", "conf_controller", "conf_sitl",
+            "conf_plots", "rocket_dim"]
+
+# A number that json writes and reads as it is
+_JSON_NUMBER = re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?")
+
+# {absolute path: ((mtime, size), Configuration)}
+_cache = {}
+
+
+class Configuration:
+    """
+    Sections of a save file.
+
+    Attributes:
+        sections -- {section: [text of each value]}, the SECTIONS.
+        optional_sections -- {name: [value, line, line, ...]}.
+        typed -- {section: values}, set by SaveFile when it's parsed.
+    """
+
+    def __init__(self, sections, optional_sections=None):
+        self.sections = sections
+        self.optional_sections = optional_sections or {}
+        self.typed = {}
+
+
+class _Number(str):
+    # Text of a number of the .json
+    pass
+
+
+def _dump_value(text):
+    if text in ("True", "False"):
+        return "true" if text == "True" else "false"
+    if _JSON_NUMBER.fullmatch(text):
+        return text
+    return json.dumps(text, ensure_ascii=False)
+
+
+def _load_value(value, where):
+    if isinstance(value, bool):
+        return "True" if value is True else "False"
+    if isinstance(value, str):
+        return str(value)
+    raise ValueError("Wrong value in " + where + ": " + repr(value))
+
+
+def dumps(configuration, names):
+    """
+    Configuration as .json text.
+
+    Parameters
+    ----------
+    configuration : Configuration
+        Configuration.
+    names : dict
+        {section: [name of each value]}, without the rocket_dim.
+
+    Returns
+    -------
+    string
+        .json.
+    """
+    lines = ["{",
+             '  "format": ' + json.dumps(FORMAT) + ",",
+             '  "version": ' + str(VERSION) + ","]
+    for section in SECTIONS[:-1]:
+        values = configuration.sections[section]
+        rows = ["    " + json.dumps(name, ensure_ascii=False) + ": " + _dump_value(text)
+                for name, text in zip(names[section], values)]
+        lines.append('  "' + section + '": {')
+        lines.append(",\n".join(rows))
+        lines.append("  },")
+    rows = ["    " + json.dumps(e, ensure_ascii=False)
+            for e in configuration.sections["rocket_dim"]]
+    lines.append('  "rocket_dim": [')
+    lines.append(",\n".join(rows))
+    lines.append("  ],")
+    rows = ["    " + json.dumps(name, ensure_ascii=False) + ": "
+            + json.dumps(section, ensure_ascii=False)
+            for name, section in configuration.optional_sections.items()]
+    lines.append('  "optional_sections": {')
+    lines.append(",\n".join(rows))
+    lines.append("  }")
+    lines.append("}")
+    return "\n".join(e for e in lines if e != "") + "\n"
+
+
+def _load_section(pairs, names, section):
+    # The values in the order of names, whatever the order of the keys
+    values = {}
+    for name, value in pairs:
+        if name in values:
+            raise ValueError("Repeated value in " + section + ": " + name)
+        values[name] = _load_value(value, section + ", " + name)
+    unknown = [e for e in values if e not in names]
+    if unknown:
+        raise ValueError("Unknown value in " + section + ": " + ", ".join(unknown))
+    missing = [e for e in names if e not in values]
+    if missing:
+        raise ValueError("Missing value in " + section + ": " + ", ".join(missing))
+    return [values[e] for e in names]
+
+
+def loads(text, names):
+    """
+    Configuration of a .json text.
+
+    Parameters
+    ----------
+    text : string
+        .json.
+    names : dict
+        {section: [name of each value]} in the order of the .txt,
+        without the rocket_dim.
+
+    Returns
+    -------
+    Configuration
+        With the values in the order of names.
+    """
+    data = json.loads(text, parse_float=_Number, parse_int=_Number,
+                      object_pairs_hook=lambda pairs: pairs)
+    data = dict(data)
+    # The numbers are text (_Number)
+    if data.get("format") != FORMAT or data.get("version") != str(VERSION):
+        raise ValueError("Not an AeroVECTOR save file or wrong version")
+    sections = {}
+    for section in SECTIONS[:-1]:
+        pairs = data.get(section)
+        if not isinstance(pairs, list):
+            raise ValueError("Missing section: " + section)
+        sections[section] = _load_section(pairs, names[section], section)
+    if not isinstance(data.get("rocket_dim"), list):
+        raise ValueError("Missing section: rocket_dim")
+    sections["rocket_dim"] = [_load_value(e, "rocket_dim") for e in data["rocket_dim"]]
+    optional_sections = {}
+    for name, section in data.get("optional_sections", []):
+        if not isinstance(section, list) or len(section) == 0:
+            raise ValueError("Wrong optional section: " + name)
+        optional_sections[name] = [_load_value(e, name) for e in section]
+    return Configuration(sections, optional_sections)
+
+
+def validate(configuration, lengths):
+    """
+    Problems of the structure of a configuration.
+
+    Parameters
+    ----------
+    configuration : Configuration
+        Configuration.
+    lengths : dict
+        {section: number of values}, the sections that have a fixed
+        number.
+
+    Returns
+    -------
+    list
+        Strings, empty if there are no problems.
+    """
+    problems = []
+    for section, length in lengths.items():
+        n = len(configuration.sections.get(section, []))
+        if n != length:
+            problems.append("{} has {} values, expected {}".format(section, n, length))
+    for name, section in configuration.optional_sections.items():
+        if name == "" or len(section) == 0:
+            problems.append("Optional section without name or value: " + name)
+    return problems
+
+
+def load(file_path, parse):
+    """
+    Parse a save file once, the next calls return the same Configuration
+    while the file doesn't change.
+
+    Parameters
+    ----------
+    file_path : string or Path
+        Save file.
+    parse : function
+        parse(file_path) -> Configuration, called if the file isn't in
+        the cache or changed.
+
+    Returns
+    -------
+    Configuration
+        Shared, it shouldn't be modified.
+    """
+    key = os.path.abspath(file_path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    configuration = parse(file_path)
+    _cache[key] = (version, configuration)
+    return configuration
+
+
+def clear_cache():
+    """Forget the cached save files."""
+    _cache.clear()
+
+
+def convert(file_path, new_file_path=None):
+    """
+    Convert a save file from .txt to .json or from .json to .txt.
+
+    Parameters
+    ----------
+    file_path : string
+        Save file.
+    new_file_path : string, optional
+        The new file. The default is the same name with the other
+        extension.
+
+    Returns
+    -------
+    bool
+        True if it was converted.
+    """
+    # main_simulation imports the GUI modules in order
+    from src.simulation import main_simulation as sim
+    file_path = Path(file_path)
+    if new_file_path is None:
+        new_suffix = ".txt" if file_path.suffix.lower() == ".json" else ".json"
+        new_file_path = file_path.with_suffix(new_suffix)
+    savefile = sim.gui.savefile
+    savefile.update_path(file_path.as_posix())
+    savefile.read_file()
+    if savefile.error_opening_file_flag is True:
+        return False
+    savefile.update_path(Path(new_file_path).as_posix())
+    savefile.save_all_configurations(saved_thing="Converted File")
+    return True
+
+
+def _reorder(configuration, names, order):
+    # The .json of a configuration with the values of each section in order
+    sections = dict(configuration.sections)
+    new_names = {}
+    for section in SECTIONS[:-1]:
+        new_names[section] = order(names[section])
+        values = dict(zip(names[section], configuration.sections[section]))
+        sections[section] = [values[e] for e in new_names[section]]
+    return dumps(Configuration(sections, configuration.optional_sections), new_names)
+
+
+def check(file_path):
+    """
+    Check that a save file reads the same as a .json with the keys of
+    each section in the order of the .txt and reversed, and that an
+    unknown, missing or repeated key is an error.
+
+    Parameters
+    ----------
+    file_path : string
+        Save file.
+
+    Returns
+    -------
+    bool
+        True if it passed.
+    """
+    from src.simulation import main_simulation as sim
+    savefile = sim.gui.savefile
+    savefile.update_path(Path(file_path).as_posix())
+    savefile.read_file()
+    if savefile.error_opening_file_flag is True:
+        return False
+    names = savefile.get_section_names()
+    original = savefile.configuration
+    passed = True
+    for description, order in [("in order", list),
+                                ("reversed", lambda e: list(reversed(e)))]:
+        parsed = loads(_reorder(original, names, order), names)
+        same = (parsed.sections == original.sections
+                and parsed.optional_sections == original.optional_sections)
+        passed = passed and same
+        print("{:<24}{}".format(description, "passed" if same else "FAILED"))
+    wrong_names = {
+        "unknown key": lambda e: [e[0] + "x"] + e[1:],
+        "missing key": lambda e: e[1:],
+        "repeated key": lambda e: e[1:] + e[1:2],
+    }
+    for description, wrong in wrong_names.items():
+        text = dumps(Configuration({k: list(v) for k, v in original.sections.items()},
+                                   original.optional_sections),
+                     dict(names, parameters=wrong(names["parameters"])))
+        try:
+            loads(text, names)
+            rejected = False
+        except ValueError:
+            rejected = True
+        passed = passed and rejected
+        print("{:<24}{}".format(description, "passed" if rejected else "FAILED"))
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR save file conversion")
+    parser.add_argument("file", help=".txt or .json save file")
+    parser.add_argument("new_file", nargs="?",
+                        help="converted file, the default changes the extension")
+    parser.add_argument("--check", action="store_true",
+                        help="check that the file reads the same as .json in any order")
+    args = parser.parse_args()
+    if args.check is True:
+        return 0 if check(args.file) is True else 1
+    return 0 if convert(args.file, args.new_file) is True else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ Created on Fri Jan 29 14:05:35 2021
 """
 
 
-from src.simulation import main_simulation as sim
+import numpy as np
 
 
 """
@@ -14,9 +14,16 @@ Handles the controller.
 
 Classes:
     Controller
+    BatchController -- Runs many controllers at once, standalone.
+    GainSchedule -- Gains as a function of q, thrust or time.
 """
 
 
+# The torque controller divides by the thrust (Rocket.get_thrust() has the
+# same minimum)
+MIN_THRUST = 0.001
+
+
 class Controller:
     """
     Controller class, the default is a PID controller
@@ -24,6 +31,8 @@ class Controller:
     Methods:
         setup_controller -- Sets the controller configuration.
         control_theta -- Runs the controller and returns the servo command.
+        set_gain_schedule -- Use a GainSchedule instead of fixed gains.
+        get_gains -- Gains at the current flight condition.
     """
 
     def __init__(self):
@@ -48,8 +57,10 @@ class Controller:
         self.oki = 0
         self.okd = 0
         self.tot_error = 0
+        self.gain_schedule = None
 
-    def setup_controller(self, conf_controller, actuator_reduction, tvc_max):
+    def setup_controller(self, conf_controller, actuator_reduction, tvc_max,
+                         invert_gains=False):
         """
         Set up the controller
 
@@ -61,15 +72,25 @@ class Controller:
             TVC reduction rate.
         tvc_max : float
             Maximum deflection angle (rad).
+        invert_gains : bool, optional
+            True if the control fins are ahead of the CG. The default is
+            False.
 
         Returns
         -------
         None.
         """
+        # The state of the previous run
         self.u_controller = 0
+        self.u_prev = 0
+        self.u_servos = 0
         self.t_prev = 0
         self.last_error = 0
         self.cum_error = 0
+        self.okp = 0
+        self.oki = 0
+        self.okd = 0
+        self.tot_error = 0
         self.torque_controller = conf_controller[0]
         self.anti_windup = conf_controller[1]
         self.input_type = conf_controller[2]
@@ -81,14 +102,53 @@ class Controller:
         self.reference_thrust = conf_controller[8]
         self.actuator_reduction = actuator_reduction
         self.tvc_max = tvc_max
-        if sim.rocket.use_fins_control is True and sim.rkt.fin[1].cp < sim.xcg:
+        if invert_gains is True:
             # Must invert the gains if the fins are ahead of the CG, or else
             # the controller has positive feedback due to the torque being
             # opposite to the one expected.
             self.k_all *= -1
             self.k_damping *= -1
 
-    def control_theta(self, setpoint, theta, Q, thrust, t):
+    def set_gain_schedule(self, gain_schedule):
+        """
+        Use a gain schedule instead of the fixed kp, ki and kd.
+
+        Parameters
+        ----------
+        gain_schedule : GainSchedule or None
+            Gain schedule, None uses the fixed gains.
+
+        Returns
+        -------
+        None.
+        """
+        if gain_schedule is not None and gain_schedule.is_valid is False:
+            gain_schedule = None
+        self.gain_schedule = gain_schedule
+
+    def get_gains(self, q, thrust, t):
+        """
+        Get the gains at the current flight condition.
+
+        Parameters
+        ----------
+        q : float
+            Dynamic pressure.
+        thrust : float
+            Current thrust.
+        t : float
+            Current time.
+
+        Returns
+        -------
+        kp, ki, kd : floats
+            Gains.
+        """
+        if self.gain_schedule is None:
+            return self.kp, self.ki, self.kd
+        return self.gain_schedule.get_gains(q, thrust, t)
+
+    def control_theta(self, setpoint, theta, Q, thrust, t, q=0.):
         """
         Input the setpoint and the rest of the parameters to obtain
         the servo command.
@@ -105,6 +165,9 @@ class Controller:
             Current thrust.
         t : float
             Current time.
+        q : float, optional
+            Dynamic pressure, only used by the gain schedule. The default
+            is 0.
 
         Returns
         -------
@@ -120,6 +183,8 @@ class Controller:
             Total error.
         """
         self.u_prev = self.u_controller
+        if self.gain_schedule is not None:
+            self.kp, self.ki, self.kd = self.gain_schedule.get_gains(q, thrust, t)
         error = setpoint - theta
         error = error * self.k_all
         self.u_controller = self._pid(error, t)
@@ -135,7 +200,8 @@ class Controller:
         if self.torque_controller is True:
             # On the simulation one can access the real thrust from the thrust curve
             # In your flight computer you will have to calculate it.
-            thrust_controller = thrust
+            # Never zero, the same minimum as the thrust of the Rocket
+            thrust_controller = max(thrust, MIN_THRUST)
             self.u_servos = (self.reference_thrust/thrust_controller) * self.u_servos
             # Prevents the TVC from deflecting more that it can after being corrected
             # for the thrust.
@@ -179,3 +245,321 @@ class Controller:
         self.t_prev = t
         # Have function return the PID output
         return out_pid
+
+
+class BatchController:
+    """
+    Vectorized version of the Controller, runs n controllers at once.
+
+    Every gain and limit can be different for each member, the state is
+    stored in arrays. The anti windup, saturations and the torque
+    controller do exactly the same as in the Controller.
+
+    It's a standalone API for now, for code that steps its own ensemble of
+    rockets: the simulation flies one Controller, and the sweeps, Monte
+    Carlo runs and variant studies run one simulation per case.
+
+    Methods:
+        setup_controller -- Sets the controllers configuration.
+        control_theta -- Runs the controllers and returns the servo commands.
+    """
+
+    def __init__(self, n=1):
+        self.n = n
+        self.torque_controller = np.ones(n, dtype=bool)
+        self.anti_windup = np.ones(n, dtype=bool)
+        self.input_type = "Step [º]"
+        self.kp = np.full(n, 0.4)
+        self.ki = np.zeros(n)
+        self.kd = np.full(n, 0.136)
+        self.k_all = np.ones(n)
+        self.k_damping = np.zeros(n)
+        self.reference_thrust = np.full(n, 28.)
+        self.actuator_reduction = np.zeros(n)
+        self.tvc_max = np.zeros(n)
+        self._reset_state()
+
+    def _reset_state(self):
+        n = self.n
+        self.u_controller = np.zeros(n)
+        self.u_prev = np.zeros(n)
+        self.u_servos = np.zeros(n)
+        self.t_prev = np.zeros(n)
+        self.last_error = np.zeros(n)
+        self.cum_error = np.zeros(n)
+        self.okp = np.zeros(n)
+        self.oki = np.zeros(n)
+        self.okd = np.zeros(n)
+        self.tot_error = np.zeros(n)
+
+    def _member_array(self, value, dtype=float):
+        # Scalars are used for all the members
+        return np.array(np.broadcast_to(np.asarray(value, dtype=dtype), (self.n,)))
+
+    def setup_controller(self, conf_controller, actuator_reduction, tvc_max,
+                         invert_gains=False):
+        """
+        Set up the controllers, each value of the configuration can be a
+        scalar (same for all the members) or a list of n values.
+
+        Parameters
+        ----------
+        conf_controller : list
+            List with the controller configuration.
+        actuator_reduction : float or list
+            TVC reduction rate.
+        tvc_max : float or list
+            Maximum deflection angle (rad).
+        invert_gains : bool or list, optional
+            True if the control fins are ahead of the CG. The default is
+            False.
+
+        Returns
+        -------
+        None.
+        """
+        self._reset_state()
+        self.torque_controller = self._member_array(conf_controller[0], bool)
+        self.anti_windup = self._member_array(conf_controller[1], bool)
+        self.input_type = conf_controller[2]
+        self.kp = self._member_array(conf_controller[3])
+        self.ki = self._member_array(conf_controller[4])
+        self.kd = self._member_array(conf_controller[5])
+        self.k_all = self._member_array(conf_controller[6])
+        self.k_damping = self._member_array(conf_controller[7])
+        self.reference_thrust = self._member_array(conf_controller[8])
+        self.actuator_reduction = self._member_array(actuator_reduction)
+        self.tvc_max = self._member_array(tvc_max)
+        # Must invert the gains if the fins are ahead of the CG
+        sign = np.where(self._member_array(invert_gains, bool), -1., 1.)
+        self.k_all *= sign
+        self.k_damping *= sign
+
+    def control_theta(self, setpoint, theta, Q, thrust, t):
+        """
+        Input the setpoints and the rest of the parameters to obtain
+        the servo commands, the inputs can be scalars or arrays of n.
+
+        Parameters
+        ----------
+        setpoint : float or numpy array
+            Input to the controllers.
+        theta : float or numpy array
+            Current angles.
+        Q : float or numpy array
+            Current pitching speeds.
+        thrust : float or numpy array
+            Current thrusts.
+        t : float or numpy array
+            Current times.
+
+        Returns
+        -------
+        u_servos : numpy array
+            Output of the controllers.
+        okp : numpy array
+            Proportional contributions.
+        oki : numpy array
+            Integral contributions.
+        okd : numpy array
+            Derivative contributions.
+        tot_error : numpy array
+            Total errors.
+        """
+        self.u_prev = self.u_controller
+        error = (setpoint-theta) * self.k_all
+        u_controller = self._pid(error, t) - Q*self.k_damping
+        # Saturation
+        self.u_controller = np.clip(u_controller, -self.tvc_max, self.tvc_max)
+        u_servos = self.u_controller * self.actuator_reduction
+        # Torque controller, corrected for the thrust and saturated again
+        max_servos = self.tvc_max * self.actuator_reduction
+        thrust_controller = np.maximum(thrust, MIN_THRUST)
+        u_servos_torque = np.clip((self.reference_thrust/thrust_controller) * u_servos,
+                                  -max_servos, max_servos)
+        self.u_servos = np.where(self.torque_controller, u_servos_torque, u_servos)
+        return (self.u_servos.copy(), self.okp.copy(), self.oki.copy(),
+                self.okd.copy(), self.tot_error.copy())
+
+    def _pid(self, inp, t):
+        T_program = t - self.t_prev
+        error_pid = inp
+        rate_error = (error_pid-self.last_error) / T_program
+        integral = ((self.last_error + ((error_pid-self.last_error)/2))
+                    * T_program) + self.cum_error
+        out_pid = self.kp*error_pid + self.ki*self.cum_error + self.kd*rate_error
+        # Anti windup by clamping, only integrates if the TVC is not saturated
+        not_saturated = (-self.tvc_max < out_pid) & (out_pid < self.tvc_max)
+        integrate = ~self.anti_windup | not_saturated
+        self.cum_error = np.where(integrate, integral, self.cum_error)
+        out_pid = self.kp*error_pid + self.ki*self.cum_error + self.kd*rate_error
+        out_pid = np.where(self.anti_windup,
+                           np.clip(out_pid, -self.tvc_max, self.tvc_max),
+                           out_pid)
+        self.okp = self.kp * error_pid
+        self.oki = self.ki * self.cum_error
+        self.okd = self.kd * rate_error
+        self.tot_error = error_pid
+        self.last_error = error_pid
+        self.t_prev = self._member_array(t)
+        return out_pid
+
+
+class GainSchedule:
+    """
+    Table of gains as a function of the dynamic pressure, thrust or time.
+
+    The gains are interpolated between the rows of the table, exactly.
+    A uniform grid of the variable stores the row at the start of each
+    step (like the thrust curve of the Motor), so obtaining the gains is
+    a constant time operation regardless of the size of the table.
+
+    Methods:
+        setup -- Set the table.
+        read_save_file_section -- Set the table from the save file.
+        get_save_file_section -- Table as it's stored in the save file.
+        get_gains -- Interpolated gains.
+    """
+
+    variables = ["Dynamic Pressure [Pa]", "Thrust [N]", "Time [s]"]
+
+    def __init__(self):
+        self.variable = "Dynamic Pressure [Pa]"
+        self.table = []
+        self.is_valid = False
+        self._n_grid = 512
+        self._x = [0.]
+        self._gains = [(0., 0., 0.)]
+        self._slope = [(0., 0., 0.)]
+        self._inv_dx = 0.
+        self._segments = [0]
+
+    def setup(self, variable, table):
+        """
+        Set the scheduling variable and the table.
+
+        Parameters
+        ----------
+        variable : string
+            One of GainSchedule.variables.
+        table : list
+            Rows of [x, kp, ki, kd], x is the scheduling variable. Values
+            outside the table use the gains of the closest row.
+
+        Returns
+        -------
+        None.
+        """
+        self.is_valid = False
+        if variable not in self.variables:
+            print("Error in the Gain Schedule, unknown variable: " + str(variable))
+            return
+        table = sorted([[float(e) for e in row] for row in table])
+        if len(table) == 0 or min(len(row) for row in table) != 4:
+            print("Error in the Gain Schedule, rows must be: x, kp, ki, kd")
+            return
+        self.variable = variable
+        self.table = table
+        # Python floats, faster than numpy ones for a single point
+        self._x = [row[0] for row in table]
+        self._gains = [tuple(row[1:]) for row in table]
+        self._slope = []
+        for i in range(len(table)-1):
+            dx = self._x[i+1] - self._x[i]
+            if dx > 0:
+                self._slope.append(tuple((b-a) / dx for a, b in
+                                         zip(self._gains[i], self._gains[i+1])))
+            else:
+                # Repeated x, a step
+                self._slope.append((0., 0., 0.))
+        if self._x[-1] > self._x[0]:
+            self._inv_dx = self._n_grid / (self._x[-1]-self._x[0])
+            x_grid = self._x[0] + np.arange(self._n_grid) / self._inv_dx
+            # Last row at or before the start of each step
+            segments = np.searchsorted(self._x, x_grid, side="right") - 1
+            self._segments = np.minimum(segments, len(table)-2).tolist()
+        else:
+            self._inv_dx = 0.
+            self._segments = [0]
+        self.is_valid = True
+
+    def read_save_file_section(self, section):
+        """
+        Set the table from the save file section.
+
+        Parameters
+        ----------
+        section : list
+            Strings, the first one is the variable, the rest are the
+            rows "x, kp, ki, kd".
+
+        Returns
+        -------
+        None.
+        """
+        if len(section) < 2:
+            self.is_valid = False
+            return
+        try:
+            table = [row.split(",") for row in section[1:] if row != ""]
+        except AttributeError:
+            print("Error Reading the Gain Schedule")
+            self.is_valid = False
+            return
+        try:
+            self.setup(section[0], table)
+        except ValueError:
+            print("Error Reading the Gain Schedule")
+            self.is_valid = False
+
+    def get_save_file_section(self):
+        """
+        Return the table as it's stored in the save file.
+
+        Returns
+        -------
+        list
+            Strings, the variable and the rows "x, kp, ki, kd".
+        """
+        section = [self.variable]
+        for row in self.table:
+            section.append(", ".join([str(e) for e in row]))
+        return section
+
+    def get_gains(self, q, thrust, t):
+        """
+        Get the gains at the current flight condition.
+
+        Parameters
+        ----------
+        q : float
+            Dynamic pressure.
+        thrust : float
+            Current thrust.
+        t : float
+            Current time.
+
+        Returns
+        -------
+        kp, ki, kd : floats
+            Interpolated gains.
+        """
+        if self.variable == "Dynamic Pressure [Pa]":
+            x = q
+        elif self.variable == "Thrust [N]":
+            x = thrust
+        else:
+            x = t
+        if x <= self._x[0]:
+            gains = self._gains[0]
+        elif x >= self._x[-1]:
+            gains = self._gains[-1]
+        else:
+            # x[i] <= x < x[i+1]
+            step = min(int((x-self._x[0]) * self._inv_dx), self._n_grid-1)
+            i = self._segments[step]
+            while x >= self._x[i+1]:
+                i += 1
+            dx = x - self._x[i]
+            gains = [g + m*dx for g, m in zip(self._gains[i], self._slope[i])]
+        return float(gains[0]), float(gains[1]), float(gains[2])
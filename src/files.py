@@ -8,6 +8,8 @@ Created on Mon Jan 18 18:28:36 2021
 import os
 import copy
 from src.gui import gui_functions
+from src import motor_database
+from src import configuration
 from pathlib import Path
 import re
 from tkinter import filedialog
@@ -55,14 +57,16 @@ def get_export_names(filepath, exports_path):
 
 def get_motor_names():
     r"""
-    Return a list with the names of the motor files in the folder /Motors.
+    Return a list with the names of the motor files in the folder /Motors
+    (.csv, .eng and .rse).
 
     Returns
     -------
     List of strings
         Motor names.
     """
-    return natural_sort(os.listdir(motors_path))
+    return natural_sort([e for e in os.listdir(motors_path)
+                         if Path(e).suffix.lower() in motor_database.MOTOR_EXTENSIONS])
 
 
 def get_sitl_modules_names(filepath):
@@ -121,11 +125,34 @@ def export_plots(file_name, filepath, names, data, T):
                                                                  ("All Files", ".*")])
 
     if exports_path_total == "":
-        return
+        return None
     path_without_name = [e+"/" for e in exports_path_total.split("/") if e != ""][:-1]
     exports_path = "".join(path_without_name)
     if exports_path_total == "":
-        return
+        return None
+    return write_export(exports_path_total, names, data, T)
+
+
+def write_export(file_path, names, data, T):
+    """
+    Write the plots to a .csv, one row every T seconds.
+
+    Parameters
+    ----------
+    file_path : string
+        Path of the .csv.
+    names : list
+        Names of the columns, the first one is the time.
+    data : list
+        Lists with the values of each column.
+    T : float
+        Time between rows [s].
+
+    Returns
+    -------
+    string or None
+        The path, None if it couldn't be written.
+    """
     to_file = ""
     prev_time = 0
     for i in range(len(data[0])):
@@ -148,11 +175,13 @@ def export_plots(file_name, filepath, names, data, T):
                 prev_time = data[0][i]
         to_file += line
     try:
-        with open(exports_path_total, "w", encoding="utf-8") as file:
+        with open(file_path, "w", encoding="utf-8") as file:
             file.write(to_file)
         print("Data Exported Successfully")
     except EnvironmentError:
         print("Error Exporting Data")
+        return None
+    return file_path
 
 
 class SaveFile:
@@ -170,6 +199,10 @@ class SaveFile:
         read_file -- Reads the file.
         read_motor_data -- Reads the motor file.
         get_motor_data -- Returns the motor data.
+        get_configuration_destringed -- Returns the configuration (variables).
+        get_section_names -- Names of the values of each section.
+        set_optional_section -- Sets a section that not all files have.
+        get_optional_section -- Returns a section that not all files have.
     """
 
     def __init__(self):
@@ -264,6 +297,11 @@ class SaveFile:
         self.conf_sitl = []
         self.conf_plots = []
         self.rocket_dim = []
+        # Sections after the rocket dimensions that not all the files
+        # have, {name: [value, line, line, ...]}
+        self.optional_sections = {}
+        # Parsed file, shared with the cache of the module configuration
+        self.configuration = None
         self.tofile = ""
         self.t_mot = []
         self.thrust_mot = []
@@ -347,6 +385,37 @@ class SITLProgram:
 
     """
 
+    def _get_file_text(self):
+        # .json or the .txt of always
+        if Path(self.filepath).suffix.lower() == ".json":
+            sections = {"parameters": self.parameters,
+                        "conf_3d": self.conf_3d,
+                        "conf_controller": self.conf_controller,
+                        "conf_sitl": self.conf_sitl,
+                        "conf_plots": self.conf_plots,
+                        "rocket_dim": self.rocket_dim}
+            return configuration.dumps(configuration.Configuration(sections,
+                                                                   self.optional_sections),
+                                       self.get_section_names())
+        return self._save_all("")
+
+    def get_section_names(self):
+        """
+        Names of the values of each section, as the .json has them.
+
+        Returns
+        -------
+        dict
+            {section: [names]}, without the rocket_dim.
+        """
+        names = {"parameters": self.parameter_names,
+                 "conf_3d": self.conf_3d_names,
+                 "conf_controller": self.conf_controller_names,
+                 "conf_sitl": self.conf_sitl_names,
+                 "conf_plots": self.conf_plot_names}
+        return {k: [e.split("=")[0].strip() for e in v if e != "###=#"]
+                for k, v in names.items()}
+
     def _save_all(self, tofile):
         tofile = self._save_parameters(tofile)
         tofile = self._save_conf_3d(tofile)
@@ -354,6 +423,7 @@ class SITLProgram:
         tofile = self._save_conf_sitl(tofile)
         tofile = self._save_conf_plots(tofile)
         tofile = self._save_rocket_dim(tofile)
+        tofile = self._save_optional_sections(tofile)
         return tofile
 
     def _save_parameters(self, tofile):
@@ -399,6 +469,14 @@ class SITLProgram:
             tofile += self.rocket_dim[i] + "\n"
         return tofile
 
+    def _save_optional_sections(self, tofile):
+        for name, section in self.optional_sections.items():
+            tofile += "###=#\n"
+            tofile += name + " = " + section[0] + "\n"
+            for i in range(1, len(section)):
+                tofile += section[i] + "\n"
+        return tofile
+
     def create_file(self, n):
         """
         Create a file named "n" with default parameters.
@@ -413,6 +491,7 @@ class SITLProgram:
         None.
         """
         self.update_path(n)
+        self.optional_sections = {}
         self.parameters = ["Estes_D12.csv",
                            "0.451",
                            "0.351",
@@ -512,8 +591,7 @@ class SITLProgram:
 
         try:
             with open(self.filepath, "w", encoding="utf-8") as file:
-                self.tofile = ""
-                self.tofile = self._save_all(self.tofile)
+                self.tofile = self._get_file_text()
                 file.write(self.tofile)
             print("File Created Successfully")
         except EnvironmentError:
@@ -525,8 +603,11 @@ class SITLProgram:
         """Update the path of the savefile instance (not the actual file) to n."""
         self.filepath = n
         path_without_name = [e+"/" for e in n.split("/") if e != ""][:-1]
+        if n.startswith("/"):
+            # Absolute path in Linux/macOS
+            path_without_name.insert(0, "/")
         self.filepath_without_name = "".join(path_without_name)
-        self.name = n.split("/")[-1][:-4]
+        self.name = os.path.splitext(n.split("/")[-1])[0]
 
     def _create_sitl_directories(self):
         os.makedirs(self.filepath_without_name + 'SITL Modules/Complementary Modules',
@@ -558,8 +639,7 @@ class SITLProgram:
         self.update_path(n)
         try:
             with open(self.filepath, "w", encoding="utf-8") as file:
-                self.tofile = ""
-                self.tofile = self._save_all(self.tofile)
+                self.tofile = self._get_file_text()
                 file.write(self.tofile)
             print("File Created Successfully")
         except EnvironmentError:
@@ -582,8 +662,7 @@ class SITLProgram:
         """
         try:
             with open(self.filepath, "w", encoding="utf-8") as file:
-                self.tofile = ""
-                self.tofile = self._save_all(self.tofile)
+                self.tofile = self._get_file_text()
                 file.write(self.tofile)
                 print(saved_thing + " Saved Successfully")
         except EnvironmentError:
@@ -593,11 +672,8 @@ class SITLProgram:
         # splits the list in the selected indexes
         res = [content[i: j] for i, j in zip([0]+split_index, split_index+[None])]
         # Deletes the # that's left from the ###=# separator
-        del res[1][0]
-        del res[2][0]
-        del res[3][0]
-        del res[4][0]
-        del res[5][0]
+        for i in range(1, len(res)):
+            del res[i][0]
         return res
 
     def read_file(self):
@@ -609,40 +685,91 @@ class SITLProgram:
         None.
         """
         update_old_files_experimental = False
-        if update_old_files_experimental is True:
+        is_txt = Path(self.filepath).suffix.lower() != ".json"
+        if update_old_files_experimental is True and is_txt is True:
             self.open_and_split_file()
             self.check_and_correct_v11_save()
             self.open_and_split_file()
             self.check_and_correct_v20_save()
-        self.open_and_split_file()
-        if self.error_opening_file_flag is False:
-            print("File Opened Successfully")
+        # Parsed and destringed once, while the file doesn't change
+        try:
+            self.configuration = configuration.load(self.filepath, self._parse_file)
+        except EnvironmentError:
+            print("EnvironmentError Opening File")
+            self.error_opening_file_flag = True
+            return
+        except ValueError as error:
+            print("Error Reading the Save File: " + str(error))
+            self.error_opening_file_flag = True
+            return
+        self.parameters = list(self.configuration.sections["parameters"])
+        self.conf_3d = list(self.configuration.sections["conf_3d"])
+        self.conf_controller = list(self.configuration.sections["conf_controller"])
+        self.conf_sitl = list(self.configuration.sections["conf_sitl"])
+        self.conf_plots = list(self.configuration.sections["conf_plots"])
+        self.rocket_dim = list(self.configuration.sections["rocket_dim"])
+        self.optional_sections = copy.deepcopy(self.configuration.optional_sections)
+        self.error_opening_file_flag = False
+        print("File Opened Successfully")
+
+    def _parse_file(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as file:
+            if Path(file_path).suffix.lower() == ".json":
+                parsed = configuration.loads(file.read(), self.get_section_names())
+            else:
+                parsed = self._split_lines(list(file))
+        lengths = {k: len(v) for k, v in self.get_section_names().items()}
+        for problem in configuration.validate(parsed, lengths):
+            print("Error Reading the Save File: " + problem)
+        try:
+            parsed.typed = {
+                "parameters": gui_functions.destring_data(list(parsed.sections["parameters"])),
+                "conf_3d": gui_functions.destring_data(list(parsed.sections["conf_3d"])),
+                "conf_controller": gui_functions.destring_data(
+                    list(parsed.sections["conf_controller"])),
+                "conf_sitl": gui_functions.destring_data(list(parsed.sections["conf_sitl"])),
+                "rocket_dim": self._destring_rocket_dim(parsed.sections["rocket_dim"])}
+        except (ValueError, IndexError):
+            # Destringed when it's used, it can still be opened in the GUI
+            parsed.typed = {}
+        return parsed
+
+    def _split_lines(self, lines):
+        # Sections of the lines of a .txt
+        content = []
+        split_index = []
+        for line in lines:
+            try:
+                content.append(line.split("=")[1].strip())
+            except IndexError:
+                # For the rocket Dimensions
+                content.append(line.split("=")[0].strip())
+        for i, element in enumerate(content):
+            if element == "#":
+                # where to cut the list to send to each tab
+                split_index.append(i)
+        res = self._split_list(content, split_index)
+        res += [[]] * (6 - len(res))
+        sections = dict(zip(configuration.SECTIONS, res[:6]))
+        optional_sections = {}
+        for i in range(6, len(res)):
+            name = lines[split_index[i-1]+1].split("=")[0].strip()
+            optional_sections[name] = res[i]
+        return configuration.Configuration(sections, optional_sections)
 
     def open_and_split_file(self):
         try:
             with open(self.filepath, "r", encoding="utf-8") as file:
-                content = []
-                split_index = []
-                self.raw_data = []
-                for line in file:
-                    self.raw_data.append(line)
-                    try:
-                        content.append(line.split("=")[1].strip())
-                    except IndexError:
-                        # For the rocket Dimensions
-                        content.append(line.split("=")[0].strip())
-                for i, element in enumerate(content):
-                    if element == "#":
-                        # where to cut the list to send to each tab
-                        split_index.append(i)
-                res = self._split_list(content, split_index)
-                self.parameters = res[0]
-                self.conf_3d = res[1]
-                self.conf_controller = res[2]
-                self.conf_sitl = res[3]
-                self.conf_plots = res[4]
-                self.rocket_dim = res[5]
-                self.error_opening_file_flag = False
+                self.raw_data = list(file)
+            parsed = self._split_lines(self.raw_data)
+            self.parameters = parsed.sections["parameters"]
+            self.conf_3d = parsed.sections["conf_3d"]
+            self.conf_controller = parsed.sections["conf_controller"]
+            self.conf_sitl = parsed.sections["conf_sitl"]
+            self.conf_plots = parsed.sections["conf_plots"]
+            self.rocket_dim = parsed.sections["rocket_dim"]
+            self.optional_sections = parsed.optional_sections
+            self.error_opening_file_flag = False
         except EnvironmentError:
             print("EnvironmentError Opening File")
             self.error_opening_file_flag = True
@@ -807,24 +934,30 @@ class SITLProgram:
             print("EnvironmentError Opening File")
         return flag
 
-    # Parameters are set (from the GUI_Setup file) before saving the whole file
+    # Parameters are set (from the GUI_Setup file) before saving the whole file,
+    # the parsed file no longer matches them
     def set_parameters(self, data):
         self.parameters = copy.deepcopy(data)
+        self.configuration = None
 
     def set_conf_3d(self, data):
         self.conf_3d = copy.deepcopy(data)
+        self.configuration = None
 
     def set_conf_controller(self, data):
         self.conf_controller = copy.deepcopy(data)
+        self.configuration = None
 
     def set_conf_sitl(self, data):
         self.conf_sitl = copy.deepcopy(data)
+        self.configuration = None
 
     def set_conf_plots(self, data):
         self.conf_plots = copy.deepcopy(data)
 
     def set_rocket_dim(self, data):
         self.rocket_dim = copy.deepcopy(data)
+        self.configuration = None
 
     def get_parameters(self):
         return copy.deepcopy(self.parameters)
@@ -844,33 +977,101 @@ class SITLProgram:
     def get_rocket_dim(self):
         return copy.deepcopy(self.rocket_dim)
 
+    def get_configuration_destringed(self):
+        """
+        Get the configuration of the file as the GUI tabs return it, so the
+        simulation can run without the GUI.
+
+        Returns
+        -------
+        parameters, conf_3d, conf_controller, conf_sitl, rocket_dim : lists
+            Destringed data.
+        """
+        if self.configuration is not None and self.configuration.typed:
+            # Destringed when the file was parsed
+            typed = self.configuration.typed
+            return (list(typed["parameters"]), list(typed["conf_3d"]),
+                    list(typed["conf_controller"]), list(typed["conf_sitl"]),
+                    copy.deepcopy(typed["rocket_dim"]))
+        parameters = gui_functions.destring_data(self.get_parameters())
+        conf_3d = gui_functions.destring_data(self.get_conf_3d())
+        conf_controller = gui_functions.destring_data(self.get_conf_controller())
+        conf_sitl = gui_functions.destring_data(self.get_conf_sitl())
+        return parameters, conf_3d, conf_controller, conf_sitl, self.get_rocket_dim_destringed()
+
+    def get_rocket_dim_destringed(self):
+        """
+        Get the rocket dimensions as the Draw Rocket tab returns them.
+
+        Returns
+        -------
+        list
+            [checkboxes (bool), [body points], [fin_s], [fin_c]].
+        """
+        return self._destring_rocket_dim(self.rocket_dim)
+
+    def _destring_rocket_dim(self, rocket_dim):
+        d = []
+        body = []
+        fin_s = []
+        fin_c = []
+        flag = "Checkbox"
+        for element in rocket_dim:
+            if flag == "Checkbox" and element in ("True", "False"):
+                d.append(element == "True")
+                continue
+            if element == "Fins_s":
+                flag = "Fins_s"
+                continue
+            if element == "Fins_c":
+                flag = "Fins_c"
+                continue
+            if element == "":
+                continue
+            if flag == "Fins_s":
+                fin_s.append(element)
+            elif flag == "Fins_c":
+                fin_c.append(element)
+            else:
+                flag = "Body"
+                body.append(element)
+        d.append(gui_functions.points_2_float(body))
+        d.append(gui_functions.param_fin_2_float(fin_s))
+        d.append(gui_functions.param_fin_2_float(fin_c))
+        return d
+
+    def set_optional_section(self, name, data):
+        """Set the optional section "name", an empty list deletes it."""
+        if data == []:
+            self.optional_sections.pop(name, None)
+        else:
+            self.optional_sections[name] = copy.deepcopy(data)
+
+    def get_optional_section(self, name):
+        """Return the optional section "name", [] if the file doesn't have it."""
+        return copy.deepcopy(self.optional_sections.get(name, []))
+
     def read_motor_data(self, name):
         """
-        Load motor data into the Savefile instance.
+        Load motor data into the Savefile instance, the file is read only
+        the first time or if it changed.
 
         Parameters
         ----------
         name : string.
-            Save file name.
+            Motor file name (.csv, .eng or .rse, the first motor of the
+            file).
 
         Returns
         -------
         None.
         """
-        # To make sure it starts form t=0 and Thrust = 0
-        self.t_mot = [0]
-        self.thrust_mot = [0]
+        # It starts from t=0 and Thrust = 0
         try:
-            with open(motors_path / name, "r", encoding="utf-8") as file:
-                for line in file:
-                    try:
-                        a = float(line.split(",")[0])
-                        b = float(line.split(",")[1])
-                        self.t_mot.append(a)
-                        self.thrust_mot.append(b)
-                    except ValueError:
-                        pass
-        except EnvironmentError:
+            self.t_mot, self.thrust_mot = motor_database.load_motor_curve(motors_path / name)
+        except (EnvironmentError, ValueError, IndexError):
+            self.t_mot = [0]
+            self.thrust_mot = [0]
             print("Error Reading Motor")
 
     def get_motor_data(self):
@@ -880,6 +1081,7 @@ class SITLProgram:
         Returns
         -------
         list
-            thrust data.
+            thrust data, read only arrays shared with the cache (not
+            copied).
         """
-        return [copy.deepcopy(self.t_mot), copy.deepcopy(self.thrust_mot)]
+        return [self.t_mot, self.thrust_mot]
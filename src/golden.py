@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:18:26 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import io
+import sys
+import math
+import argparse
+import contextlib
+import traceback
+import multiprocessing
+from pathlib import Path
+import numpy as np
+
+
+"""
+Golden trajectories, the flights of the examples compared against stored
+references.
+
+Functions:
+    run_case -- Fly a save file and return its channels.
+    save_reference -- Store the channels of a flight.
+    load_reference -- Read a stored flight.
+    compare -- Differences of each channel against a reference.
+    check -- Fly the examples and compare them, in parallel.
+    update -- Fly the examples and store them as the references.
+
+Run from the folder of AeroVECTOR.py:
+    python -m src.golden                    compare all the examples
+    python -m src.golden -k Landing         only some of them
+    python -m src.golden --update           store the new references
+"""
+
+"""
+Each example runs headless with the same seed, the hardware SITL against
+the virtual board in lockstep, so a flight is repeated exactly. Every step
+is kept (the time and the CHANNELS), full resolution, in a compressed
+.npz in 2 - Tests/Golden Trajectories/.
+
+A channel passes if at every step
+
+    |new - reference| <= atol + rtol*|reference|
+
+the tolerances of each channel are in TOLERANCES and can be replaced for
+all of them from the command line. For each channel the report has the
+maximum deviation and the time of the first step out of the tolerance
+(a flight that is shorter or longer diverges where the other one ended).
+An optimization that only changes the rounding passes with the default
+tolerances, one that changes the flight doesn't.
+
+The examples fly in parallel in spawned processes, a process flies
+several of them one after the other. A run sets up all the state of
+main_simulation, the rocket and the controller, so it's the same flight
+as the first one after opening AeroVECTOR, and the check also catches
+state that leaks from one run to the next.
+"""
+
+
+EXAMPLES_PATH = Path("3 - Examples/")
+REFERENCES_PATH = Path("2 - Tests/Golden Trajectories/")
+SEED = 0
+
+# name: plot of main_simulation.check_which_plot()
+CHANNELS = {
+    "theta": "Pitch Angle [º]",
+    "q": "Pitch Rate [º/s]",
+    "actuator": "Actuator deflection [º]",
+    "aoa": "Angle of Atack [º]",
+    "altitude": "Altitude [m]",
+    "downrange": "Distance Downrange [m]",
+    "v_glob_x": "Global Velocity X [m/s]",
+    "v_glob_z": "Global Velocity Z [m/s]",
+    "thrust": "Thrust [N]",
+    "normal_force": "Normal Force [N]",
+}
+
+# channel: (atol, rtol)
+TOLERANCES = {
+    "t": (1e-9, 0.),
+    "theta": (1e-6, 1e-6),
+    "q": (1e-5, 1e-6),
+    "actuator": (1e-6, 1e-6),
+    "aoa": (1e-5, 1e-6),
+    "altitude": (1e-6, 1e-6),
+    "downrange": (1e-6, 1e-6),
+    "v_glob_x": (1e-6, 1e-6),
+    "v_glob_z": (1e-6, 1e-6),
+    "thrust": (1e-6, 1e-6),
+    "normal_force": (1e-6, 1e-6),
+}
+
+
+def get_examples(path=EXAMPLES_PATH):
+    """
+    Save files of the examples, the ones directly inside each folder.
+
+    Returns
+    -------
+    dict
+        {name: path of the save file}.
+    """
+    examples = {}
+    for folder in sorted(Path(path).iterdir()):
+        if folder.is_dir() is False:
+            continue
+        for filepath in sorted(folder.glob("*.txt")):
+            examples[filepath.stem] = filepath
+    return examples
+
+
+def run_case(filepath, seed=SEED):
+    """
+    Fly a save file headless and return every step of its channels.
+
+    Parameters
+    ----------
+    filepath : string or Path
+        Save file.
+    seed : int, optional
+        Seed of the noise. The default is SEED.
+
+    Returns
+    -------
+    dict
+        {"t": array, channel: array}.
+    """
+    from src.simulation import main_simulation as sim
+    from src.simulation import virtual_board
+    sim.noise_seed = seed
+    with contextlib.redirect_stdout(io.StringIO()):
+        if sim.load_save_file(str(filepath)) is False:
+            raise FileNotFoundError(filepath)
+        sim.data_plot = list(CHANNELS.values())
+        if sim.Activate_SITL is True and sim.enable_python_sitl is False:
+            pc_port, board_port = virtual_board.create_virtual_serial_pair()
+            board = virtual_board.VirtualBoard(
+                virtual_board.ExampleRocketProgram(lockstep=True), board_port)
+            board.start()
+            try:
+                sim.run_selected_simulation(pc_port)
+            finally:
+                board.stop()
+        else:
+            sim.run_selected_simulation()
+    plots = [sim.first_plot, sim.second_plot, sim.third_plot, sim.fourth_plot,
+             sim.fifth_plot, sim.sixth_plot, sim.seventh_plot, sim.eighth_plot,
+             sim.ninth_plot, sim.tenth_plot]
+    trajectory = {"t": np.array(sim.t_plot, dtype=float)}
+    for name, plot in zip(CHANNELS, plots):
+        trajectory[name] = np.array(plot, dtype=float)
+    return trajectory
+
+
+def _get_reference_path(name, path):
+    return Path(path) / (name + ".npz")
+
+
+def save_reference(name, trajectory, path=REFERENCES_PATH):
+    """
+    Store the channels of a flight as the reference of an example.
+
+    Parameters
+    ----------
+    name : string
+        Name of the example.
+    trajectory : dict
+        Returned by run_case().
+    path : Path, optional
+        Folder of the references. The default is REFERENCES_PATH.
+
+    Returns
+    -------
+    None.
+    """
+    try:
+        Path(path).mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(_get_reference_path(name, path), **trajectory)
+    except EnvironmentError:
+        print("Error Saving the Reference of " + name)
+
+
+def load_reference(name, path=REFERENCES_PATH):
+    """
+    Read the reference of an example.
+
+    Returns
+    -------
+    dict or None
+        {"t": array, channel: array}, None if there is no reference.
+    """
+    file_path = _get_reference_path(name, path)
+    if file_path.exists() is False:
+        return None
+    with np.load(file_path) as data:
+        return {e: data[e] for e in data.files}
+
+
+def _compare_channel(t, new, reference, atol, rtol):
+    n = min(len(new), len(reference))
+    deviation = np.abs(new[:n] - reference[:n])
+    # A nan in both is the same value
+    both_nan = np.isnan(new[:n]) & np.isnan(reference[:n])
+    deviation[both_nan] = 0.
+    deviation[np.isnan(deviation)] = math.inf
+    out = deviation > atol + rtol*np.abs(reference[:n])
+    max_deviation = float(np.max(deviation)) if n > 0 else 0.
+    if np.any(out):
+        first = int(np.argmax(out))
+    elif len(new) != len(reference):
+        first = n
+    else:
+        return max_deviation, None
+    return max_deviation, float(t[min(first, len(t)-1)]) if len(t) > 0 else 0.
+
+
+def compare(trajectory, reference, tolerances=None):
+    """
+    Differences of each channel of a flight against its reference.
+
+    Parameters
+    ----------
+    trajectory : dict
+        Returned by run_case().
+    reference : dict
+        Returned by load_reference().
+    tolerances : dict, optional
+        {channel: (atol, rtol)}, the missing ones are the ones of
+        TOLERANCES. The default is None.
+
+    Returns
+    -------
+    dict
+        {channel: {"max_deviation", "first_divergence" [s] or None,
+        "passed"}}.
+    """
+    tolerances = dict(TOLERANCES, **(tolerances or {}))
+    # The time of the longest of both, to place where the shorter ended
+    t = trajectory["t"] if len(trajectory["t"]) >= len(reference["t"]) else reference["t"]
+    differences = {}
+    for name in reference:
+        if name not in trajectory:
+            differences[name] = {"max_deviation": math.inf,
+                                 "first_divergence": 0., "passed": False}
+            continue
+        atol, rtol = tolerances.get(name, (0., 0.))
+        max_deviation, first_divergence = _compare_channel(t, trajectory[name],
+                                                           reference[name], atol, rtol)
+        differences[name] = {"max_deviation": max_deviation,
+                             "first_divergence": first_divergence,
+                             "passed": first_divergence is None}
+    return differences
+
+
+def _run_example(name, filepath, seed, tolerances, update_references, path):
+    # In its own process, returns (name, differences or None, error)
+    try:
+        trajectory = run_case(filepath, seed)
+        if update_references is True:
+            save_reference(name, trajectory, path)
+            return name, None, ""
+        reference = load_reference(name, path)
+        if reference is None:
+            return name, None, "There is no reference, run with --update"
+        return name, compare(trajectory, reference, tolerances), ""
+    except Exception:
+        return name, None, traceback.format_exc()
+
+
+def _run_examples(names, seed, tolerances, update_references, path, processes):
+    examples = get_examples()
+    if names:
+        examples = {k: v for k, v in examples.items() if any(e in k for e in names)}
+    # spawn, so the workers don't inherit the GUI
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes) as pool:
+        return pool.starmap(_run_example, [(name, filepath, seed, tolerances,
+                                            update_references, path)
+                                           for name, filepath in examples.items()],
+                            chunksize=1)
+
+
+def check(names=None, tolerances=None, seed=SEED, path=REFERENCES_PATH,
+          processes=None):
+    """
+    Fly the examples and compare them with their references.
+
+    Parameters
+    ----------
+    names : list, optional
+        Examples to run, an example runs if its name contains one of
+        them. The default is None (all of them).
+    tolerances : dict, optional
+        See compare(). The default is None.
+    seed : int, optional
+        Seed of the noise, the one of the references. The default is SEED.
+    path : Path, optional
+        Folder of the references. The default is REFERENCES_PATH.
+    processes : int, optional
+        Number of processes. The default is the number of CPUs.
+
+    Returns
+    -------
+    bool
+        True if all the examples passed.
+    """
+    passed = True
+    for name, differences, error in _run_examples(names, seed, tolerances, False,
+                                                  path, processes):
+        if error != "":
+            passed = False
+            print("{:<32}ERROR\n{}".format(name, error))
+            continue
+        failed = [k for k, v in differences.items() if v["passed"] is False]
+        passed = passed and len(failed) == 0
+        print("{:<32}{}".format(name, "passed" if len(failed) == 0 else "DIVERGED"))
+        for channel, e in differences.items():
+            if e["passed"] is True and e["max_deviation"] == 0:
+                continue
+            if e["first_divergence"] is None:
+                divergence = ""
+            else:
+                divergence = "from t = {:.4f} s".format(e["first_divergence"])
+            print("    {:<16}max {:<12.4g}{}".format(channel, e["max_deviation"],
+                                                     divergence))
+    return passed
+
+
+def update(names=None, seed=SEED, path=REFERENCES_PATH, processes=None):
+    """
+    Fly the examples and store them as the references, see check().
+
+    Returns
+    -------
+    bool
+        True if all of them were stored.
+    """
+    stored = True
+    for name, _, error in _run_examples(names, seed, None, True, path, processes):
+        if error != "":
+            stored = False
+            print("{:<32}ERROR\n{}".format(name, error))
+        else:
+            print("{:<32}stored".format(name))
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR golden trajectories")
+    parser.add_argument("-k", nargs="*", metavar="NAME",
+                        help="run the examples that contain these names")
+    parser.add_argument("--update", action="store_true",
+                        help="store the flights as the new references")
+    parser.add_argument("--atol", type=float,
+                        help="absolute tolerance of all the channels")
+    parser.add_argument("--rtol", type=float,
+                        help="relative tolerance of all the channels")
+    parser.add_argument("--processes", type=int)
+    args = parser.parse_args()
+    if args.update is True:
+        return 0 if update(args.k, processes=args.processes) is True else 1
+    tolerances = None
+    if args.atol is not None or args.rtol is not None:
+        tolerances = {k: (args.atol if args.atol is not None else v[0],
+                          args.rtol if args.rtol is not None else v[1])
+                      for k, v in TOLERANCES.items()}
+    return 0 if check(args.k, tolerances, processes=args.processes) is True else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -77,6 +77,72 @@ def points_2_param_fins(s):
     return p_string
 
 
+def destring_data(data):
+    """
+    Transform a list of strings into variables.
+
+    Parameters
+    ----------
+    data : list of strings
+        Data to convert.
+
+    Returns
+    -------
+    list of variables
+        Destringed data.
+    """
+
+    def is_number(s):
+        """Return True is string is a number."""
+        try:
+            float(s)
+            return True
+        except ValueError:
+            return False
+
+    def string_or_bool(s):
+        """Return True if string == True."""
+        if s == "True":
+            return True
+        if s == "False":
+            return False
+        return s
+
+    def is_baudrate(f):
+        """If f > 9000 almost certainly it's a baudrate."""
+        return bool(f > 9000)
+    for i, elem in enumerate(data):
+        if is_number(data[i]):
+            data[i] = float(data[i])
+            if is_baudrate(data[i]):
+                data[i] = int(data[i])
+        else:
+            data[i] = string_or_bool(data[i])
+    return data
+
+
+def points_2_float(l):
+    """Convert a list of "x,z" strings into a nested list of floats."""
+    l2 = []
+    for element in l:
+        a = element.split(",")
+        l2.append([float(a[0]), float(a[1])])
+    return l2
+
+
+def param_fin_2_float(l):
+    """Convert the fin parameters (strings) into floats."""
+    l2 = []
+    zero = 0.0000000001
+    for i in range(2):
+        a = l[i].split(",")
+        l2.append([float(a[0]) + zero, float(a[1]) + zero])
+    for i in range(2):
+        a = l[i+2]
+        l2.append(float(a) + zero)
+    return l2
+
+
 class ActiveFileLabel:
     """
     Creates a label with the active file name.
@@ -450,34 +516,7 @@ class Tab:
         list of variables
             Destringed data.
         """
-
-        def is_number(s):
-            """Return True is string is a number."""
-            try:
-                float(s)
-                return True
-            except ValueError:
-                return False
-
-        def string_or_bool(s):
-            """Return True if string == True."""
-            if s == "True":
-                return True
-            if s == "False":
-                return False
-            return s
-
-        def is_baudrate(f):
-            """If f > 9000 almost certainly it's a baudrate."""
-            return bool(f > 9000)
-        for i, elem in enumerate(data):
-            if is_number(data[i]):
-                data[i] = float(data[i])
-                if is_baudrate(data[i]):
-                    data[i] = int(data[i])
-            else:
-                data[i] = string_or_bool(data[i])
-        return data
+        return destring_data(data)
 
     def get_configuration_destringed(self):
         """
@@ -741,12 +780,7 @@ class TabWithCanvas(Tab):
         Nested list of floats.
             points of the part "n".
         """
-        l = copy.deepcopy(self.points[n])
-        l2 = []
-        for element in l:
-            a = element.split(",")
-            l2.append([float(a[0]), float(a[1])])
-        return copy.deepcopy(l2)
+        return points_2_float(copy.deepcopy(self.points[n]))
 
     def get_param_fin(self, n):
         """
@@ -778,16 +812,7 @@ class TabWithCanvas(Tab):
         Nested list of floats.
             points of the part "n".
         """
-        l = copy.deepcopy(self.param_fin[n])
-        l2 = []
-        zero = 0.0000000001
-        for i in range(2):
-            a = l[i].split(",")
-            l2.append([float(a[0]) + zero, float(a[1]) + zero])
-        for i in range(2):
-            a = l[i+2]
-            l2.append(float(a) + zero)
-        return copy.deepcopy(l2)
+        return param_fin_2_float(copy.deepcopy(self.param_fin[n]))
 
     def create_canvas(self, canvas_width, canvas_height):
         """
@@ -11,6 +11,7 @@ from tkinter import filedialog
 import sys
 import os
 from src import files
+from src import motor_database
 from src.gui import gui_functions as fun
 from src.simulation import main_simulation as sim
 
@@ -92,6 +93,7 @@ def create_file_tab(notebook):
                                                 defaultextension=".txt",
                                                 title="New File",
                                                 filetypes=[("Save File", ".txt"),
+                                                           ("Structured Save File", ".json"),
                                                            ("All Files", ".*")])
         if filepath == "":
             return
@@ -118,7 +120,7 @@ def create_file_tab(notebook):
             initial_path = savefile.filepath
         filepath = filedialog.askopenfilename(initialdir=initial_path,
                                               defaultextension=".txt",
-                                              filetypes=(("Save Files", "*.txt"),
+                                              filetypes=(("Save Files", "*.txt *.json"),
                                                          ("All Files", "*.*")))
         if filepath == "":
             return
@@ -164,6 +166,7 @@ def create_file_tab(notebook):
                                                 defaultextension=".txt",
                                                 title="Save As",
                                                 filetypes=[("Save File", ".txt"),
+                                                           ("Structured Save File", ".json"),
                                                            ("All Files", ".*")])
         if filepath == "":
             return
@@ -231,6 +234,53 @@ def create_parameters_tab(notebook):
     save_file_button = tk.Button(param_file_tab.tab, text="Save",
                                  command=button_save_parameters, width=20)
     save_file_button.place(x=432, y=535)
+
+    def search_motors():
+        # Searches the local database, the chosen motor is written to
+        # Motors/ and selected
+        if motor_database.DATABASE_PATH.exists() is False:
+            print("There is no motor database, build it with: "
+                  "python -m src.motor_database --build <folder>")
+            return
+        database = motor_database.MotorDatabase()
+        window = tk.Toplevel(param_file_tab.tab)
+        window.title("Search Motors")
+        search_entry = tk.Entry(window, width=60)
+        search_entry.grid(row=0, column=0, sticky="EW")
+        listbox = tk.Listbox(window, width=80, height=25, font=("Courier", 9))
+        listbox.grid(row=1, column=0, columnspan=2, sticky="NESW")
+        results = []
+
+        def update_results(event=None):
+            results[:] = database.search(search_entry.get(), limit=500)
+            listbox.delete(0, tk.END)
+            for e in results:
+                listbox.insert(tk.END, "{:<20}{:<16}{:<6}{:>5g} mm{:>9.1f} Ns{:>7.2f} s".format(
+                    e["name"], e["manufacturer"], e["impulse_class"],
+                    e["diameter"], e["total_impulse"], e["burn_time"]))
+
+        def use_motor():
+            if len(listbox.curselection()) == 0:
+                return
+            name = database.export(results[listbox.curselection()[0]]["id"],
+                                   files.motors_path)
+            param_file_tab.combobox[0]["values"] = files.get_motor_names()
+            param_file_tab.combobox[0].set(name)
+            savefile.read_motor_data(name)
+
+        def close():
+            database.close()
+            window.destroy()
+
+        tk.Button(window, text="Use Motor", command=use_motor,
+                  width=20).grid(row=0, column=1)
+        search_entry.bind("<KeyRelease>", update_results)
+        listbox.bind("<Double-Button-1>", lambda event: use_motor())
+        window.protocol("WM_DELETE_WINDOW", close)
+        update_results()
+    search_motors_button = tk.Button(param_file_tab.tab, text="Search Motors",
+                                     command=search_motors, width=20)
+    search_motors_button.place(x=432, y=500)
     param_file_tab.create_active_file_label()
     param_file_tab.configure()
 
@@ -607,6 +657,17 @@ def create_simulation_setup_tab(notebook):
     save_conf_controller_button = tk.Button(sim_setup_tab.tab, text="Save",
                                             command=button_save, width=20)
     save_conf_controller_button.place(x=432, y=535)
+
+    # Not saved, it only prints the time of each stage of the next runs
+    profile_run = tk.BooleanVar(value=sim.profile_run)
+
+    def checkbox_profile_run():
+        sim.profile_run = profile_run.get()
+
+    profile_run_checkbox = tk.Checkbutton(sim_setup_tab.tab, text="Profile the Run",
+                                          variable=profile_run,
+                                          command=checkbox_profile_run)
+    profile_run_checkbox.place(x=432, y=505)
     sim_setup_tab.create_active_file_label()
     sim_setup_tab.configure(10)
 
@@ -625,6 +686,12 @@ def create_run_sim_tab(notebook):
                                  "Altitude [m]",
                                  "Distance Downrange [m]",
                                  "Angle of Atack [º]",
+                                 "Yaw Angle [º]",
+                                 "Yaw Rate [º/s]",
+                                 "Roll Angle [º]",
+                                 "Roll Rate [º/s]",
+                                 "Yaw Actuator deflection [º]",
+                                 "Distance Crossrange [m]",
                                  "CP Position [m]",
                                  "Mass [kg]",
                                  "Iy [kg*m^2]",
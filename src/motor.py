@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 17:21:08 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import numpy as np
+
+
+"""
+Handles the motor.
+
+Classes:
+    Motor -- Thrust curve preprocessed for fast lookups.
+"""
+
+"""
+The thrust curve is processed once, when it's set: its total impulse,
+burn time, average and maximum thrust, the impulse up to each point of
+the curve, and a table with a uniform time step that has, for each step,
+the segment of the curve where it starts. A lookup is an index in that
+table (plus one point if the step crosses one), not a search, so it
+costs the same for a curve of 10 points as for one of 1000. The thrust
+is then interpolated in its segment as np.interp does, so it's the
+same thrust as with the raw curve. thrust_table has the curve resampled
+to the same uniform step, for plots and exports.
+
+The mass, Iy and xcg go from liftoff to burnout with a "mass time"
+between 0 and the burn time:
+    time -- The time since ignition, they change linearly with time (the
+            original model).
+    impulse -- The burn time times the fraction of the total impulse
+               delivered, the propellant burns in proportion to the
+               thrust.
+"""
+
+
+class Motor:
+    """
+    Thrust curve of the motor.
+
+    Methods:
+        setup -- Process a thrust curve.
+        get_thrust -- Thrust at a time since ignition.
+        get_impulse -- Impulse delivered up to a time since ignition.
+        get_mass_time -- Time of the mass depletion.
+        get_state -- Thrust and mass time with one lookup.
+        read_save_file_section -- Options from the save file.
+        get_save_file_section -- Options as they're stored in the save file.
+    """
+
+    mass_depletion_models = ["time", "impulse"]
+
+    def __init__(self, time_step=0.001):
+        """
+        Parameters
+        ----------
+        time_step : float, optional
+            Step of the lookup table [s]. The default is 0.001.
+        """
+        self.time_step = time_step
+        self.mass_depletion = "time"
+        self.setup([0.], [0.])
+
+    def read_save_file_section(self, section):
+        """
+        Set the options from the save file section.
+
+        Parameters
+        ----------
+        section : list
+            Strings "name, value", the names are mass_depletion (time or
+            impulse) and time_step [s].
+
+        Returns
+        -------
+        None.
+        """
+        for row in section:
+            if row == "":
+                continue
+            row = [e.strip() for e in row.split(",")]
+            try:
+                if row[0] == "mass_depletion" and row[1] in self.mass_depletion_models:
+                    self.mass_depletion = row[1]
+                elif row[0] == "time_step" and float(row[1]) > 0:
+                    self.time_step = float(row[1])
+                else:
+                    print("Error Reading the Motor Model: " + ", ".join(row))
+            except (IndexError, ValueError):
+                print("Error Reading the Motor Model: " + ", ".join(row))
+
+    def get_save_file_section(self):
+        """
+        Return the options as they're stored in the save file.
+
+        Returns
+        -------
+        list
+            Strings "name, value".
+        """
+        return ["mass_depletion, " + self.mass_depletion,
+                "time_step, " + str(self.time_step)]
+
+    def setup(self, t, thrust):
+        """
+        Process a thrust curve.
+
+        Parameters
+        ----------
+        t : list
+            Time since ignition, increasing (repeated times are steps).
+        thrust : list
+            Thrust at each time.
+
+        Returns
+        -------
+        None.
+        """
+        # Python floats, faster than numpy ones for a single point
+        self.t = np.asarray(t, dtype=float).tolist()
+        self.thrust = np.asarray(thrust, dtype=float).tolist()
+        n = len(self.t)
+        self.burn_time = self.t[-1]
+        self.max_thrust = max(self.thrust)
+        self._slope = [0.] * n
+        self.impulse = [0.] * n
+        for i in range(n-1):
+            dt = self.t[i+1] - self.t[i]
+            if dt > 0:
+                self._slope[i] = (self.thrust[i+1]-self.thrust[i]) / dt
+            self.impulse[i+1] = self.impulse[i] + 0.5*dt*(self.thrust[i]+self.thrust[i+1])
+        self.total_impulse = self.impulse[-1]
+        if self.burn_time > 0:
+            self.average_thrust = self.total_impulse / self.burn_time
+        else:
+            self.average_thrust = 0.
+        self._setup_table()
+
+    def _setup_table(self):
+        # A million steps at most, longer curves get a longer step
+        time_step = max(self.time_step, self.burn_time / 1e6)
+        self._inverse_step = 1 / time_step
+        self.t_table = np.arange(int(self.burn_time * self._inverse_step) + 2) * time_step
+        self.thrust_table = np.interp(self.t_table, self.t, self.thrust)
+        # Last point of the curve at or before the start of each step
+        segments = np.searchsorted(self.t, self.t_table, side="right") - 1
+        self._segments = np.minimum(np.maximum(segments, 0), len(self.t)-1).tolist()
+
+    def _get_segment(self, x):
+        # t[i] <= x < t[i+1], for 0 <= x < burn_time
+        i = self._segments[int(x * self._inverse_step)]
+        while x >= self.t[i+1]:
+            i += 1
+        return i
+
+    def get_thrust(self, x):
+        """
+        Thrust at a time since ignition, the first point of the curve
+        before it and the last one after the burnout.
+
+        Parameters
+        ----------
+        x : float
+            Time since ignition.
+
+        Returns
+        -------
+        float
+            Thrust.
+        """
+        if x >= self.burn_time:
+            return self.thrust[-1]
+        if x < self.t[0]:
+            return self.thrust[0]
+        i = self._get_segment(x)
+        return self._slope[i]*(x - self.t[i]) + self.thrust[i]
+
+    def get_impulse(self, x):
+        """
+        Impulse delivered up to a time since ignition.
+
+        Parameters
+        ----------
+        x : float
+            Time since ignition.
+
+        Returns
+        -------
+        float
+            Impulse.
+        """
+        if x >= self.burn_time:
+            return self.total_impulse
+        if x < self.t[0]:
+            return 0.
+        i = self._get_segment(x)
+        thrust = self._slope[i]*(x - self.t[i]) + self.thrust[i]
+        return self.impulse[i] + 0.5*(x - self.t[i])*(self.thrust[i] + thrust)
+
+    def get_mass_time(self, x):
+        """Time of the mass depletion, between 0 and the burn time."""
+        return self.get_state(x)[1]
+
+    def get_state(self, x):
+        """
+        Thrust and time of the mass depletion with one lookup.
+
+        Parameters
+        ----------
+        x : float
+            Time since ignition.
+
+        Returns
+        -------
+        thrust : float
+            Thrust.
+        mass_time : float
+            Between 0 (liftoff) and the burn time (burnout).
+        """
+        if x >= self.burn_time:
+            return self.thrust[-1], self.burn_time
+        if x < self.t[0]:
+            if self.mass_depletion == "time":
+                return self.thrust[0], max(x, 0.)
+            return self.thrust[0], 0.
+        i = self._get_segment(x)
+        thrust = self._slope[i]*(x - self.t[i]) + self.thrust[i]
+        if self.mass_depletion == "time":
+            return thrust, max(x, 0.)
+        if self.total_impulse <= 0:
+            return thrust, 0.
+        impulse = self.impulse[i] + 0.5*(x - self.t[i])*(self.thrust[i] + thrust)
+        return thrust, self.burn_time * impulse / self.total_impulse
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 18:12:40 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import os
+import sys
+import math
+import sqlite3
+import argparse
+from pathlib import Path
+import xml.etree.ElementTree as ET
+import numpy as np
+
+
+"""
+Motor files and the local motor database.
+
+Classes:
+    MotorDatabase -- Index of many motors in one SQLite file.
+
+Functions:
+    parse_csv -- Motor of a two column .csv.
+    parse_eng -- Motors of a RASP .eng.
+    parse_rse -- Motors of a RockSim .rse.
+    read_motor_file -- Motors of a file of any of them.
+    load_motor_curve -- Curve of a motor file for the simulation, cached.
+    clear_cache -- Forget the cached curves.
+    write_eng -- Write a motor as a RASP .eng.
+    get_impulse_class -- Letter of a total impulse.
+"""
+
+"""
+A motor is a dict with its name, manufacturer, diameter and length [mm],
+delays, propellant and total mass [kg], its curve (t [s] and thrust [N]
+lists, as in the file) and what's computed from the curve: total_impulse,
+average_thrust, max_thrust, burn_time and impulse_class.
+
+The database is built once from a folder with the files of many motors
+(a download of thrustcurve.org, the files can be in subfolders) and
+doesn't need a network. The metadata is a table with indices, so a
+search of hundreds of motors is a query, and the curves are stored
+already parsed, as float64 blobs. The file is memory mapped, reading a
+curve doesn't parse nor copy a file.
+
+The curves of the simulation are cached by load_motor_curve(), a file is
+read once per process while it doesn't change (its modification time and
+size are checked, with a stat, each time). The arrays are read only and
+shared, a batch of runs of a motor neither reads the file again nor
+copies its curve.
+
+Build it from the folder of AeroVECTOR.py:
+    python -m src.motor_database --build "path/to/thrustcurve dump"
+    python -m src.motor_database D12            search
+"""
+
+
+MOTOR_EXTENSIONS = [".csv", ".eng", ".rse"]
+DATABASE_PATH = Path("Motors/Database/motors.sqlite")
+
+# {absolute path: ((mtime, size), t, thrust)}
+_curve_cache = {}
+
+_COLUMNS = ["name", "manufacturer", "impulse_class", "diameter", "length",
+            "delays", "propellant_mass", "total_mass", "total_impulse",
+            "average_thrust", "max_thrust", "burn_time", "source"]
+
+
+def get_impulse_class(total_impulse):
+    """
+    Letter of the total impulse [N*s], A is up to 2.5 N*s and each
+    letter doubles it.
+
+    Returns
+    -------
+    string
+        1/4A, 1/2A, A, B, ...
+    """
+    if total_impulse <= 0.625:
+        return "1/4A"
+    if total_impulse <= 1.25:
+        return "1/2A"
+    n = max(0, math.ceil(math.log2(total_impulse / 2.5) - 1e-9))
+    return chr(ord("A") + n)
+
+
+def _new_motor(name="", manufacturer="", diameter=0., length=0., delays="",
+               propellant_mass=0., total_mass=0.):
+    return {"name": name, "manufacturer": manufacturer, "diameter": diameter,
+            "length": length, "delays": delays,
+            "propellant_mass": propellant_mass, "total_mass": total_mass,
+            "t": [], "thrust": []}
+
+
+def _complete(motor):
+    # Values of the curve
+    t = motor["t"]
+    thrust = motor["thrust"]
+    impulse = 0.
+    for i in range(len(t)-1):
+        impulse += 0.5 * (t[i+1]-t[i]) * (thrust[i]+thrust[i+1])
+    if len(t) > 0 and t[0] > 0:
+        # The curves start at (0, 0)
+        impulse += 0.5 * t[0] * thrust[0]
+    motor["total_impulse"] = impulse
+    motor["burn_time"] = t[-1] if len(t) > 0 else 0.
+    motor["max_thrust"] = max(thrust) if len(thrust) > 0 else 0.
+    if motor["burn_time"] > 0:
+        motor["average_thrust"] = impulse / motor["burn_time"]
+    else:
+        motor["average_thrust"] = 0.
+    motor["impulse_class"] = get_impulse_class(impulse)
+    return motor
+
+
+def parse_csv(text, name=""):
+    """
+    Motor of the two column .csv of the folder Motors, the rows that
+    aren't two numbers are skipped.
+
+    Parameters
+    ----------
+    text : string
+        Contents of the file.
+    name : string, optional
+        Name of the file, Manufacturer_Name. The default is "".
+
+    Returns
+    -------
+    list
+        One motor.
+    """
+    manufacturer, _, motor_name = Path(name).stem.rpartition("_")
+    motor = _new_motor(motor_name, manufacturer)
+    for line in text.splitlines():
+        row = line.split(",")
+        try:
+            a = float(row[0])
+            b = float(row[1])
+            motor["t"].append(a)
+            motor["thrust"].append(b)
+        except (ValueError, IndexError):
+            if row[0].strip('"') == "motor:" and len(row) > 1:
+                # "Manufacturer Name"
+                motor["name"] = row[1].strip().strip('"')
+                if motor["name"].startswith(manufacturer + " "):
+                    motor["name"] = motor["name"][len(manufacturer)+1:]
+    return [_complete(motor)]
+
+
+def parse_eng(text, name=""):
+    """
+    Motors of a RASP .eng, a file can have many.
+
+    Each motor is a header "name diameter length delays propellant_mass
+    total_mass manufacturer" ([mm] and [kg]) followed by its points, one
+    "t thrust" per line. The comments start with ;.
+
+    Returns
+    -------
+    list
+        Motors in the file.
+    """
+    motors = []
+    motor = None
+    for line in text.splitlines():
+        line = line.split(";")[0].strip()
+        if line == "":
+            continue
+        row = line.split()
+        try:
+            values = [float(e) for e in row]
+        except ValueError:
+            values = None
+        if values is None:
+            if len(row) < 7:
+                raise ValueError("Wrong header in " + name + ": " + line)
+            motor = _new_motor(row[0], " ".join(row[6:]), float(row[1]),
+                               float(row[2]), row[3], float(row[4]),
+                               float(row[5]))
+            motors.append(motor)
+        elif motor is not None:
+            # Some files have many points in a line
+            motor["t"].extend(values[0::2])
+            motor["thrust"].extend(values[1::2])
+    return [_complete(e) for e in motors]
+
+
+def parse_rse(text, name=""):
+    """
+    Motors of a RockSim .rse (XML), with the dimensions in mm and the
+    masses in g.
+
+    Returns
+    -------
+    list
+        Motors in the file.
+    """
+    motors = []
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as error:
+        raise ValueError("Wrong XML in " + name + ": " + str(error))
+    for engine in root.iter("engine"):
+        a = engine.attrib
+        motor = _new_motor(a.get("code", ""), a.get("mfg", ""),
+                           float(a.get("dia", 0)), float(a.get("len", 0)),
+                           a.get("delays", "").replace(",", "-"),
+                           float(a.get("propWt", 0)) / 1000,
+                           float(a.get("initWt", 0)) / 1000)
+        for point in engine.iter("eng-data"):
+            motor["t"].append(float(point.attrib["t"]))
+            motor["thrust"].append(float(point.attrib["f"]))
+        motors.append(_complete(motor))
+    return motors
+
+
+_PARSERS = {".csv": parse_csv, ".eng": parse_eng, ".rse": parse_rse}
+
+
+def read_motor_file(file_path):
+    """
+    Motors of a .csv, .eng or .rse file.
+
+    Parameters
+    ----------
+    file_path : string or Path
+        Path of the file.
+
+    Returns
+    -------
+    list
+        Motors in the file.
+    """
+    file_path = Path(file_path)
+    parser = _PARSERS.get(file_path.suffix.lower())
+    if parser is None:
+        raise ValueError("Not a motor file: " + str(file_path))
+    with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+        return parser(file.read(), file_path.name)
+
+
+def load_motor_curve(file_path):
+    """
+    Curve of the first motor of a file, starting at (0, 0) as the
+    simulation uses it. It's read again only if the file changed.
+
+    Parameters
+    ----------
+    file_path : string or Path
+        Path of the file.
+
+    Returns
+    -------
+    t : numpy array
+        Time, read only.
+    thrust : numpy array
+        Thrust, read only.
+    """
+    key = os.path.abspath(file_path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _curve_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    motor = read_motor_file(file_path)[0]
+    t = np.array([0.] + motor["t"])
+    thrust = np.array([0.] + motor["thrust"])
+    t.flags.writeable = False
+    thrust.flags.writeable = False
+    _curve_cache[key] = (version, t, thrust)
+    return t, thrust
+
+
+def clear_cache():
+    """Forget the cached curves."""
+    _curve_cache.clear()
+
+
+def write_eng(motor, file_path):
+    """
+    Write a motor as a RASP .eng.
+
+    Parameters
+    ----------
+    motor : dict
+        Motor.
+    file_path : string or Path
+        Path of the file.
+
+    Returns
+    -------
+    None.
+    """
+    lines = ["; " + motor["manufacturer"] + " " + motor["name"],
+             "{} {:g} {:g} {} {:.5g} {:.5g} {}".format(
+                 motor["name"].replace(" ", "_"), motor["diameter"], motor["length"],
+                 motor["delays"] or "0", motor["propellant_mass"],
+                 motor["total_mass"], motor["manufacturer"].replace(" ", "_"))]
+    for t, thrust in zip(motor["t"], motor["thrust"]):
+        lines.append("{!r} {!r}".format(float(t), float(thrust)))
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+class MotorDatabase:
+    """
+    Index of many motors in one SQLite file.
+
+    Methods:
+        build -- Index the motor files of a folder.
+        search -- Motors that match a text, class or diameter.
+        get_motor -- Metadata and curve of a motor.
+        get_curve -- Curve of a motor.
+        export -- Write a motor as a .eng.
+        close -- Close the file.
+    """
+
+    def __init__(self, file_path=DATABASE_PATH, mmap_size=256*2**20):
+        """
+        Parameters
+        ----------
+        file_path : string or Path, optional
+            The database. The default is DATABASE_PATH.
+        mmap_size : int, optional
+            Bytes of the file that are memory mapped. The default is
+            256 MiB.
+        """
+        self.file_path = Path(file_path)
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.file_path))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA mmap_size = " + str(int(mmap_size)))
+        self._create_tables()
+
+    def _create_tables(self):
+        columns = ", ".join(e + (" TEXT" if e in ("name", "manufacturer",
+                                                  "impulse_class", "delays", "source")
+                                 else " REAL") for e in _COLUMNS)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS motors "
+                                    "(id INTEGER PRIMARY KEY, " + columns + ", "
+                                    "t BLOB, thrust BLOB)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS motors_class "
+                                    "ON motors (impulse_class, diameter)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS motors_impulse "
+                                    "ON motors (total_impulse)")
+
+    def build(self, folder):
+        """
+        Replace the database with the motor files of a folder and its
+        subfolders, the ones that can't be read are skipped.
+
+        Parameters
+        ----------
+        folder : string or Path
+            Folder with the files.
+
+        Returns
+        -------
+        int
+            Number of motors.
+        """
+        rows = []
+        for file_path in sorted(Path(folder).rglob("*")):
+            if file_path.suffix.lower() not in MOTOR_EXTENSIONS:
+                continue
+            try:
+                motors = read_motor_file(file_path)
+            except (EnvironmentError, ValueError, KeyError):
+                print("Error Reading the Motor File: " + str(file_path))
+                continue
+            for motor in motors:
+                if len(motor["t"]) == 0:
+                    continue
+                motor["source"] = str(file_path)
+                rows.append([motor[e] for e in _COLUMNS]
+                            + [np.asarray(motor["t"], dtype=float).tobytes(),
+                               np.asarray(motor["thrust"], dtype=float).tobytes()])
+        with self.connection:
+            self.connection.execute("DELETE FROM motors")
+            self.connection.executemany(
+                "INSERT INTO motors (" + ", ".join(_COLUMNS) + ", t, thrust) "
+                "VALUES (" + ", ".join(["?"] * (len(_COLUMNS)+2)) + ")", rows)
+        return len(rows)
+
+    def search(self, text="", impulse_class=None, diameter=None, limit=None):
+        """
+        Motors that match, sorted by total impulse.
+
+        Parameters
+        ----------
+        text : string, optional
+            Part of the name or the manufacturer, any case. The default
+            is "" (all).
+        impulse_class : string, optional
+            Letter of the total impulse. The default is None (all).
+        diameter : float, optional
+            Diameter [mm], +- 0.5 mm. The default is None (all).
+        limit : int, optional
+            Maximum number of motors. The default is None.
+
+        Returns
+        -------
+        list
+            Metadata of the motors, dicts with their id and the columns.
+        """
+        query = "SELECT id, " + ", ".join(_COLUMNS) + " FROM motors WHERE 1"
+        parameters = []
+        for word in text.split():
+            query += " AND (name LIKE ? OR manufacturer LIKE ?)"
+            parameters += ["%" + word + "%"] * 2
+        if impulse_class is not None:
+            query += " AND impulse_class = ?"
+            parameters.append(impulse_class)
+        if diameter is not None:
+            query += " AND diameter BETWEEN ? AND ?"
+            parameters += [diameter - 0.5, diameter + 0.5]
+        query += " ORDER BY total_impulse, name"
+        if limit is not None:
+            query += " LIMIT " + str(int(limit))
+        return [dict(e) for e in self.connection.execute(query, parameters)]
+
+    def get_curve(self, motor_id):
+        """
+        Curve of a motor.
+
+        Returns
+        -------
+        t : numpy array
+        thrust : numpy array
+        """
+        row = self.connection.execute("SELECT t, thrust FROM motors WHERE id = ?",
+                                      (motor_id,)).fetchone()
+        if row is None:
+            raise KeyError(motor_id)
+        return np.frombuffer(row["t"]), np.frombuffer(row["thrust"])
+
+    def get_motor(self, motor_id):
+        """Metadata and curve (t and thrust lists) of a motor."""
+        row = self.connection.execute("SELECT id, " + ", ".join(_COLUMNS) +
+                                      " FROM motors WHERE id = ?",
+                                      (motor_id,)).fetchone()
+        if row is None:
+            raise KeyError(motor_id)
+        motor = dict(row)
+        t, thrust = self.get_curve(motor_id)
+        motor["t"] = t.tolist()
+        motor["thrust"] = thrust.tolist()
+        return motor
+
+    def export(self, motor_id, folder=Path("Motors/")):
+        """
+        Write a motor as a .eng in a folder (the one of the motors of the
+        simulation by default).
+
+        Returns
+        -------
+        string
+            Name of the file, Manufacturer_Name.eng.
+        """
+        motor = self.get_motor(motor_id)
+        name = (motor["manufacturer"] + "_" + motor["name"]).replace(" ", "_")
+        name = "".join(e for e in name if e.isalnum() or e in "_-.") + ".eng"
+        write_eng(motor, Path(folder) / name)
+        return name
+
+    def close(self):
+        """Close the file."""
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR motor database")
+    parser.add_argument("text", nargs="*", help="search the name or manufacturer")
+    parser.add_argument("--build", metavar="FOLDER",
+                        help="index the motor files of a folder")
+    parser.add_argument("--class", dest="impulse_class")
+    parser.add_argument("--diameter", type=float)
+    parser.add_argument("--database", default=str(DATABASE_PATH))
+    args = parser.parse_args()
+    database = MotorDatabase(args.database)
+    if args.build is not None:
+        print(database.build(args.build), "motors indexed")
+        if not (args.text or args.impulse_class or args.diameter):
+            database.close()
+            return 0
+    for e in database.search(" ".join(args.text), args.impulse_class, args.diameter):
+        print("{:>5} {:<20}{:<16}{:<6}{:>6g} mm{:>10.1f} Ns{:>8.2f} s".format(
+            e["id"], e["name"], e["manufacturer"], e["impulse_class"],
+            e["diameter"], e["total_impulse"], e["burn_time"]))
+    database.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,34 +5,97 @@ Created on Sat Jun 19 15:14:18 2021
 @author: Guido di Pasquo
 """
 
+import sys
+from pathlib import Path
 import numpy as np
-from src.simulation import main_simulation as sim
+from src.simulation.module_manager import module_manager
 
 DEG2RAD = np.pi/180
 RAD2DEG = 1/DEG2RAD
 
 
+"""
+Functions available to the Python SITL modules (Sim.millis(), etc.).
+
+They are answered by a backend, by default the simulation running in the
+same process. When the module runs in its own process the backend is a
+sitl_process.SharedMemoryBackend, set with set_backend().
+"""
+
+
+class SimulationBackend:
+    """Reads and writes the variables of main_simulation directly."""
+
+    def __init__(self):
+        # Imported here so a module running in another process doesn't
+        # load the simulation and the GUI
+        from src.simulation import main_simulation
+        self.sim = main_simulation
+
+    def millis(self):
+        return int(self.sim.t * 1000)
+
+    def micros(self):
+        return int(self.sim.t * 1000000)
+
+    def getSimData(self):
+        sim = self.sim
+        data = [sim.send_gyro, sim.send_accx, sim.send_accz, sim.send_alt,
+                sim.send_gnss_pos, sim.send_gnss_vel]
+        return data
+
+    def sendCommand(self, servo, parachute, ignition=0):
+        sim = self.sim
+        sim.u_servos = servo * DEG2RAD
+        sim.parachute = int(parachute)
+        if int(ignition) == 1:
+            if sim.t_launch > sim.t:
+                sim.t_launch = sim.t
+
+    def plot_variable(self, var, i):
+        self.sim.var_sitl_plot[i-1] = var
+
+
+_backend = None
+
+
+def set_backend(backend):
+    """Set the object that answers the functions (None for the default)."""
+    global _backend
+    _backend = backend
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        _backend = SimulationBackend()
+    return _backend
+
+
 def millis():
-    return int(sim.t * 1000)
+    return _get_backend().millis()
 
 
 def micros():
-    return int(sim.t * 1000000)
+    return _get_backend().micros()
 
 
 def getSimData():
-    data = [sim.send_gyro, sim.send_accx, sim.send_accz, sim.send_alt,
-            sim.send_gnss_pos, sim.send_gnss_vel]
-    return data
+    return _get_backend().getSimData()
 
 
 def sendCommand(servo, parachute, ignition=0):
-    sim.u_servos = servo * DEG2RAD
-    sim.parachute = int(parachute)
-    if int(ignition) == 1:
-        if sim.t_launch > sim.t:
-            sim.t_launch = sim.t
+    _get_backend().sendCommand(servo, parachute, ignition)
 
 
 def plot_variable(var, i):
-    sim.var_sitl_plot[i-1] = var
+    _get_backend().plot_variable(var, i)
+
+
+def import_module(module, folder="Complementary Modules"):
+    """
+    Import a module from the folder next to the module that calls this
+    function, it stays loaded between runs until its file changes.
+    """
+    caller_file = sys._getframe(1).f_globals["__file__"]
+    return module_manager.load(Path(caller_file).parent / folder / module)
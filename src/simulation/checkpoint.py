@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:27:45 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import io
+import types
+import pickle
+import struct
+import importlib
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.simulation.module_manager import module_manager
+from src.simulation import sweep
+
+
+"""
+Snapshots of a run that can be resumed, saved, and forked into variants.
+
+Classes:
+    Checkpoint -- State of a run at a time.
+
+Functions:
+    take_checkpoint -- Checkpoint of the run in progress.
+    load_checkpoint -- Read a checkpoint from a file.
+    run_to_checkpoint -- Run a save file until a condition.
+    resume -- Continue a checkpoint with a variant until the end.
+    fork -- resume() for many variants, in parallel.
+"""
+
+"""
+A checkpoint is everything main_simulation keeps between steps: the
+integrators, the rocket, the controller, the servo, the random generators
+of the sensors, the wind tables, the plots, and for the Python SITL the
+SITLProgram and the recorder of its log. It's pickled to bytes, so it's
+cheap to keep in memory, it can be written to a file, and restoring it
+many times gives independent copies.
+
+Classes and functions of the SITL modules are stored as a reference to
+their file and loaded again (from the cache of the module manager) when
+it's restored.
+
+Many studies share the launch and the boost and differ only after an
+event (the apogee, a parachute command). run_to_checkpoint() runs the
+common part once, fork() continues it with each variant:
+
+    cp = checkpoint.run_to_checkpoint(file, lambda sim: sim.v_glob[0] < 0)
+    results = checkpoint.fork(cp, [{"python_sitl_program.delay": 0.5},
+                                   {"python_sitl_program.delay": 1.}])
+
+A variant sets attributes of main_simulation (like sweep.apply_overrides),
+the SITLProgram is python_sitl_program. All the variants get the same
+noise after the checkpoint, only what they change is different.
+
+It works with the simulation without SITL and the Python SITL running in
+this process, the state of the hardware SITL and of a module in its own
+process is outside the simulation.
+"""
+
+
+MAGIC = b"AVCK"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBd")
+
+# Not part of the state of a run
+_EXCLUDED = {"checkpoint_condition", "last_checkpoint", "module_manager",
+             "profiler", "widgets", "widgets_text"}
+# State of the run in other modules
+_MODULE_STATE = {"src.aerodynamics.rocket_functions": ["fin"],
+                 "src.warnings_and_cautions": ["w_and_c"]}
+
+
+def _load_module(path):
+    return module_manager.load(path)
+
+
+def _get_attribute(path, qualname):
+    value = module_manager.load(path)
+    for name in qualname.split("."):
+        value = getattr(value, name)
+    return value
+
+
+class _Pickler(pickle.Pickler):
+    # The SITL modules aren't in sys.modules, their classes are stored
+    # with the path of the file
+    def reducer_override(self, obj):
+        if isinstance(obj, types.ModuleType):
+            path = module_manager.get_path(obj)
+            if path is not None:
+                return _load_module, (path,)
+            return importlib.import_module, (obj.__name__,)
+        if isinstance(obj, (type, types.FunctionType)):
+            path = module_manager.get_path(obj)
+            if path is not None:
+                return _get_attribute, (path, obj.__qualname__)
+        return NotImplemented
+
+
+def _dumps(obj):
+    file = io.BytesIO()
+    _Pickler(file, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return file.getvalue()
+
+
+def _get_state(sim):
+    state = {}
+    for name, value in vars(sim).items():
+        if (name.startswith("__") or name in _EXCLUDED
+                or isinstance(value, (types.ModuleType, types.FunctionType, type))):
+            continue
+        state[name] = value
+    modules = {}
+    for module_name, names in _MODULE_STATE.items():
+        module = importlib.import_module(module_name)
+        modules[module_name] = {e: getattr(module, e) for e in names}
+    return state, modules
+
+
+class Checkpoint:
+    """
+    State of a run at a time.
+
+    Methods:
+        restore -- Put the state back in main_simulation.
+        save -- Write it to a file.
+    """
+
+    def __init__(self, t, data):
+        """
+        Parameters
+        ----------
+        t : float
+            Time of the run [s].
+        data : bytes
+            Pickled state.
+        """
+        self.t = t
+        self.data = data
+
+    def restore(self):
+        """Put the state back in main_simulation, a new copy each time."""
+        from src.simulation import main_simulation as sim
+        state, modules = pickle.loads(self.data)
+        vars(sim).update(state)
+        for module_name, module_state in modules.items():
+            vars(importlib.import_module(module_name)).update(module_state)
+
+    def save(self, file_path):
+        """
+        Write the checkpoint to a file.
+
+        Parameters
+        ----------
+        file_path : string
+            Path of the file.
+
+        Returns
+        -------
+        None.
+        """
+        try:
+            with open(file_path, "wb") as file:
+                file.write(_HEADER.pack(MAGIC, VERSION, self.t))
+                file.write(self.data)
+            print("Checkpoint Saved")
+        except EnvironmentError:
+            print("Error Saving the Checkpoint")
+
+
+def take_checkpoint():
+    """
+    Checkpoint of the run in progress, between two steps.
+
+    Returns
+    -------
+    Checkpoint
+    """
+    from src.simulation import main_simulation as sim
+    return Checkpoint(float(sim.t), _dumps(_get_state(sim)))
+
+
+def load_checkpoint(file_path):
+    """
+    Read a checkpoint from a file.
+
+    Parameters
+    ----------
+    file_path : string
+        Path of the file.
+
+    Returns
+    -------
+    Checkpoint
+    """
+    with open(file_path, "rb") as file:
+        data = file.read()
+    magic, version, t = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a checkpoint or wrong version: " + str(file_path))
+    return Checkpoint(t, data[_HEADER.size:])
+
+
+def run_to_checkpoint(filepath, condition, seed=None, overrides=None):
+    """
+    Run a save file headless until a condition and return the checkpoint.
+
+    Parameters
+    ----------
+    filepath : string
+        Save file.
+    condition : float or function
+        Time [s] or function(main_simulation) -> bool, checked before
+        each step.
+    seed : int, optional
+        Seed of the noise. The default is None.
+    overrides : dict, optional
+        Attributes of the SITLProgram, see sweep.apply_overrides(). The
+        default is None.
+
+    Returns
+    -------
+    Checkpoint or None
+        None if the run ended before the condition.
+    """
+    from src.simulation import main_simulation as sim
+    if overrides is None:
+        overrides = {}
+    sim.noise_seed = seed
+    sim.python_sitl_overrides = overrides
+    sim.checkpoint_condition = condition
+    sim.last_checkpoint = None
+    try:
+        sim.run_simulation_headless(str(filepath))
+    finally:
+        sim.checkpoint_condition = None
+        sim.python_sitl_overrides = {}
+    return sim.last_checkpoint
+
+
+def resume(checkpoint, variant=None, metrics=None):
+    """
+    Continue a checkpoint until the end of the run, nothing is printed.
+
+    Parameters
+    ----------
+    checkpoint : Checkpoint
+        Where the run starts.
+    variant : dict, optional
+        Attributes of main_simulation set before continuing, see
+        sweep.apply_overrides(). The default is None.
+    metrics : function, optional
+        Function(sim) -> dict, see sweep.run_case(). The default is
+        sweep.get_default_metrics.
+
+    Returns
+    -------
+    dict
+        The variant, the metrics and error ("" or the traceback).
+    """
+    from src.simulation import main_simulation as sim
+    if variant is None:
+        variant = {}
+    if metrics is None:
+        metrics = sweep.get_default_metrics
+    result = dict(variant)
+    try:
+        checkpoint.restore()
+        sweep.apply_overrides(sim, variant)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.resume_simulation_headless()
+        result.update(metrics(sim))
+        result["error"] = ""
+    except Exception:
+        result["error"] = traceback.format_exc()
+    return result
+
+
+def fork(checkpoint, variants, metrics=None, processes=None):
+    """
+    Continue a checkpoint with each variant.
+
+    Parameters
+    ----------
+    checkpoint : Checkpoint
+        Where the runs start.
+    variants : list
+        Dicts with the attributes of main_simulation of each run, see
+        resume().
+    metrics : function, optional
+        See sweep.run_case(). The default is sweep.get_default_metrics.
+    processes : int, optional
+        Number of processes, 1 runs them here one after the other. The
+        default is the number of CPUs.
+
+    Returns
+    -------
+    list
+        Result of each variant, in order.
+    """
+    if processes == 1:
+        return [resume(checkpoint, e, metrics) for e in variants]
+    # spawn, so the workers don't inherit the GUI
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        futures = [executor.submit(resume, checkpoint, e, metrics)
+                   for e in variants]
+        return [e.result() for e in futures]
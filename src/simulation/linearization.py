@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:12:41 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import numpy as np
+
+
+"""
+Linearizes the pitch plane of the simulation around trim points to
+study the stability of the control loop in the frequency domain.
+
+Classes:
+    PitchPlaneLinearization -- Obtains the linear models.
+    LinearPitchModel -- State space model, Bode, root locus and margins.
+
+Functions:
+    schedule_gains -- Gain schedule from the linear models.
+"""
+
+"""
+The states of the linear model are:
+    aoa -- Angle of attack (W/U).
+    Q -- Pitch rate.
+    theta -- Pitch angle.
+    servo position and servo velocity -- From the servo model.
+    integral of the error -- From the PID, only if ki is not zero.
+The loop is broken at the servo command (u_servos), so the loop
+transfer function is the one "seen" by the servo.
+It's the same model that simulation() integrates, only linearized, so
+it doesn't have the saturations, the launch rod, nor the quantization
+of the servo.
+"""
+
+
+DEG2RAD = np.pi / 180
+RAD2DEG = 1 / DEG2RAD
+
+
+class PitchPlaneLinearization:
+    """
+    Linearizes the pitch dynamics of the rocket with its servo and
+    controller.
+
+    Methods:
+        setup -- Set the rocket's parameters that are not in the Rocket.
+        linearize -- Linear model around a trim point.
+        linearize_trajectory -- Linear models along a trajectory.
+    """
+
+    def __init__(self, rocket, controller, servo):
+        self.rocket = rocket
+        self.controller = controller
+        self.servo = servo
+        self.xt = 0.
+        self.actuator_reduction = 1.
+        self.motor_offset = 0.
+        self.u_initial_offset = 0.
+        self.t_launch = 0.
+        self.g = 9.8
+        # Steps of the numerical derivatives
+        self.delta_aoa = 0.1 * DEG2RAD
+        self.delta_q = 0.1 * DEG2RAD
+        self.delta_actuator = 0.1 * DEG2RAD
+        # Step used to obtain K and J of the servo model
+        self.servo_u_delta = 1 * DEG2RAD
+
+    def setup(self, xt, actuator_reduction, motor_offset=0.,
+              u_initial_offset=0., t_launch=0.):
+        """
+        Set the parameters that the simulation doesn't store in the Rocket.
+
+        Parameters
+        ----------
+        xt : float
+            Position of the TVC mount [m].
+        actuator_reduction : float
+            Actuator reduction.
+        motor_offset : float, optional
+            Motor misalignment [rad]. The default is 0.
+        u_initial_offset : float, optional
+            Initial misalignment of the actuator [rad]. The default is 0.
+        t_launch : float, optional
+            Ignition time. The default is 0.
+
+        Returns
+        -------
+        None.
+        """
+        self.xt = xt
+        self.actuator_reduction = actuator_reduction
+        self.motor_offset = motor_offset
+        self.u_initial_offset = u_initial_offset
+        self.t_launch = t_launch
+
+    def linearize(self, t, v_loc_tot, h, theta=0., sample_delay=0.):
+        """
+        Linearize the pitch plane around the trim point.
+
+        Parameters
+        ----------
+        t : float
+            Time, sets the thrust and the mass parameters.
+        v_loc_tot : list
+            Total velocity in local coordinates (airspeed).
+        h : float
+            Altitude (above sea level).
+        theta : float, optional
+            Pitch angle. The default is 0.
+        sample_delay : float, optional
+            Delay added by the sampling of the controller and the
+            servo [s]. The default is 0.
+
+        Returns
+        -------
+        LinearPitchModel
+            Linear model.
+        """
+        rocket = self.rocket
+        thrust, m, Iy, xcg = rocket.get_motor_state(t, self.t_launch)
+        v_modulus = max(np.sqrt(v_loc_tot[0]**2 + v_loc_tot[1]**2), 0.1)
+        aoa = np.arctan2(v_loc_tot[1], v_loc_tot[0])
+        actuator_angle = self.u_initial_offset
+        derivatives = self._aero_derivatives(v_modulus, aoa, h, actuator_angle)
+        rho = rocket.rho
+        q = 0.5 * rho * v_modulus**2
+        S = rocket.area_ref
+        d = rocket.max_diam
+        cn_aoa, cn_q, cn_act, cm_aoa, cm_q, cm_act = derivatives
+        if rocket.use_fins_control is True:
+            motor_angle = self.motor_offset
+            thrust_z_act = 0.
+        else:
+            motor_angle = actuator_angle + self.motor_offset
+            thrust_z_act = thrust * np.cos(motor_angle)
+        # aoa_dot = accz/V + Q, Q_dot = M/Iy, theta_dot = Q
+        a_aa = q*S*cn_aoa / (m*v_modulus)
+        a_aq = q*S*cn_q / (m*v_modulus) + 1
+        a_at = -self.g * np.cos(theta) / v_modulus
+        b_a = (thrust_z_act + q*S*cn_act) / (m*v_modulus)
+        a_qa = q*S*d*cm_aoa / Iy
+        a_qq = q*S*d*cm_q / Iy
+        b_q = (thrust_z_act*(self.xt-xcg) + q*S*d*cm_act) / Iy
+        A_p = np.array([[a_aa, a_aq, a_at],
+                        [a_qa, a_qq, 0.],
+                        [0., 1., 0.]])
+        B_p = np.array([[b_a],
+                        [b_q],
+                        [0.]])
+        trim = {"t": t, "thrust": thrust, "m": m, "Iy": Iy, "xcg": xcg,
+                "v": v_modulus, "aoa": aoa, "h": h, "q": q,
+                "control_effectiveness": b_q / self.actuator_reduction}
+        return self._assemble(A_p, B_p, trim, sample_delay)
+
+    def linearize_trajectory(self, t_list, v_loc_tot_list, h_list,
+                             theta_list=None, sample_delay=0.):
+        """
+        Linearize the pitch plane along a trajectory.
+
+        Parameters
+        ----------
+        t_list : list
+            Times.
+        v_loc_tot_list : list
+            Total velocities in local coordinates.
+        h_list : list
+            Altitudes (above sea level).
+        theta_list : list, optional
+            Pitch angles. The default is zero for all points.
+        sample_delay : float, optional
+            Delay added by the sampling [s]. The default is 0.
+
+        Returns
+        -------
+        list of LinearPitchModel
+            One model per point.
+        """
+        if theta_list is None:
+            theta_list = [0.] * len(t_list)
+        models = []
+        for t, v, h, theta in zip(t_list, v_loc_tot_list, h_list, theta_list):
+            models.append(self.linearize(t, v, h, theta, sample_delay))
+        return models
+
+    def _aero_derivatives(self, v_modulus, aoa, h, actuator_angle):
+        # Central differences of calculate_aero_coef, the fins keep their
+        # state between calls so the order of the calls doesn't matter.
+        def coefficients(aoa_i, q_i, act_i):
+            v = [v_modulus*np.cos(aoa_i), v_modulus*np.sin(aoa_i)]
+            if self.rocket.use_fins_control is True:
+                cn, cm_xcg, _, _ = self.rocket.calculate_aero_coef(v, q_i, h, act_i)
+            else:
+                cn, cm_xcg, _, _ = self.rocket.calculate_aero_coef(v, q_i, h)
+            return np.array([cn, cm_xcg])
+
+        h_a, h_q, h_u = self.delta_aoa, self.delta_q, self.delta_actuator
+        d_aoa = (coefficients(aoa+h_a, 0., actuator_angle)
+                 - coefficients(aoa-h_a, 0., actuator_angle)) / (2*h_a)
+        d_q = (coefficients(aoa, h_q, actuator_angle)
+               - coefficients(aoa, -h_q, actuator_angle)) / (2*h_q)
+        if self.rocket.use_fins_control is True:
+            d_act = (coefficients(aoa, 0., actuator_angle+h_u)
+                     - coefficients(aoa, 0., actuator_angle-h_u)) / (2*h_u)
+        else:
+            d_act = np.zeros(2)
+        # Leaves the rocket as it was (rho, fins, etc)
+        coefficients(aoa, 0., actuator_angle)
+        return d_aoa[0], d_q[0], d_act[0], d_aoa[1], d_q[1], d_act[1]
+
+    def _assemble(self, A_p, B_p, trim, sample_delay):
+        # Appends the servo and the integrator of the PID. The servo
+        # moves the actuator through the actuator reduction.
+        A_s, B_s, _, _ = self.servo.get_linear_model(self.servo_u_delta)
+        # Without integral gain the integrator is a pole at the origin that
+        # the controller doesn't see, so it's left out.
+        kp, ki, kd = self.controller.get_gains(trim["q"], trim["thrust"], trim["t"])
+        use_integral = ki != 0
+        n = 6 if use_integral else 5
+        A = np.zeros((n, n))
+        B = np.zeros((n, 1))
+        A[0:3, 0:3] = A_p
+        A[0:3, 3:4] = B_p / self.actuator_reduction
+        A[3:5, 3:5] = A_s
+        B[3:5, :] = B_s
+        names = ["aoa", "Q", "theta", "servo", "servo_dot"]
+        if use_integral:
+            # Integral of the error (setpoint = 0) -> z_dot = -theta
+            A[5, 2] = -1.
+            names.append("integral")
+        F = self._controller_gain(trim["thrust"], kp, ki, kd)[:, 0:n]
+        return LinearPitchModel(A, B, F, names, trim, sample_delay)
+
+    def _controller_gain(self, thrust, kp, ki, kd):
+        # u_servos = F * x, same as control_theta without saturations.
+        # The derivative of the error is -Q when the setpoint is constant.
+        c = self.controller
+        gain = c.actuator_reduction
+        if c.torque_controller is True:
+            gain *= c.reference_thrust / thrust
+        F = np.zeros((1, 6))
+        F[0, 1] = -gain * (kd*c.k_all + c.k_damping)
+        F[0, 2] = -gain * kp * c.k_all
+        F[0, 5] = gain * ki * c.k_all
+        return F
+
+
+def schedule_gains(models, variable, kp, ki, kd, reference=0, max_scale=10.):
+    """
+    Gain schedule that keeps the loop gain of the reference trim point
+    along the trajectory, the gains are scaled with the inverse of the
+    control effectiveness (pitch acceleration per radian of servo).
+
+    Parameters
+    ----------
+    models : list of LinearPitchModel
+        Trim points.
+    variable : string
+        Scheduling variable, one of control.GainSchedule.variables.
+    kp, ki, kd : floats
+        Gains at the reference trim point.
+    reference : int, optional
+        Index of the reference model. The default is 0.
+    max_scale : float, optional
+        Limits the scaling where the actuator has almost no
+        effectiveness (coast with TVC). The default is 10.
+
+    Returns
+    -------
+    list
+        Rows of [x, kp, ki, kd], for GainSchedule.setup().
+    """
+    keys = {"Dynamic Pressure [Pa]": "q", "Thrust [N]": "thrust", "Time [s]": "t"}
+    key = keys[variable]
+    b_ref = abs(models[reference].trim["control_effectiveness"])
+    table = []
+    for model in models:
+        b = abs(model.trim["control_effectiveness"])
+        if b * max_scale > b_ref:
+            scale = b_ref / b
+        else:
+            scale = max_scale
+        table.append([model.trim[key], kp*scale, ki*scale, kd*scale])
+    table.sort()
+    # The table must be a function of the variable
+    unique_table = []
+    for row in table:
+        if unique_table == [] or row[0] > unique_table[-1][0]:
+            unique_table.append(row)
+    return unique_table
+
+
+class LinearPitchModel:
+    """
+    State space model of the pitch plane with the servo appended.
+
+    x_dot = A*x + B*u
+    u = k * F*x (delayed)
+
+    Methods:
+        closed_loop_poles -- Poles for a loop gain k.
+        frequency_response -- Bode data of the loop transfer function.
+        root_locus -- Closed loop poles for a list of loop gains.
+        stability_margins -- Gain and phase margins.
+    """
+
+    def __init__(self, A, B, F, state_names, trim, sample_delay=0.):
+        self.A = A
+        self.B = B
+        self.F = F
+        self.state_names = state_names
+        self.trim = trim
+        self.sample_delay = sample_delay
+
+    def open_loop_poles(self):
+        """Poles of the rocket and the servo (and the integrator)."""
+        return np.linalg.eigvals(self.A)
+
+    def closed_loop_poles(self, k=1.):
+        """
+        Poles of the closed loop for a loop gain k, the delay is
+        approximated with a first order Padé.
+
+        Parameters
+        ----------
+        k : float, optional
+            Multiplies the controller output. The default is 1.
+
+        Returns
+        -------
+        numpy array
+            Poles.
+        """
+        return np.linalg.eigvals(self._closed_loop_matrix(k))
+
+    def _closed_loop_matrix(self, k):
+        A, B, F = self.A, self.B, self.F
+        tau = self.sample_delay
+        if tau <= 0:
+            return A + k * np.dot(B, F)
+        # e^(-s*tau) ~ (1 - s*tau/2) / (1 + s*tau/2) = -1 + (4/tau)/(s + 2/tau)
+        n = len(A)
+        A_cl = np.zeros((n+1, n+1))
+        A_cl[0:n, 0:n] = A - k * np.dot(B, F)
+        A_cl[0:n, n:n+1] = k * B
+        A_cl[n, 0:n] = (4/tau) * F[0]
+        A_cl[n, n] = -2/tau
+        return A_cl
+
+    def is_stable(self, k=1.):
+        """
+        Return True if the closed loop is stable for a loop gain k, poles
+        on the imaginary axis (a rocket without control authority) are
+        not stable.
+        """
+        poles = self.closed_loop_poles(k)
+        tolerance = 1e-9 * max(1., np.max(np.abs(poles)))
+        return bool(np.all(np.real(poles) < -tolerance))
+
+    def loop_transfer_function(self, w):
+        """
+        Loop transfer function L(jw) = -F(jwI-A)^-1 B D(jw), breaking
+        the loop at the servo command. D is the same first order Padé of
+        the delay that closed_loop_poles() uses, so the margins and the
+        poles are from the same loop.
+
+        Parameters
+        ----------
+        w : numpy array
+            Frequencies [rad/s].
+
+        Returns
+        -------
+        numpy array of complex
+            L(jw).
+        """
+        w = np.atleast_1d(np.asarray(w, dtype=float))
+        n = len(self.A)
+        identity = np.eye(n)
+        s = 1j * w
+        # Solves all the frequencies at once
+        M = s[:, None, None]*identity[None, :, :] - self.A[None, :, :]
+        B = np.broadcast_to(self.B, (len(w), n, 1))
+        x = np.linalg.solve(M, B)
+        L = -np.einsum("j,ijk->i", self.F[0], x)
+        tau = self.sample_delay
+        return L * (1 - s*tau/2) / (1 + s*tau/2)
+
+    def frequency_response(self, w=None):
+        """
+        Bode data of the loop transfer function.
+
+        Parameters
+        ----------
+        w : numpy array, optional
+            Frequencies [rad/s]. The default is 0.01 to 10000 rad/s.
+
+        Returns
+        -------
+        w : numpy array
+            Frequencies [rad/s].
+        mag : numpy array
+            Magnitude [dB].
+        phase : numpy array
+            Phase [º], unwrapped.
+        """
+        if w is None:
+            w = np.logspace(-2, 4, 3000)
+        L = self.loop_transfer_function(w)
+        with np.errstate(divide="ignore"):
+            mag = 20 * np.log10(np.abs(L))
+        phase = np.unwrap(np.angle(L)) * RAD2DEG
+        return w, mag, phase
+
+    def root_locus(self, gains=None):
+        """
+        Closed loop poles for a list of loop gains.
+
+        Parameters
+        ----------
+        gains : list, optional
+            Loop gains. The default is 0.01 to 100.
+
+        Returns
+        -------
+        gains : numpy array
+            Loop gains.
+        poles : numpy array
+            Poles, one row per gain.
+        """
+        if gains is None:
+            gains = np.logspace(-2, 2, 200)
+        gains = np.asarray(gains, dtype=float)
+        poles = [np.sort_complex(self.closed_loop_poles(k)) for k in gains]
+        return gains, np.array(poles)
+
+    def stability_margins(self, w=None):
+        """
+        Gain and phase margins of the loop transfer function, how much the
+        loop gain or phase can change, up or down, before a pole of the
+        closed loop crosses the imaginary axis.
+
+        The margins are only defined if the closed loop is stable, they
+        are NaN if it isn't or if there is no crossover in w. A stable
+        loop with a lower gain margin is conditionally stable (unstable
+        rocket), reducing the gain by that much makes it unstable.
+
+        Parameters
+        ----------
+        w : numpy array, optional
+            Frequencies [rad/s]. The default is 0.01 to 10000 rad/s.
+
+        Returns
+        -------
+        dict
+            gain_margin [dB] (the smallest of the two),
+            gain_margin_upper [dB], w_gain_margin_upper [rad/s],
+            gain_margin_lower [dB], w_gain_margin_lower [rad/s],
+            phase_margin [º], w_phase_margin [rad/s], stable.
+        """
+        w, mag, phase = self.frequency_response(w)
+        margins = {"gain_margin": np.nan,
+                   "gain_margin_upper": np.nan,
+                   "w_gain_margin_upper": np.nan,
+                   "gain_margin_lower": np.nan,
+                   "w_gain_margin_lower": np.nan,
+                   "phase_margin": np.nan,
+                   "w_phase_margin": np.nan,
+                   "stable": self.is_stable()}
+        if margins["stable"] is False:
+            return margins
+        # |L| = 0 where the actuator has no effectiveness
+        finite = np.isfinite(mag[:-1]) & np.isfinite(mag[1:])
+        # Gain crossover, |L| = 1
+        for i in np.nonzero((np.diff(np.sign(mag)) != 0) & finite)[0]:
+            w_c = self._interpolate_crossing(w, mag, i, 0.)
+            phase_c = np.interp(w_c, w[i:i+2], phase[i:i+2])
+            pm = abs((phase_c % 360) - 180)
+            if not pm >= margins["phase_margin"]:
+                margins["phase_margin"] = pm
+                margins["w_phase_margin"] = w_c
+        # Phase crossover, phase = 180 + 360*n. 1 + k*L = 0 there for
+        # k = 1/|L|, so a pole crosses the imaginary axis at that gain.
+        crossings = []
+        turns = np.floor((phase-180) / 360)
+        for i in np.nonzero((np.diff(turns) != 0) & finite)[0]:
+            level = 180 + 360*max(turns[i], turns[i+1])
+            w_c = self._interpolate_crossing(w, phase, i, level)
+            crossings.append((w_c, -np.interp(w_c, w[i:i+2], mag[i:i+2])))
+        # A real pole crosses through the origin (w = 0) if L(0) < 0
+        try:
+            L_0 = np.real(self.loop_transfer_function(0.)[0])
+            if np.isfinite(L_0) and L_0 < 0:
+                crossings.append((0., 20*np.log10(-1/L_0)))
+        except np.linalg.LinAlgError:
+            pass  # Pole at the origin, |L(0)| is infinite
+        for w_c, gm in crossings:
+            if gm > 0 and not gm >= margins["gain_margin_upper"]:
+                margins["gain_margin_upper"] = gm
+                margins["w_gain_margin_upper"] = w_c
+            elif gm <= 0 and not -gm >= margins["gain_margin_lower"]:
+                margins["gain_margin_lower"] = -gm
+                margins["w_gain_margin_lower"] = w_c
+        margins["gain_margin"] = np.fmin(margins["gain_margin_upper"],
+                                         margins["gain_margin_lower"])
+        return margins
+
+    @staticmethod
+    def _interpolate_crossing(w, y, i, level):
+        if y[i+1] == y[i]:
+            return w[i]
+        frac = (level-y[i]) / (y[i+1]-y[i])
+        return w[i] + frac*(w[i+1]-w[i])
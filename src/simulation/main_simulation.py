@@ -7,23 +7,35 @@ Created on Fri May  8 15:23:20 2020
 
 
 import sys
-import matplotlib
+import copy
 import matplotlib.pyplot as plt
 import numpy as np
-import random
 import vpython as vp
 import time
-import importlib
 from pathlib import Path
 from scipy.interpolate import interp1d
 from src.gui import gui_setup as gui
 from src.aerodynamics import rocket_functions as rkt
 from src import control
 from src.simulation import servo_lib
+from src.simulation import linearization
+from src.simulation import sitl_protocol
+from src.simulation import serial_link
+from src.simulation import sitl_latency
+from src.simulation import sitl_process
+from src.simulation import sensors
+from src.simulation import sitl_replay
+from src.simulation.module_manager import module_manager
+from src.simulation import sweep
+from src.simulation import wind_models
+from src.simulation import checkpoint
+from src.simulation import seeds
+from src.simulation import profiling
+from src.simulation import six_dof
+from src import python_sitl_functions
+from src import motor
 from src import files
 
-matplotlib.use('TkAgg')
-
 
 """
 Thanks to:
@@ -85,7 +97,6 @@ rho = 1.225 # air density
 q = 0 #dynamic pressure
 U_prev = 0.
 U2 = 0.
-wind_rand = 0
 actuator_angle = 0
 CA0 = 0
 wind_total = 0
@@ -196,6 +207,14 @@ position_global = [0, 0]
 position_local = [0, 0]
 force_app_point = 0
 normal_force = 0
+# 6 DOF, the rest of the state is in flight_model
+yaw = 0.
+roll = 0.
+yaw_rate = 0.
+roll_rate = 0.
+position_crossrange = 0.
+actuator_angle_yaw = 0.
+u_servos_yaw = 0.
 
 # LOTS
 t_plot = []
@@ -244,7 +263,6 @@ t_timer_3d = 0
 timer_run_sim = 0
 timer_run_servo = 0
 t = 0.
-timer_disturbance = 0.
 timer_U = 0.
 
 # FLAGS
@@ -271,6 +289,48 @@ acc_st = 0
 alt_st = 0
 gnss_st = 0
 var_sitl_plot = [0]*10
+# Lockstep SITL, virtual time between sensor frames
+T_lockstep = 0.001
+lockstep_timeout = 1.
+# Hardware SITL, timestamps of the frames of the last run
+latency_recorder = None
+# Python SITL, run the module in its own process with a CPU budget per
+# void_loop() (None -> T)
+python_sitl_separate_process = False
+python_sitl_cpu_budget = None
+# Python SITL, log of the sensors and commands of the module (None doesn't
+# record), it can be replayed with sitl_replay.replay()
+python_sitl_log_path = None
+# Python SITL, attributes of the SITLProgram set after
+# everything_that_is_outside_functions() (see sweep.apply_overrides)
+python_sitl_overrides = {}
+# Seed of the sensor noise, the wind gusts and the random generators of
+# the Python SITL, None is a new one each run (the one used is left in
+# noise_seed_used, see seeds.py)
+noise_seed = None
+noise_seed_used = None
+python_sitl_seed = None
+sitl_sensors = sensors.SensorSet()
+wind_model = wind_models.WindModel()
+# Stops the run when it's reached and leaves a checkpoint.Checkpoint in
+# last_checkpoint, a time [s] or a function(main_simulation) -> bool
+checkpoint_condition = None
+last_checkpoint = None
+# Python SITL, module and log of the run in progress
+python_sitl_program = None
+python_sitl_recorder = None
+# Time of each stage of the run (see profiling.py), the calls are saved as
+# a Chrome trace if there is a path. The profiler of the last run is left
+# in profiler
+profile_run = False
+profile_trace_path = None
+profiler = None
+# Flight model, 3 DOF (pitch plane) or 6 DOF (see six_dof.py), set by the
+# optional section "Flight Model". The yaw has its own servo and a copy of
+# the controller
+flight_model = six_dof.SixDOF()
+servo_yaw = servo_lib.Servo()
+controller_yaw = control.Controller()
 
 # FUNCTIONS
 
@@ -282,7 +342,8 @@ def get_data_savefile():
     conf_controller = gui.sim_setup_tab.get_configuration_destringed()
     return param, conf_3d, conf_controller, conf_sitl, rocket_dim
 
-def update_all_parameters(parameters,conf_3d,conf_controller,conf_sitl, rocket_dim):
+def update_all_parameters(parameters,conf_3d,conf_controller,conf_sitl, rocket_dim,
+                          conf_plots=None):
     global thrust, burnout_time, thrust_curve, max_thrust, average_thrust
     global m, m_liftoff, m_burnout, Iy, Iy_liftoff, Iy_burnout, d, xcg
     global xcg_liftoff, xcg_burnout, xt
@@ -335,11 +396,16 @@ def update_all_parameters(parameters,conf_3d,conf_controller,conf_sitl, rocket_d
 
     # rocket Class
     global S, d
-    gui.savefile.read_motor_data(gui.param_file_tab.combobox[0].get())
+    gui.savefile.read_motor_data(parameters[0])
+    # The optional section selects the mass depletion, without it the mass
+    # changes linearly with time
+    rocket.motor_model = motor.Motor()
+    rocket.motor_model.read_save_file_section(gui.savefile.get_optional_section("Motor Model"))
     rocket.set_motor(gui.savefile.get_motor_data())
     burnout_time = rocket.burnout_time()
-    rocket.update_rocket(gui.draw_rocket_tab.get_configuration_destringed(),
-                         rocket_mass_parameters, roughness)
+    max_thrust = rocket.motor_model.max_thrust
+    average_thrust = rocket.motor_model.average_thrust
+    rocket.update_rocket(rocket_dim, rocket_mass_parameters, roughness)
     S = rocket.area_ref
     d = rocket.max_diam
 
@@ -352,9 +418,22 @@ def update_all_parameters(parameters,conf_3d,conf_controller,conf_sitl, rocket_d
     global position_global, position_local, v_glob, Q
     global export_T
     input_type = conf_controller[2]
+    # The gains are inverted if the control fins are ahead of the CG. Their
+    # cp comes with their coefficients, which are only computed if the
+    # rocket has fins, so it's computed here and not taken as it is.
+    if rocket.use_fins is True and rocket.use_fins_control is True:
+        rocket.calculate_aero_coef()
+        invert_gains = bool(rkt.fin[1].cp < xcg)
+    else:
+        invert_gains = False
     controller.setup_controller(conf_controller[0:9],
                                 Actuator_reduction,
-                                Actuator_max)
+                                Actuator_max,
+                                invert_gains)
+    # The gain schedule is optional, files without it use the fixed gains
+    gain_schedule = control.GainSchedule()
+    gain_schedule.read_save_file_section(gui.savefile.get_optional_section("Gain Schedule"))
+    controller.set_gain_schedule(gain_schedule)
     inp = conf_controller[9]
     inp_time = conf_controller[10]
     t_launch = conf_controller[11]
@@ -396,28 +475,66 @@ def update_all_parameters(parameters,conf_3d,conf_controller,conf_sitl, rocket_d
     alt_st = conf_sitl[13]
     gnss_st = conf_sitl[14]
 
+    # The noise is drawn in blocks, from generators seeded by noise_seed
+    global sitl_sensors, wind_model, noise_seed_used, python_sitl_seed
+    seed_sequence = seeds.get_seed_sequence(noise_seed)
+    noise_seed_used = seeds.to_string(seed_sequence)
+    sensors_seed, gusts_seed, python_sitl_seed = seed_sequence.spawn(3)
+    sitl_sensors = sensors.SensorSet(sensors_seed)
+    sitl_sensors.read_save_file_section(gui.savefile.get_optional_section("Sensor Models"))
+    if use_noise is True:
+        sensors_sd = [gyro_sd, acc_sd, acc_sd, alt_sd, gnss_pos_sd, gnss_vel_sd]
+    else:
+        sensors_sd = [0.] * 6
+    if Activate_SITL is True and enable_python_sitl is True:
+        sensors_st = [gyro_st, acc_st, acc_st, alt_st, gnss_st, gnss_st]
+    else:
+        # The hardware SITL samples when the board asks
+        sensors_st = [0.] * 6
+    sitl_sensors.setup(sensors_sd, sensors_st, use_models=use_noise)
+    # Wind profile and turbulence, the optional section selects the models,
+    # without it the wind is constant with random gusts every 0.1 s
+    wind_model = wind_models.WindModel()
+    wind_model.read_save_file_section(gui.savefile.get_optional_section("Wind Model"),
+                                      gui.savefile.filepath_without_name)
+    wind_model.setup(wind, wind_distribution, sim_duration, gusts_seed)
+
     global send_gyro, send_alt, send_gnss_vel
     send_gyro = Q
     send_alt = position_global[0]
     send_gnss_vel = v_glob[0]
 
     global data_plot
-    data_plot = gui.run_sim_tab.get_configuration_destringed()
+    if conf_plots is None:
+        data_plot = gui.run_sim_tab.get_configuration_destringed()
+    else:
+        data_plot = conf_plots
 
     # Servo Class
     servo.setup(Actuator_weight_compensation, servo_resolution, Ts)
 
+    # Flight model, files without the section are 3 DOF
+    global flight_model, servo_yaw, controller_yaw
+    flight_model = six_dof.SixDOF()
+    flight_model.read_save_file_section(gui.savefile.get_optional_section("Flight Model"))
+    flight_model.setup([position_global[0], 0., 0.], [v_glob[0], 0., v_glob[1]],
+                       theta, Q)
+    servo_yaw = copy.deepcopy(servo)
+    controller_yaw = copy.deepcopy(controller)
+
 
 def reset_variables():
     # Ugly ugly piece of code
-    global cn, w, q, U_prev, U2, wind_rand, i_turns, fin_force, wind_total
+    global cn, w, q, U_prev, U2, i_turns, fin_force, wind_total
+    global latency_recorder
+    latency_recorder = None
+    servo.latency_recorder = None
     cn = 0
     fin_force = 0
     w = 0
     q = 0
     U_prev = 0.
     U2 = 0.
-    wind_rand = 0
     i_turns = 0
     wind_total = 0
 
@@ -447,6 +564,17 @@ def reset_variables():
     position_global = [0, 0]
     position_local = [0, 0]
 
+    ##
+    global yaw, roll, yaw_rate, roll_rate, position_crossrange
+    global actuator_angle_yaw, u_servos_yaw
+    yaw = 0.
+    roll = 0.
+    yaw_rate = 0.
+    roll_rate = 0.
+    position_crossrange = 0.
+    actuator_angle_yaw = 0.
+    u_servos_yaw = 0.
+
     ##
     global t_3d, theta_3d, servo_3d, v_loc_3d, v_glob_3d, position_3d, xa_3d
     global thrust_3d, cn_3d, fin_force_3d, aoa_3d, setpoint_3d, Airspeed_3d
@@ -497,19 +625,29 @@ def reset_variables():
     u = 0.
 
     # CONTROL
-    global setpoint, error
+    global setpoint, error, actuator_angle, okp, oki, okd, totError
     setpoint = 0.
     error = 0.
+    actuator_angle = 0
+    okp, oki, okd, totError = (0.0,)*4
+
+    ##
+    global accx, accy, accQ, cm_xcg, force_app_point, normal_force
+    accx = 0
+    accy = 0
+    accQ = 0
+    cm_xcg = 0
+    force_app_point = 0
+    normal_force = 0
 
     # TIMERS
     global timer_run, t_timer_3d, timer_run_sim, timer_run_servo
-    global t, timer_disturbance, timer_U
+    global t, timer_U
     timer_run = 0
     t_timer_3d = 0
     timer_run_sim = 0
     timer_run_servo = 0
     t = 0.
-    timer_disturbance = 0.
     timer_U = 0.
 
     # FLAGS
@@ -559,7 +697,7 @@ def glob2loc(u0, v0, theta):
 
 
 def update_parameters():
-    global wind_rand, wind_total
+    global wind_total
     global q
     global cn, fin_force
     global x
@@ -568,7 +706,7 @@ def update_parameters():
     global aoa
     global wind
     global thrust, t_launch, t, xcg, m, Iy
-    global out, timer_disturbance, timer_U, U2, q_wind
+    global out, timer_U, U2, q_wind
     global cm_xcg, ca, S
     global actuator_angle, launch_altitude
 
@@ -579,11 +717,8 @@ def update_parameters():
     global Q_d, Q
     global theta, aoa, g, g_loc
 
-    # Times the disturbances so they don't change that often
-    if t>timer_disturbance + 0.1:
-        wind_rand = random.gauss(0, wind_distribution)
-        wind_total = wind_rand + wind
-        timer_disturbance = t
+    # Precomputed in the wind model, only interpolates
+    wind_total = wind_model.get_wind(t, position_global[0])
 
     # NEW SIMULATION
     # Computes the velocity of the wind in local coordinates
@@ -591,8 +726,7 @@ def update_parameters():
     # Computes the total airspeed in local coordinates
     v_loc_tot = [v_loc[0]-wind_loc[0], v_loc[1]-wind_loc[1]]
     aoa = calculate_aoa(v_loc_tot)
-    thrust = rocket.get_thrust(t, t_launch)
-    m, Iy, xcg = rocket.get_mass_parameters(t, t_launch)
+    thrust, m, Iy, xcg = rocket.get_motor_state(t, t_launch)
     S = rocket.area_ref
     v_modulus = np.sqrt(v_loc_tot[0]**2 + v_loc_tot[1]**2)
     if rocket.use_fins_control is True:
@@ -641,6 +775,10 @@ def simulation():
 
     global force_app_point, normal_force
 
+    if flight_model.dof == 6:
+        simulation_6dof()
+        return
+
     # SERVO SIMULATION
     servo_current_angle = servo.simulate(u_servos, t)
     # Reduction of the TVC
@@ -749,12 +887,17 @@ def simulation():
     Still have to see how it scales with more DOF
     """
 
+    save_3d_frame()
+
+
+def save_3d_frame():
     """
     Only saves the points used in the animation.
     (500) is the rate of the animation, when you use slow_mo it drops.
     To ensure fluidity at least a rate of 100 ish is recommended, so a
     rate of 1000 allows for 10 times slower animations.
     """
+    global t_timer_3d
     if t >= t_timer_3d + 0.00499:
         # 3d
         t_3d.append(t)
@@ -773,6 +916,91 @@ def simulation():
         t_timer_3d = t
 
 
+
+def simulation_6dof():
+    """
+    Step of the 6 DOF flight model (six_dof.py).
+
+    It leaves the variables of the pitch plane (theta, Q, v_glob,
+    position_global, aoa, etc.) as simulation() does, so the controller,
+    the SITL, the plots and the 3D work the same. The aerodynamics are
+    computed once, in the plane of the crossflow.
+    """
+    global u_servos, actuator_angle, actuator_angle_yaw
+    global v_loc, v_loc_tot, v_glob, position_global, position_local, acc_glob
+    global theta, Q, aoa, yaw, roll, yaw_rate, roll_rate, position_crossrange
+    global wind_total, thrust, m, Iy, xcg, S, q, rho
+    global cn, cm_xcg, ca, xa, fin_force
+    global accx, accz, accQ, force_app_point, normal_force
+
+    model = flight_model
+    servo_current_angle = servo.simulate(u_servos, t)
+    actuator_angle = (servo_current_angle/Actuator_reduction) + u_initial_offset
+    # Only the local simulation commands the yaw
+    if model.yaw_control is True and Activate_SITL is False:
+        actuator_angle_yaw = servo_yaw.simulate(u_servos_yaw, t) / Actuator_reduction
+    deflection = np.array([[actuator_angle], [actuator_angle_yaw]])
+
+    wind_total = wind_model.get_wind(t, position_global[0])
+    v_air = model.get_air_velocity(wind_total)
+    u_plane, w_plane, plane, Q_plane, fin_deflection = six_dof.get_crossflow_plane(
+        v_air, model.omega, deflection)
+    v_loc_tot = [float(u_plane[0]), float(w_plane[0])]
+    aoa = calculate_aoa(v_loc_tot)
+    thrust, m, Iy, xcg = rocket.get_motor_state(t, t_launch)
+    S = rocket.area_ref
+    h = position_global[0] + launch_altitude
+    if rocket.use_fins_control is True:
+        cn, cm_xcg, ca, xa = rocket.calculate_aero_coef(v_loc_tot, float(Q_plane[0]), h,
+                                                        float(fin_deflection[0]))
+    else:
+        cn, cm_xcg, ca, xa = rocket.calculate_aero_coef(v_loc_tot, float(Q_plane[0]), h)
+    rho = rocket.rho
+    q = 0.5 * rho * (v_loc_tot[0]**2 + v_loc_tot[1]**2)
+
+    inertia = [model.get_Ix(m, d), Iy, Iy]
+    if rocket.is_in_the_pad(position_global[0]) and thrust < m*g:
+        model.step(np.zeros((3, 1)), np.zeros((3, 1)), m, inertia, g, T, hold=True)
+        force_app_point = 0
+        normal_force = 0
+    else:
+        launchrod_global_coor = loc2glob(launchrod_lenght, 0, launchrod_angle)
+        if position_global[0] <= launchrod_global_coor[0]:
+            launchrod_lock = 0
+        else:
+            launchrod_lock = 1
+        if rocket.use_fins_control is False:
+            tvc = deflection + [[motor_offset], [0.]]
+        else:
+            tvc = np.array([[motor_offset], [0.]])
+            fin_force = q * S * rocket.fin_cn[1]
+        force, moment = six_dof.get_loads(thrust, tvc, cn, cm_xcg, ca, q*S, d,
+                                          xt-xcg, plane)
+        model.step(force, moment, m, inertia, g, T, lock=launchrod_lock)
+        # In the crossflow plane, as the 3 DOF
+        n_y, n_z = plane[:, 0]
+        normal_force = float(force[1, 0]*n_y + force[2, 0]*n_z)
+        moment_plane = float(moment[1, 0]*n_z - moment[2, 0]*n_y)
+        force_app_point = moment_plane / normal_force + xcg
+        force_app_point = saturate_plot_xa_force_app(force_app_point)
+
+    pitch, yaw_angle, roll_angle = model.get_angles()
+    theta, yaw, roll = float(pitch[0]), float(yaw_angle[0]), float(roll_angle[0])
+    roll_rate, Q, yaw_rate = model.omega[:, 0].tolist()
+    accx, _, accz = model.acc_body[:, 0].tolist()
+    accQ = float(model.omega_d[1, 0])
+    X, Y, Z = model.position[:, 0].tolist()
+    position_global = [X, Z]
+    position_crossrange = Y
+    v_X, _, v_Z = model.velocity[:, 0].tolist()
+    v_glob = [v_X, v_Z]
+    acc_glob = [float(model.acc_global[0, 0]), float(model.acc_global[2, 0])]
+    v_body = model.dcm[:, :, 0].T @ model.velocity[:, 0]
+    v_loc = [float(v_body[0]), float(v_body[2])]
+    position_local = glob2loc(position_global[0], position_global[1], theta)
+    save_3d_frame()
+
+
 def timer():
     global t
     t = round(t + T, 12)  # Trying to avoid error, not sure it works
@@ -865,6 +1093,18 @@ def check_which_plot(s):
         return position_global[0]
     elif s == "Distance Downrange [m]":
         return position_global[1]
+    elif s == "Distance Crossrange [m]":
+        return position_crossrange
+    elif s == "Yaw Angle [º]":
+        return yaw * RAD2DEG
+    elif s == "Yaw Rate [º/s]":
+        return yaw_rate * RAD2DEG
+    elif s == "Roll Angle [º]":
+        return roll * RAD2DEG
+    elif s == "Roll Rate [º/s]":
+        return roll_rate * RAD2DEG
+    elif s == "Yaw Actuator deflection [º]":
+        return actuator_angle_yaw * RAD2DEG
     elif s == "Proportional Contribution":
         return okp * RAD2DEG
     elif s == "Integral Contribution":
@@ -1023,16 +1263,24 @@ def export_plots(file_name):
         plots_to_csv.append(tenth_plot)
     export_T = gui.sim_setup_tab.get_configuration_destringed()[16]
     filepath = gui.savefile.filepath_without_name
-    files.export_plots(file_name, filepath, names_to_csv, plots_to_csv, export_T)
+    export_path = files.export_plots(file_name, filepath, names_to_csv, plots_to_csv, export_T)
+    if export_path is not None and latency_recorder is not None:
+        # Next to the telemetry, name_sitl_latency.csv
+        if export_path.endswith(".csv"):
+            export_path = export_path[:-4]
+        latency_recorder.export_csv(export_path + "_sitl_latency.csv")
 
 
 def run_sim_local():
     global parameters, conf_3d, conf_controller
     global timer_run_sim, timer_run, setpoint, t_launch,inp_time, u_servos
+    global u_servos_yaw
     global okp, oki, okd, totError
     progress_bar = ProgressBar()
 
     while t <= sim_duration:
+        if check_checkpoint() is True:
+            break
         simulation()
         """
         *.999 corrects the error in t produced by adding t=t+T for sample times
@@ -1049,7 +1297,12 @@ def run_sim_local():
                     setpoint = set_setpoint(inp)
                 u_servos, okp, oki, okd, totError = controller.control_theta(setpoint,
                                                                              theta, Q,
-                                                                             thrust, t)
+                                                                             thrust, t,
+                                                                             q=q)
+                if flight_model.dof == 6 and flight_model.yaw_control is True:
+                    # Keeps the yaw at zero
+                    u_servos_yaw = controller_yaw.control_theta(0., yaw, yaw_rate,
+                                                                thrust, t, q=q)[0]
             timer_run_sim = t
         progress_bar.update(t, sim_duration)
         plot_data()
@@ -1070,12 +1323,11 @@ def run_sim_local():
             break
         timer()
 
-def run_sim_sitl():
+def run_sim_sitl(serial_port=None):
     global parameters, conf_3d, conf_controller, setpoint
     global timer_run_sim, timer_run, setpoint, parachute, t_launch, u_servos
     global send_gyro, send_accx, send_accz, send_alt
     global timer_flag_t0, clock_dif, T_glob, parachute, t0_timer
-    import serial
 
     timer_seconds = 0
     timer_flag_t0 = False
@@ -1089,137 +1341,288 @@ def run_sim_sitl():
     T_glob = 0.001
     parachute = 0
 
-    serialArduino = serial.Serial(port, baudrate, writeTimeout=0)
-    arduino_ready_flag = "not_ready"
-    while arduino_ready_flag != "A":
-        arduino_ready_flag0 = serialArduino.read()
-        arduino_ready_flag = arduino_ready_flag0.decode("ASCII").strip()
-        serialArduino.flushInput()
-    t0 = time.perf_counter() / clock_dif
+    if serial_port is None:
+        import serial
+        serialArduino = serial.Serial(port, baudrate, writeTimeout=0)
+    else:
+        # Any object with the same methods, like a virtual board
+        serialArduino = serial_port
+    # "A" -> real time, "L" -> lockstep, or a binary HELLO frame
+    binary, lockstep = sitl_protocol.wait_handshake(serialArduino)
+    start_latency_recorder(lockstep)
+    if lockstep is True:
+        print("Lockstep SITL")
+        run_sim_sitl_lockstep(serialArduino, binary)
+        stop_latency_recorder()
+        return
+    # The port is read and written in other threads, the simulation
+    # publishes the sensors and takes the commands without waiting.
+    link = serial_link.SerialLink(serialArduino, binary,
+                                  latency_recorder=latency_recorder)
+    link.start()
+    step_statistics = serial_link.StepStatistics(T_glob*clock_dif)
+    next_step = time.perf_counter() + T_glob*clock_dif
     i = 0
     while t <= sim_duration:
-        if time.perf_counter()/clock_dif > t0+T_glob:
-            t0 = time.perf_counter()/clock_dif
-            # Timer runs at the begining, so it calculates the actual
-            # T between runs and integrates more accurately
-            simulation()
-            timer_SITL()
-            if t >= timer_run_sim + T_glob*0.999:
-                timer_run_sim = t
-                if t >= inp_time:
-                    setpoint = set_setpoint(inp)
-            plot_data()
-            if t >= timer_seconds + 1:
-                timer_seconds = t
-                print("Time is ", round(t, 0), " seconds")
-            if t > burnout_time * 10:
-                break
-            if position_global[0] < -0.55:
-                if abs(v_glob[0]) < 2:
-                    print("Landing!")
-                else:
-                    print("CRASH")
-                break
-            if parachute == 1:
-                print("Parachute Deployed")
-                break
-            if t >= sim_duration:
-                print("Simulation Ended")
-                break
-            if rocket.is_supersonic:
-                print("Transonic and supersonic flow, abort!")
-                break
-            i += 1
+        # Sleeps instead of spinning until the next step
+        serial_link.sleep_until(next_step)
+        next_step += T_glob*clock_dif
+        if next_step < time.perf_counter():
+            # Too late, doesn't try to catch up
+            next_step = time.perf_counter() + T_glob*clock_dif
+        step_statistics.new_step()
+        # Timer runs at the begining, so it calculates the actual
+        # T between runs and integrates more accurately
+        simulation()
+        timer_SITL()
+        if t >= timer_run_sim + T_glob*0.999:
+            timer_run_sim = t
+            if t >= inp_time:
+                setpoint = set_setpoint(inp)
         ##
         if t >= 0.003:
-            if serialArduino.inWaiting() > 1:
-                read0 = serialArduino.readline()
-                read = read0.decode("ASCII")
-                read = read.strip()
-                if use_noise is True:
-                    send_gyro = random.gauss(Q*RAD2DEG, gyro_sd)
-                    send_accx = random.gauss((accx-g_loc[0])/9.81, acc_sd)
-                    send_accz = random.gauss((accz-g_loc[1])/9.81, acc_sd)
-                    send_alt = random.gauss(position_global[0], alt_sd)
-                else:
-                    send_gyro = Q*RAD2DEG
-                    send_accx = (accx-g_loc[0])/9.81
-                    send_accz = (accz-g_loc[1])/9.81
-                    send_alt = position_global[0]
-                if read == "R":
-                    # Arduino ready to Read
-                    # last comma because the Arduino library separates the
-                    # string at commas
-                    send = (str(round(send_gyro, 6))+","
-                            + str(round(send_accx, 6)) + ","
-                            + str(round(send_accz, 6)) + ","
-                            + str(round(send_alt, 2)) + ",")
-                    serialArduino.write(str(send).encode("ASCII"))
-                    serialArduino.write('\n'.encode("ASCII"))
-                else:
-                    # Arduino sent data for the program to read
-                    # Arduino is not ready to read data
-                    read_split = read.split(",")
-                    u_servos = float(read_split[0])*DEG2RAD
-                    parachute = int(read_split[1])
+            update_sitl_sensors()
+            t_us = int(round(t*1000000))
+            latency_recorder.sample(t_us)
+            link.publish_sensors(t_us, get_sitl_sensors())
+            for command in link.get_commands():
+                u_servos = command[0]*DEG2RAD
+                parachute = command[1]
+                if command[2] is not None:
+                    latency_recorder.command_applied(command[2])
+        plot_data()
+        if t >= timer_seconds + 1:
+            timer_seconds = t
+            print("Time is ", round(t, 0), " seconds")
+        if t > burnout_time * 10:
+            break
+        if position_global[0] < -0.55:
+            if abs(v_glob[0]) < 2:
+                print("Landing!")
+            else:
+                print("CRASH")
+            break
+        if parachute == 1:
+            print("Parachute Deployed")
+            break
+        if t >= sim_duration:
+            print("Simulation Ended")
+            break
+        if rocket.is_supersonic:
+            print("Transonic and supersonic flow, abort!")
+            break
+        i += 1
+    link.stop()
+    step_statistics.report(t)
+    if link.rx_buffer.overflows + link.tx_buffer.overflows > 0:
+        print("Serial buffer overflows: ",
+              link.rx_buffer.overflows + link.tx_buffer.overflows)
+    if link.requests_without_data > 0:
+        print("Requests without data: ", link.requests_without_data)
+    stop_latency_recorder()
+
+
+def start_latency_recorder(lockstep=False):
+    """Start recording the latency of the hardware SITL frames."""
+    global latency_recorder
+    latency_recorder = sitl_latency.LatencyRecorder(T_Program, lockstep=lockstep)
+    servo.latency_recorder = latency_recorder
+
+
+def stop_latency_recorder():
+    """Stop recording and print the latency report."""
+    servo.latency_recorder = None
+    latency_recorder.report(t)
+
+
+def update_sitl_sensors():
+    """Update the sensor readings sent to the SITL program."""
+    global send_gyro, send_accx, send_accz, send_alt
+    global send_gnss_pos, send_gnss_vel
+    real_values = [Q*RAD2DEG,
+                   (accx-g_loc[0])/9.81,
+                   (accz-g_loc[1])/9.81,
+                   position_global[0],
+                   position_global[1],
+                   v_glob[1]]
+    # The SITL programs always got the readings with 6 decimals
+    [send_gyro, send_accx, send_accz,
+     send_alt, send_gnss_pos, send_gnss_vel] = [round(e, 6) for e in
+                                                sitl_sensors.update(real_values, t)]
+
+
+def get_sitl_sensors():
+    """Sensor readings in the order of the binary SENSOR frame."""
+    return [send_gyro, send_accx, send_accz, send_alt, send_gnss_pos, send_gnss_vel]
+
+
+def run_sim_sitl_lockstep(serialArduino, binary=False):
+    """
+    Hardware SITL in lockstep, the board runs on the simulation's time.
+
+    Every T_lockstep of simulated time the simulator sends a sensor frame
+    with the virtual time, "S,t_us,gyro,accx,accz,alt,\\n", and waits for
+    the board to acknowledge it with its command, "K,servo,parachute\\n".
+    The physics advance with the fixed step T, as fast as the link allows,
+    so there is no busy wait nor clock_dif and the runs are reproducible.
+    With binary frames a SENSOR frame is acknowledged by the COMMAND frame
+    with the same sequence number.
+    """
+    global timer_run_sim, setpoint, parachute, u_servos
+    progress_bar = ProgressBar()
+    serialArduino.timeout = lockstep_timeout
+    parachute = 0
+    timer_lockstep = -T_lockstep
+    if binary is True:
+        link = sitl_protocol.BinaryLink(serialArduino)
+    step_statistics = serial_link.StepStatistics(T)
+    while t <= sim_duration:
+        step_statistics.new_step()
+        simulation()
+        if t >= timer_run_sim+T*0.999:
+            if t >= inp_time:
+                setpoint = set_setpoint(inp)
+            timer_run_sim = t
+        if t >= timer_lockstep + T_lockstep*0.999:
+            timer_lockstep = t
+            update_sitl_sensors()
+            t_us = int(round(t*1000000))
+            latency_recorder.sample(t_us)
+            if binary is True:
+                # Before the write, the answer can arrive before it returns
+                latency_recorder.sent(t_us)
+                seq = link.send_sensors(t_us, get_sitl_sensors())
+                command = link.wait_command(seq)
+                if command is None:
+                    progress_bar.update(t, t, 0)
+                    print("\nThe board stopped responding")
+                    break
+                latency_recorder.command_received(t_us)
+                new_command = (command[0]*DEG2RAD, command[1])
+            else:
+                send = ("S," + str(t_us) + ","
+                        + str(round(send_gyro, 6)) + ","
+                        + str(round(send_accx, 6)) + ","
+                        + str(round(send_accz, 6)) + ","
+                        + str(round(send_alt, 2)) + ",\n")
+                latency_recorder.sent(t_us)
+                serialArduino.write(send.encode("ASCII"))
+                # Anything that is not the acknowledge (prints in the
+                # board's code) is ignored
+                read = ""
+                while not read.startswith("K"):
+                    read0 = serialArduino.readline()
+                    if read0 == b"":
+                        break
+                    read = read0.decode("ASCII", errors="ignore").strip()
+                if not read.startswith("K"):
+                    progress_bar.update(t, t, 0)
+                    print("\nThe board stopped responding")
+                    break
+                latency_recorder.command_received(t_us)
+                read_split = read.split(",")
+                new_command = (float(read_split[1])*DEG2RAD, int(read_split[2]))
+            # Every frame is acknowledged, a new output of the program
+            # is the one that changes
+            if new_command != (u_servos, parachute):
+                latency_recorder.command_applied(t_us)
+            u_servos, parachute = new_command
+        progress_bar.update(t, sim_duration)
+        plot_data()
+        if t > burnout_time * 10:
+            progress_bar.update(t, t, 0)
+            break
+        if position_global[0] < -0.55:
+            progress_bar.update(t, t, 0)
+            if abs(v_glob[0]) < 2:
+                print("\nLanding!")
+            else:
+                print("\nCRASH")
+            break
+        if parachute == 1:
+            progress_bar.update(t, t, 0)
+            print("\nParachute Deployed")
+            break
+        if t >= sim_duration:
+            progress_bar.update(t, t, 0)
+            print("\nSimulation Ended")
+            break
+        if rocket.is_supersonic:
+            progress_bar.update(t, t, 0)
+            print("\nTransonic and supersonic flow, abort!")
+            break
+        timer()
+    # The steps are not paced in lockstep, only the speed matters
+    real_time_factor = step_statistics.get_statistics(t)["real_time_factor"]
+    print("Real time factor: {:.3f}".format(real_time_factor))
 
 
-def run_sim_python_sitl():
+def run_sim_python_sitl(resume=False):
     global parameters, conf_3d, conf_controller, setpoint
     global timer_run_sim, timer_run, setpoint, parachute, t_launch, u_servos
     global send_gyro, send_accx, send_accz, send_alt
     global send_gnss_pos, send_gnss_vel
-    global parachute, python_sitl
+    global parachute, python_sitl_program, python_sitl_recorder
     progress_bar = ProgressBar()
 
-    timer_gyro = 0
-    timer_acc = 0
-    timer_alt = 0
-    timer_gnss = 0
-    parachute = 0
-    sitl_module_path = Path(gui.savefile.filepath_without_name + "/SITL Modules/" + module)
-    spec = importlib.util.spec_from_file_location(module, sitl_module_path)
-    python_sitl = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(python_sitl)
-    python_sitl_program = python_sitl.SITLProgram()
-    python_sitl_program.everything_that_is_outside_functions()
-    python_sitl_program.void_setup()
-
+    module_process = None
+    if resume is False:
+        parachute = 0
+        sitl_module_path = Path(gui.savefile.filepath_without_name + "/SITL Modules/" + module)
+        if python_sitl_log_path is not None:
+            python_sitl_recorder = sitl_replay.SITLRecorder(module)
+        else:
+            python_sitl_recorder = None
+    recorder = python_sitl_recorder
+    if resume is True:
+        # Restored from a checkpoint, the module was already set up
+        if recorder is not None:
+            python_sitl_functions.set_backend(sitl_replay.RecordingBackend(
+                python_sitl_functions.SimulationBackend(), recorder))
+    elif python_sitl_separate_process is True:
+        python_sitl_program = None
+        if python_sitl_cpu_budget is None:
+            cpu_budget = T
+        else:
+            cpu_budget = python_sitl_cpu_budget
+        module_process = sitl_process.SITLProcess(sitl_module_path, module, cpu_budget,
+                                                  overrides=python_sitl_overrides,
+                                                  seed=python_sitl_seed)
+        if module_process.start() is False:
+            print(module_process.error)
+            module_process.stop()
+            return
+        if checkpoint_condition is not None:
+            print("Checkpoints need the module in this process, ignored")
+    else:
+        if recorder is not None:
+            python_sitl_functions.set_backend(sitl_replay.RecordingBackend(
+                python_sitl_functions.SimulationBackend(), recorder))
+        seeds.seed_global_generators(python_sitl_seed)
+        # Executed again only if the module changed since the last run
+        python_sitl_program = module_manager.new_program(sitl_module_path, module)
+        python_sitl_program.everything_that_is_outside_functions()
+        sweep.apply_overrides(python_sitl_program, python_sitl_overrides)
+        python_sitl_program.void_setup()
+
+    stopped_at_checkpoint = False
     while t <= sim_duration:
+        if module_process is None and check_checkpoint() is True:
+            stopped_at_checkpoint = True
+            break
         simulation()
 
-        python_sitl_program.void_loop()
-
-        if use_noise is True:
-            if t >= timer_gyro + gyro_st*0.999:
-                send_gyro = round(random.gauss(Q*RAD2DEG, gyro_sd), 6)
-                timer_gyro = t
-            if t >= timer_acc + acc_st*0.999:
-                send_accx = round(random.gauss((accx-g_loc[0])/9.81, acc_sd), 6)
-                send_accz = round(random.gauss((accz-g_loc[1])/9.81, acc_sd), 6)
-                timer_acc = t
-            if t >= timer_alt + alt_st*0.999:
-                send_alt = round(random.gauss(position_global[0], alt_sd), 6)
-                timer_alt = t
-            if t >= timer_gnss + gnss_st*0.999:
-                send_gnss_pos = round(random.gauss(position_global[1], gnss_pos_sd), 6)
-                send_gnss_vel = round(random.gauss(v_glob[1], gnss_vel_sd), 6)
-                timer_gnss = t
-        else:
-            if t >= timer_gyro + gyro_st*0.999:
-                send_gyro = round(Q*RAD2DEG, 6)
-                timer_gyro = t
-            if t >= timer_acc + acc_st*0.999:
-                send_accx = round((accx-g_loc[0])/9.81, 6)
-                send_accz = round((accz-g_loc[1])/9.81, 6)
-                timer_acc = t
-            if t >= timer_alt + alt_st*0.999:
-                send_alt = round(position_global[0], 6)
-                timer_alt = t
-            if t >= timer_gnss + gnss_st*0.999:
-                send_gnss_pos = round(position_global[1], 6)
-                send_gnss_vel = round(v_glob[1], 6)
-                timer_gnss = t
+        if recorder is not None:
+            recorder.step(t, get_sitl_sensors())
+        if module_process is None:
+            step_python_sitl()
+        elif step_sitl_process(module_process, recorder) is False:
+            progress_bar.update(t, t, 0)
+            print("\n" + module_process.error)
+            break
+
+        # The sensors sample with their own sample times
+        update_sitl_sensors()
         progress_bar.update(t, sim_duration)
         plot_data()
         if position_global[0] < -0.55:
@@ -1242,7 +1645,66 @@ def run_sim_python_sitl():
             print("\nTransonic and supersonic flow, abort!")
             break
         timer()
-    del python_sitl_program
+    python_sitl_program = None
+    if module_process is not None:
+        module_process.stop()
+        module_process.report()
+    if recorder is not None:
+        python_sitl_functions.set_backend(None)
+        if stopped_at_checkpoint is False:
+            recorder.save(python_sitl_log_path)
+        python_sitl_recorder = None
+
+
+def check_checkpoint():
+    """
+    Take a checkpoint if checkpoint_condition is reached, the run has to
+    stop there.
+
+    Returns
+    -------
+    bool
+        True if the checkpoint was taken.
+    """
+    global checkpoint_condition, last_checkpoint
+    if checkpoint_condition is None:
+        return False
+    if callable(checkpoint_condition):
+        reached = checkpoint_condition(sys.modules[__name__])
+    else:
+        reached = t >= checkpoint_condition
+    if not reached:
+        return False
+    checkpoint_condition = None
+    last_checkpoint = checkpoint.take_checkpoint()
+    print("\nCheckpoint at t = {:.3f} s".format(t))
+    return True
+
+
+def step_python_sitl():
+    """Run void_loop() of the module in this process."""
+    python_sitl_program.void_loop()
+
+
+def step_sitl_process(module_process, recorder=None):
+    """
+    Run void_loop() of a module in another process and apply its command,
+    the same as python_sitl_functions does in this process.
+    """
+    global u_servos, parachute, t_launch
+    if module_process.step(t, get_sitl_sensors()) is False:
+        return False
+    command = module_process.get_command()
+    if command is not None:
+        if recorder is not None:
+            recorder.command(*command)
+        u_servos = command[0] * DEG2RAD
+        parachute = command[1]
+        if command[2] == 1:
+            if t_launch > t:
+                t_launch = t
+    var_sitl_plot[:] = module_process.get_plot_variables()
+    return True
 
 
 def run_simulation():
@@ -1256,14 +1718,186 @@ def run_simulation():
                           conf_sitl,
                           rocket_dim)
     print("Simulation Started")
+    run_selected_simulation()
+    plot_plots()
+    return
+
+
+def run_selected_simulation(serial_port=None):
+    """
+    Run the simulation of the configuration (local, hardware SITL or
+    Python SITL), measuring its stages if profile_run is True.
+
+    Parameters
+    ----------
+    serial_port : serial.Serial or similar, optional
+        Port of the hardware SITL, None opens the one of the
+        configuration. The default is None.
+
+    Returns
+    -------
+    None.
+    """
+    global profiler
+    if profile_run is True:
+        profiler = profiling.Profiler(trace=profile_trace_path is not None)
+        profiler.enable()
+    try:
+        if Activate_SITL is False:
+            run_sim_local()
+        elif enable_python_sitl is False:
+            run_sim_sitl(serial_port)
+        else:
+            run_sim_python_sitl()
+    finally:
+        if profile_run is True:
+            profiler.disable()
+            profiler.report()
+            if profile_trace_path is not None:
+                profiler.save_trace(profile_trace_path)
+
+
+def load_save_file(filepath):
+    """
+    Read a save file and set up the simulation, without the GUI.
+
+    Parameters
+    ----------
+    filepath : string
+        Path of the save file.
+
+    Returns
+    -------
+    bool
+        False if the file couldn't be opened.
+    """
+    gui.savefile.update_path(filepath)
+    gui.savefile.read_file()
+    if gui.savefile.error_opening_file_flag is True:
+        return False
+    setup_from_savefile()
+    return True
+
+
+def setup_from_savefile():
+    """
+    Set up the simulation with the configuration that gui.savefile has
+    now, without reading the file (it can be edited after read_file()).
+
+    Returns
+    -------
+    None.
+    """
+    global parameters, conf_3d, conf_controller
+    reset_variables()
+    parameters, conf_3d, conf_controller, conf_sitl, rocket_dim = gui.savefile.get_configuration_destringed()
+    conf_plots = gui.savefile.get_conf_plots()
+    update_all_parameters(parameters,
+                          conf_3d,
+                          conf_controller,
+                          conf_sitl,
+                          rocket_dim,
+                          conf_plots)
+
+
+def run_simulation_headless(filepath, serial_port=None):
+    """
+    Run the simulation of a save file without the GUI, nothing is plotted.
+
+    The results are left in the module variables (t_plot, first_plot,
+    etc., and the 3D ones).
+
+    Parameters
+    ----------
+    filepath : string
+        Path of the save file.
+    serial_port : serial.Serial or similar, optional
+        If it's not None, the hardware SITL runs through this port
+        regardless of the SITL configuration of the file. The default
+        is None.
+
+    Returns
+    -------
+    None.
+    """
+    global Activate_SITL, enable_python_sitl
+    if load_save_file(filepath) is False:
+        return
+    print("Simulation Started")
+    if serial_port is not None:
+        Activate_SITL = True
+        enable_python_sitl = False
+    run_selected_simulation(serial_port)
+
+
+def resume_simulation_headless():
+    """
+    Continue a run restored with checkpoint.Checkpoint.restore(), nothing
+    is plotted.
+
+    Returns
+    -------
+    None.
+    """
     if Activate_SITL is False:
         run_sim_local()
     elif enable_python_sitl is False:
-        run_sim_sitl()
+        print("The hardware SITL can't be resumed from a checkpoint")
     else:
-        run_sim_python_sitl()
-    plot_plots()
-    return
+        run_sim_python_sitl(resume=True)
+
+
+def linearize_nominal_trajectory(n_points=10):
+    """
+    Linearize the pitch plane along the last simulated trajectory and
+    print the stability margins of each point.
+
+    Run a simulation first, the trajectory is taken from the 3D data.
+    The sampling of the controller and the servo is approximated as a
+    delay of half their sample times.
+
+    Parameters
+    ----------
+    n_points : int, optional
+        Number of points of the trajectory. The default is 10.
+
+    Returns
+    -------
+    list of LinearPitchModel
+        One model per point.
+    """
+    if len(t_3d) < 2:
+        print("There is nothing to linearize, please run a simulation.")
+        return []
+    linear = linearization.PitchPlaneLinearization(rocket, controller, servo)
+    linear.setup(xt, Actuator_reduction, motor_offset, u_initial_offset, t_launch)
+    linear.g = g
+    sample_delay = T_Program/2 + Ts/2
+    index = np.linspace(0, len(t_3d)-1, n_points).astype(int)
+    t_list, v_list, h_list, theta_list = [], [], [], []
+    for i in index:
+        # Airspeed with the mean wind, the gusts are left out
+        wind_loc = glob2loc(0, wind, theta_3d[i])
+        t_list.append(t_3d[i])
+        v_list.append([v_loc_3d[i][0]-wind_loc[0], v_loc_3d[i][1]-wind_loc[1]])
+        h_list.append(position_3d[i][0] + launch_altitude)
+        theta_list.append(theta_3d[i])
+    models = linear.linearize_trajectory(t_list, v_list, h_list, theta_list,
+                                         sample_delay)
+    # The margins are NaN (undefined) if the loop is unstable or there is
+    # no crossover. Without actuator authority (no thrust on a TVC rocket)
+    # the loop is open and the points show the passive rocket.
+    max_effectiveness = max(abs(m.trim["control_effectiveness"]) for m in models)
+    print("  t [s]   V [m/s]  GM- [dB]  GM+ [dB]   PM [º]   Stable   Control")
+    for model in models:
+        margins = model.stability_margins()
+        effectiveness = abs(model.trim["control_effectiveness"])
+        has_control = effectiveness > 1e-3 * max_effectiveness
+        print("{:7.2f} {:9.2f} {:9.2f} {:9.2f} {:8.2f}   {!s:6}   {}".format(
+            model.trim["t"], model.trim["v"], margins["gain_margin_lower"],
+            margins["gain_margin_upper"], margins["phase_margin"],
+            margins["stable"], "yes" if has_control else "none"))
+    return models
 
 """
 3D 3D 3D 3D 3D
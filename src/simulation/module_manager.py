@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:20:54 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import os
+import hashlib
+import importlib.util
+from pathlib import Path
+
+
+"""
+Keeps the Python SITL modules loaded between runs.
+
+Classes:
+    ModuleManager -- Loads the modules and reloads them only if they change.
+
+Variables:
+    module_manager -- The one used by the simulation and the Sim functions.
+"""
+
+"""
+A module is reloaded if its file changed (modification time or size, and
+then the hash of its content, so saving it without changes doesn't count)
+or if one of the modules it imported while it was executed changed. The
+modules that a SITLProgram imports in its methods (like the Complementary
+Modules of the examples) are checked each time they are imported.
+
+A cached module keeps its global variables between runs, the state of the
+program should be in the SITLProgram instance.
+"""
+
+
+class _Entry:
+    def __init__(self, module, mtime, size, digest, dependencies):
+        self.module = module
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.dependencies = dependencies
+
+
+class ModuleManager:
+    """
+    Loads modules from files and caches them.
+
+    Methods:
+        load -- Return the module of a file, executed only if it changed.
+        new_program -- New SITLProgram instance of a module.
+        get_path -- Path of a loaded module or of one of its classes.
+        clear -- Forget all the modules.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        # Modules being executed, their imports are their dependencies
+        self._loading = []
+        self.loads = 0
+        self.hits = 0
+
+    def _is_current(self, path):
+        entry = self._cache.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns != entry.mtime or stat.st_size != entry.size:
+            with open(path, "rb") as file:
+                digest = hashlib.sha1(file.read()).hexdigest()
+            if digest != entry.digest:
+                return False
+            # Saved without changes
+            entry.mtime = stat.st_mtime_ns
+        return all(self._is_current(e) for e in entry.dependencies)
+
+    def load(self, path, name=None):
+        """
+        Return the module of a file, it's executed again only if the file
+        or the modules it imported changed.
+
+        Parameters
+        ----------
+        path : string or Path
+            Path of the module.
+        name : string, optional
+            Name of the module. The default is the name of the file.
+
+        Returns
+        -------
+        module
+        """
+        path = str(Path(path).resolve())
+        if self._loading:
+            self._loading[-1].append(path)
+        if self._is_current(path) is True:
+            self.hits += 1
+            return self._cache[path].module
+        if name is None:
+            name = Path(path).name
+        stat = os.stat(path)
+        with open(path, "rb") as file:
+            source = file.read()
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        dependencies = []
+        self._loading.append(dependencies)
+        try:
+            exec(compile(source, path, "exec"), module.__dict__)
+        finally:
+            self._loading.pop()
+        self._cache[path] = _Entry(module, stat.st_mtime_ns, stat.st_size,
+                                   hashlib.sha1(source).hexdigest(), dependencies)
+        self.loads += 1
+        return module
+
+    def new_program(self, path, name=None):
+        """New SITLProgram instance of the module in path."""
+        return self.load(path, name).SITLProgram()
+
+    def get_path(self, obj):
+        """
+        Path of a loaded module, or of the one that defines a class or a
+        function.
+
+        Parameters
+        ----------
+        obj : module, class or function
+
+        Returns
+        -------
+        string or None
+            None if it isn't from one of the loaded modules.
+        """
+        for path, entry in self._cache.items():
+            module = entry.module
+            if obj is module:
+                return path
+            if getattr(obj, "__module__", None) != module.__name__:
+                continue
+            value = module
+            for name in getattr(obj, "__qualname__", "").split("."):
+                value = getattr(value, name, None)
+            if value is obj:
+                return path
+        return None
+
+    def clear(self):
+        """Forget all the modules, the next load executes them again."""
+        self._cache = {}
+
+
+module_manager = ModuleManager()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:36:05 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import json
+import time
+import functools
+import importlib
+
+
+"""
+Time spent in each stage of a run.
+
+Classes:
+    Profiler -- Measures the stages of a run.
+"""
+
+"""
+The profiler replaces the functions of each stage with a version that
+measures them, and puts the originals back when it's disabled. While it's
+disabled nothing is replaced, so it doesn't cost anything.
+
+Each stage accumulates its calls, its total time and its self time (the
+total minus the stages called inside it, update_parameters includes the
+aerodynamics, etc.). The calls can be kept as a Chrome trace, which
+chrome://tracing, Perfetto or speedscope.app can open.
+"""
+
+
+_SIM = "src.simulation.main_simulation:"
+_ROCKET = "src.aerodynamics.rocket_functions:"
+
+# stage: ["module:function" or "module:Class.method"]
+STAGES = {
+    "run": [_SIM + "run_sim_local", _SIM + "run_sim_python_sitl",
+            _SIM + "run_sim_sitl"],
+    "simulation": [_SIM + "simulation", _SIM + "simulation_6dof"],
+    "rigid_body": ["src.simulation.six_dof:SixDOF.step",
+                   "src.simulation.six_dof:get_crossflow_plane",
+                   "src.simulation.six_dof:get_loads"],
+    "update_parameters": [_SIM + "update_parameters"],
+    "aerodynamics": [_ROCKET + "Rocket.calculate_aero_coef"],
+    "fins": ["src.aerodynamics.fin_aerodynamics:Fin.update_conditions",
+             "src.aerodynamics.fin_aerodynamics:Fin.get_aero_coeff"],
+    "motor": [_ROCKET + "Rocket.get_thrust", _ROCKET + "Rocket.get_mass_parameters",
+              _ROCKET + "Rocket.get_motor_state"],
+    "wind": ["src.simulation.wind_models:WindModel.get_wind"],
+    "servo": ["src.simulation.servo_lib:Servo.simulate"],
+    "controller": ["src.control:Controller.control_theta"],
+    "sensors": [_SIM + "update_sitl_sensors"],
+    "python_sitl": [_SIM + "step_python_sitl", _SIM + "step_sitl_process"],
+    "sitl_io": ["src.simulation.serial_link:SerialLink.publish_sensors",
+                "src.simulation.serial_link:SerialLink.get_commands",
+                "src.simulation.sitl_protocol:BinaryLink.send_sensors",
+                "src.simulation.sitl_protocol:BinaryLink.wait_command"],
+    "plot_data": [_SIM + "plot_data"],
+}
+
+
+class Profiler:
+    """
+    Measures the time of the stages of a run.
+
+    Methods:
+        enable -- Start measuring.
+        disable -- Stop measuring and restore the functions.
+        get_statistics -- Calls and times of each stage.
+        report -- Print the table of the stages.
+        save_trace -- Write the calls as a Chrome trace.
+    """
+
+    def __init__(self, trace=False, max_events=2000000):
+        """
+        Parameters
+        ----------
+        trace : bool, optional
+            Keep each call for save_trace(). The default is False.
+        max_events : int, optional
+            Calls kept in the trace, the rest are only counted. The
+            default is 2000000.
+        """
+        self.trace = trace
+        self.max_events = max_events
+        # stage: [calls, total [ns], self [ns]]
+        self.stages = {e: [0, 0, 0] for e in STAGES}
+        self.events = []
+        self.dropped_events = 0
+        self.wall_time = 0
+        self._children = [0]
+        self._originals = []
+        self._t0 = 0
+
+    def _wrap(self, stage, function):
+        clock = time.perf_counter_ns
+        children = self._children
+        accumulators = self.stages[stage]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            children.append(0)
+            t0 = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - t0
+                accumulators[0] += 1
+                accumulators[1] += elapsed
+                accumulators[2] += elapsed - children.pop()
+                children[-1] += elapsed
+                if self.trace is True:
+                    if len(self.events) < self.max_events:
+                        self.events.append((stage, t0, elapsed))
+                    else:
+                        self.dropped_events += 1
+        return wrapper
+
+    def enable(self):
+        """Replace the functions of the stages and start measuring."""
+        if self._originals:
+            return
+        for stage, targets in STAGES.items():
+            for target in targets:
+                module_name, name = target.split(":")
+                owner = importlib.import_module(module_name)
+                path = name.split(".")
+                for e in path[:-1]:
+                    owner = getattr(owner, e)
+                original = owner.__dict__[path[-1]]
+                self._originals.append((owner, path[-1], original))
+                setattr(owner, path[-1], self._wrap(stage, original))
+        self._t0 = time.perf_counter_ns()
+
+    def disable(self):
+        """Stop measuring and put the original functions back."""
+        if not self._originals:
+            return
+        self.wall_time += time.perf_counter_ns() - self._t0
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def get_statistics(self):
+        """
+        Calls and times of each stage that was called.
+
+        Returns
+        -------
+        dict
+            {stage: {"calls", "total", "self", "mean"}}, times in s.
+        """
+        statistics = {}
+        for stage, (calls, total, self_time) in self.stages.items():
+            if calls == 0:
+                continue
+            statistics[stage] = {"calls": calls,
+                                 "total": total * 1e-9,
+                                 "self": self_time * 1e-9,
+                                 "mean": total * 1e-9 / calls}
+        return statistics
+
+    def report(self):
+        """Print the stages, the % is of the time while it was enabled."""
+        statistics = self.get_statistics()
+        wall_time = max(self.wall_time, 1) * 1e-9
+        print("{:<18}{:>10}{:>12}{:>12}{:>12}{:>8}".format(
+            "Stage", "Calls", "Total [ms]", "Self [ms]", "Mean [us]", "Self %"))
+        for stage, e in statistics.items():
+            print("{:<18}{:>10}{:>12.1f}{:>12.1f}{:>12.2f}{:>8.1f}".format(
+                stage, e["calls"], e["total"]*1e3, e["self"]*1e3,
+                e["mean"]*1e6, 100*e["self"]/wall_time))
+        print("Wall time: {:.3f} s".format(wall_time))
+        if self.dropped_events > 0:
+            print("Calls not kept in the trace: ", self.dropped_events)
+
+    def save_trace(self, file_path):
+        """
+        Write the calls as a Chrome trace (JSON).
+
+        Parameters
+        ----------
+        file_path : string
+            Path of the .json.
+
+        Returns
+        -------
+        None.
+        """
+        if len(self.events) > 0:
+            t_start = min(e[1] for e in self.events)
+        else:
+            t_start = 0
+        trace = {"traceEvents": [{"name": stage, "ph": "X", "pid": 1, "tid": 1,
+                                  "ts": (t0-t_start) / 1000,
+                                  "dur": elapsed / 1000}
+                                 for stage, t0, elapsed in self.events],
+                 "displayTimeUnit": "ms"}
+        try:
+            with open(file_path, "w", encoding="utf-8") as file:
+                json.dump(trace, file)
+            print("Trace Saved")
+        except EnvironmentError:
+            print("Error Saving the Trace")
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:12:40 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import random
+import numpy as np
+
+
+"""
+Seeds of the random parts of a run.
+
+Functions:
+    get_seed_sequence -- SeedSequence from a seed.
+    to_string -- Seed that gives the same SeedSequence.
+    spawn -- Independent seeds for many runs.
+    seed_global_generators -- Seed random and numpy.random.
+"""
+
+"""
+Each run has one numpy SeedSequence, the sensors, the wind and the SITL
+module get their own child of it, so adding noise to one of them doesn't
+change the others.
+
+A seed can be None (new entropy), an int, a SeedSequence or the string
+that to_string() returns, "entropy" or "entropy-k1-k2..." for the children
+of another seed (the spawn key). The string of each run is recorded with
+its results, giving it back as the seed repeats the run on any machine.
+
+The runs of a Monte Carlo get the children of one seed (spawn()), they
+are independent of each other and the whole set is repeated with the
+parent seed.
+"""
+
+
+def get_seed_sequence(seed=None):
+    """
+    SeedSequence of a seed, a new one each time (the ones it spawns
+    don't depend on previous calls).
+
+    Parameters
+    ----------
+    seed : None, int, string or numpy.random.SeedSequence, optional
+        Seed. The default is None (new entropy).
+
+    Returns
+    -------
+    numpy.random.SeedSequence
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key)
+    if isinstance(seed, str):
+        values = [int(e) for e in seed.strip().split("-")]
+        return np.random.SeedSequence(values[0], spawn_key=tuple(values[1:]))
+    return np.random.SeedSequence(seed)
+
+
+def to_string(seed_sequence):
+    """
+    Seed that gives the same SeedSequence.
+
+    Parameters
+    ----------
+    seed_sequence : numpy.random.SeedSequence
+
+    Returns
+    -------
+    string
+        "entropy" or "entropy-k1-k2..." (spawn key).
+    """
+    return "-".join(str(e) for e in (seed_sequence.entropy,) + tuple(seed_sequence.spawn_key))
+
+
+def spawn(seed, n):
+    """
+    Independent seeds for n runs.
+
+    Parameters
+    ----------
+    seed : None, int, string or numpy.random.SeedSequence
+        Seed of the set.
+    n : int
+        Number of runs.
+
+    Returns
+    -------
+    list
+        Strings, see to_string().
+    """
+    return [to_string(e) for e in get_seed_sequence(seed).spawn(n)]
+
+
+def seed_global_generators(seed_sequence):
+    """
+    Seed random and the legacy numpy.random functions, for the SITL
+    modules that use them.
+
+    Parameters
+    ----------
+    seed_sequence : numpy.random.SeedSequence
+
+    Returns
+    -------
+    None.
+    """
+    state = seed_sequence.generate_state(2)
+    random.seed(int(state[0]))
+    np.random.seed(int(state[1]))
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:03:18 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import collections
+import math
+import numpy as np
+
+
+"""
+Sensor models of the SITL and the noise of the wind gusts.
+
+Classes:
+    NoiseBuffer -- Standard normal numbers drawn in blocks.
+    Sensor -- Noise, bias instability, random walk, quantization, latency.
+    SensorSet -- The sensors sent to the SITL programs.
+"""
+
+"""
+The noise is drawn from a numpy Generator in blocks and consumed one
+number at a time, so a run costs a few calls to the Generator instead of
+one random.gauss() per sensor per sample, and with the same seed the run
+is the same.
+
+Each sensor has its own Generator (spawned from the same SeedSequence),
+adding a sensor or changing its sample time doesn't change the noise of
+the others.
+
+Model of a reading:
+    reading = quantize(value(t - latency) + bias + random_walk + noise)
+    bias -- First order Gauss-Markov, bias_instability is its standard
+            deviation and bias_correlation_time its time constant.
+    random_walk -- Integrated white noise, random_walk [units/sqrt(s)].
+    noise -- White, sd is the standard deviation.
+"""
+
+
+class NoiseBuffer:
+    """
+    Standard normal numbers drawn in blocks from a numpy Generator.
+
+    Methods:
+        next -- Next number.
+    """
+
+    def __init__(self, rng, block_size=4096):
+        self.rng = rng
+        self.block_size = block_size
+        self._data = []
+        self._i = 0
+
+    def next(self):
+        """Return the next standard normal number."""
+        if self._i >= len(self._data):
+            # A list is much faster than a numpy array to read one by one
+            self._data = self.rng.standard_normal(self.block_size).tolist()
+            self._i = 0
+        value = self._data[self._i]
+        self._i += 1
+        return value
+
+
+class Sensor:
+    """
+    One sensor, samples the value every sample_time and holds it.
+
+    Methods:
+        setup -- Set the model.
+        update -- Give the real value, returns the reading.
+    """
+
+    def __init__(self, rng):
+        self._noise = NoiseBuffer(rng)
+        self.setup()
+
+    def setup(self, sd=0., sample_time=0., bias_instability=0.,
+              bias_correlation_time=100., random_walk=0., quantization=0.,
+              latency=0.):
+        """
+        Set the model of the sensor, all in the units of the reading.
+
+        Parameters
+        ----------
+        sd : float, optional
+            Standard deviation of the white noise. The default is 0.
+        sample_time : float, optional
+            Time between samples [s], 0 samples every update. The default
+            is 0.
+        bias_instability : float, optional
+            Standard deviation of the bias. The default is 0.
+        bias_correlation_time : float, optional
+            Time constant of the bias [s]. The default is 100.
+        random_walk : float, optional
+            Random walk [units/sqrt(s)]. The default is 0.
+        quantization : float, optional
+            Resolution of the reading, 0 doesn't quantize. The default is 0.
+        latency : float, optional
+            Delay of the reading [s]. The default is 0.
+
+        Returns
+        -------
+        None.
+        """
+        self.sd = sd
+        self.sample_time = sample_time
+        self.bias_instability = bias_instability
+        self.bias_correlation_time = bias_correlation_time
+        self.random_walk = random_walk
+        self.quantization = quantization
+        self.latency = latency
+        self._bias = 0.
+        self._walk = 0.
+        self._timer = None
+        self._reading = 0.
+        self._history = collections.deque()
+        self._bias_started = False
+
+    def _delayed(self, value, t):
+        history = self._history
+        history.append((t, value))
+        t_delayed = t - self.latency
+        while len(history) > 1 and history[1][0] <= t_delayed:
+            history.popleft()
+        return history[0][1]
+
+    def _update_bias(self, dt):
+        if self.bias_instability != 0:
+            if self._bias_started is False:
+                # Starts from the steady state distribution
+                self._bias = self.bias_instability * self._noise.next()
+                self._bias_started = True
+            else:
+                a = math.exp(-dt/self.bias_correlation_time)
+                self._bias = (a*self._bias
+                              + self.bias_instability*math.sqrt(1-a**2)*self._noise.next())
+        if self.random_walk != 0 and dt > 0:
+            self._walk += self.random_walk * math.sqrt(dt) * self._noise.next()
+
+    def update(self, value, t):
+        """
+        Give the real value at time t, returns the reading.
+
+        Parameters
+        ----------
+        value : float
+            Real value.
+        t : float
+            Time [s].
+
+        Returns
+        -------
+        float
+            Reading, the last sample if it's not time to sample.
+        """
+        if self.latency != 0:
+            value = self._delayed(value, t)
+        if self._timer is None:
+            dt = 0.
+        else:
+            dt = t - self._timer
+            if dt < self.sample_time*0.999:
+                return self._reading
+        self._timer = t
+        self._update_bias(dt)
+        reading = value + self._bias + self._walk
+        if self.sd != 0:
+            reading += self.sd * self._noise.next()
+        if self.quantization != 0:
+            reading = round(reading/self.quantization) * self.quantization
+        self._reading = reading
+        return reading
+
+
+class SensorSet:
+    """
+    The sensors of the SITL: gyro [º/s], accx, accz [g], altitude [m],
+    GNSS position [m] and velocity [m/s].
+
+    Methods:
+        setup -- Set the noise and sample times.
+        update -- Give the real values, returns the readings.
+        read_save_file_section -- Models from the save file.
+        get_save_file_section -- Models as they are stored in the save file.
+    """
+
+    names = ["gyro", "accx", "accz", "alt", "gnss_pos", "gnss_vel"]
+    model_parameters = ["bias_instability", "bias_correlation_time",
+                        "random_walk", "quantization", "latency"]
+    # The defaults of Sensor.setup()
+    model_defaults = {"bias_instability": 0., "bias_correlation_time": 100.,
+                      "random_walk": 0., "quantization": 0., "latency": 0.}
+
+    def __init__(self, seed_sequence=None):
+        """
+        Parameters
+        ----------
+        seed_sequence : numpy.random.SeedSequence or int, optional
+            Seed of the noise. The default is None (random).
+        """
+        if not isinstance(seed_sequence, np.random.SeedSequence):
+            seed_sequence = np.random.SeedSequence(seed_sequence)
+        self.sensors = [Sensor(np.random.default_rng(child))
+                        for child in seed_sequence.spawn(len(self.names))]
+        self.models = {}
+
+    def setup(self, sd, sample_times, use_models=True):
+        """
+        Set the white noise and sample time of each sensor, the rest of the
+        model is taken from models.
+
+        Parameters
+        ----------
+        sd : list
+            Standard deviation of each sensor.
+        sample_times : list
+            Sample time of each sensor [s].
+        use_models : bool, optional
+            Use bias, random walk, quantization and latency. The default
+            is True.
+
+        Returns
+        -------
+        None.
+        """
+        for i, sensor in enumerate(self.sensors):
+            if use_models is True:
+                model = self.models.get(self.names[i], {})
+            else:
+                model = {}
+            sensor.setup(sd[i], sample_times[i], **model)
+
+    def update(self, values, t):
+        """
+        Give the real values at time t, returns the readings.
+
+        Parameters
+        ----------
+        values : list
+            gyro, accx, accz, alt, gnss_pos, gnss_vel.
+        t : float
+            Time [s].
+
+        Returns
+        -------
+        list
+            Readings.
+        """
+        return [sensor.update(values[i], t) for i, sensor in enumerate(self.sensors)]
+
+    def read_save_file_section(self, section):
+        """
+        Set the models from the save file section. A row with an error
+        is skipped, the error says which row and sensor it is.
+
+        Parameters
+        ----------
+        section : list
+            Strings, the first one is the header, "sensor" and the
+            parameters (model_parameters, in any order), the rest are the
+            rows "gyro, value, value, ...". A parameter that isn't in the
+            header takes its default (model_defaults).
+
+        Returns
+        -------
+        None.
+        """
+        self.models = {}
+        if len(section) == 0:
+            return
+        header = [e.strip() for e in section[0].split(",")]
+        unknown = [e for e in header[1:] if e not in self.model_parameters]
+        if header[0] != "sensor" or unknown or len(set(header)) != len(header):
+            print("Error Reading the Sensor Models, row 1, the header must be "
+                  "sensor and the parameters: " + ", ".join(self.model_parameters))
+            return
+        for i, row in enumerate(section[1:], start=2):
+            if row == "":
+                continue
+            row = [e.strip() for e in row.split(",")]
+            where = "row {} ({})".format(i, row[0])
+            if row[0] not in self.names:
+                print("Error Reading the Sensor Models, " + where
+                      + ", unknown sensor, use: " + ", ".join(self.names))
+                continue
+            if row[0] in self.models:
+                print("Error Reading the Sensor Models, " + where + ", repeated sensor")
+                continue
+            if len(row) != len(header):
+                print("Error Reading the Sensor Models, " + where
+                      + ", {} values for {} columns".format(len(row), len(header)))
+                continue
+            try:
+                values = [float(e) for e in row[1:]]
+            except ValueError:
+                print("Error Reading the Sensor Models, " + where + ", not a number")
+                continue
+            self.models[row[0]] = dict(self.model_defaults,
+                                       **dict(zip(header[1:], values)))
+
+    def get_save_file_section(self):
+        """
+        Return the models as they are stored in the save file.
+
+        Returns
+        -------
+        list
+            Strings, the header and one row per sensor with a model, empty
+            if there are no models.
+        """
+        if len(self.models) == 0:
+            return []
+        section = [", ".join(["sensor"] + self.model_parameters)]
+        for name, model in self.models.items():
+            section.append(", ".join([name]
+                                     + [str(model[e]) for e in self.model_parameters]))
+        return section
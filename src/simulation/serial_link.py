@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:08:52 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import threading
+import time
+import numpy as np
+from src.simulation import sitl_protocol
+
+
+"""
+Handles the serial port of the hardware SITL in its own threads, so the
+simulation never waits for the port.
+
+Classes:
+    RingBuffer -- Single producer, single consumer queue.
+    SerialLink -- Reader and writer threads of the serial port.
+    StepStatistics -- Jitter and real time factor of the simulation loop.
+
+Functions:
+    sleep_until -- Sleeps until a perf_counter() time.
+"""
+
+"""
+The reader thread answers the board's requests ("R" or REQUEST frames)
+with the last sensor snapshot published by the simulation, and puts the
+commands in a ring buffer. The writer thread sends what the reader
+leaves in the other ring buffer. The simulation only publishes snapshots
+and takes the commands, none of it blocks.
+
+A binary COMMAND has the seq of the last SENSOR frame the board received,
+so it's matched to that frame. The text commands don't say which frame
+they answer, they are matched to the last frame written, which is the
+one the board had unless it gave up waiting for it. The writer marks a
+frame as sent just before writing it, so a command is never matched to
+a frame that was sent after it arrived.
+"""
+
+
+class RingBuffer:
+    """
+    Fixed size queue for one producer thread and one consumer thread.
+
+    Each index is written by only one of the threads, so it doesn't need
+    locks. If it's full the new element is dropped and counted.
+
+    Methods:
+        push -- Add an element (producer).
+        pop -- Take the oldest element (consumer).
+        pop_all -- Take all the elements (consumer).
+    """
+
+    def __init__(self, size=1024):
+        self._data = [None] * (size+1)
+        self._size = size + 1
+        self._head = 0  # Written by the producer
+        self._tail = 0  # Written by the consumer
+        self.overflows = 0
+
+    def __len__(self):
+        return (self._head-self._tail) % self._size
+
+    def push(self, element):
+        """Add an element, returns False if the buffer is full."""
+        head = self._head
+        next_head = (head+1) % self._size
+        if next_head == self._tail:
+            self.overflows += 1
+            return False
+        self._data[head] = element
+        # The element must be in place before the index moves
+        self._head = next_head
+        return True
+
+    def pop(self):
+        """Take the oldest element, None if it's empty."""
+        tail = self._tail
+        if tail == self._head:
+            return None
+        element = self._data[tail]
+        self._data[tail] = None
+        self._tail = (tail+1) % self._size
+        return element
+
+    def pop_all(self):
+        """Take all the elements, oldest first."""
+        elements = []
+        element = self.pop()
+        while element is not None:
+            elements.append(element)
+            element = self.pop()
+        return elements
+
+
+class SerialLink:
+    """
+    Reader and writer threads for the hardware SITL serial port, speaks
+    the text and the binary protocols.
+
+    Methods:
+        start -- Start the threads.
+        stop -- Stop the threads.
+        publish_sensors -- Set the data sent in the next request.
+        get_commands -- Commands received since the last call.
+    """
+
+    def __init__(self, serial_port, binary=False, buffer_size=1024,
+                 latency_recorder=None):
+        self.serial_port = serial_port
+        self.binary = binary
+        # sitl_latency.LatencyRecorder, None to not record
+        self.latency_recorder = latency_recorder
+        self.rx_buffer = RingBuffer(buffer_size)
+        self.tx_buffer = RingBuffer(buffer_size)
+        self.parser = sitl_protocol.FrameParser()
+        # Replaced as a whole, so the reader never sees half of it
+        self._snapshot = None
+        self._seq = 0
+        # t_us of the frame sent with each seq (binary) and of the last
+        # frame sent (text), written by the writer before the frame
+        self._sent_t_us = [None] * 0x10000
+        self._last_sent_t_us = None
+        self._running = False
+        self._tx_event = threading.Event()
+        self._threads = []
+        self.requests = 0
+        self.requests_without_data = 0
+        self.read_errors = 0
+
+    def start(self):
+        """Start the reader and writer threads."""
+        # Short timeout so the reader checks if it has to stop
+        self.serial_port.timeout = 0.01
+        self._running = True
+        self._threads = [threading.Thread(target=self._reader, daemon=True),
+                         threading.Thread(target=self._writer, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop the threads, waits for them to finish."""
+        self._running = False
+        self._tx_event.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def publish_sensors(self, t_us, sensors):
+        """
+        Set the sensor data that is sent in the next request.
+
+        Parameters
+        ----------
+        t_us : int
+            Simulation time [us].
+        sensors : list
+            gyro, accx, accz, alt, gnss_pos, gnss_vel.
+
+        Returns
+        -------
+        None.
+        """
+        self._snapshot = (t_us, tuple(sensors))
+
+    def get_commands(self):
+        """
+        Commands received since the last call, oldest first.
+
+        Returns
+        -------
+        list
+            (servo [º], parachute, t_us) tuples, t_us is the frame that
+            the command answers (None if it's not known).
+        """
+        return self.rx_buffer.pop_all()
+
+    def _send(self, data, t_us, seq=None):
+        self.tx_buffer.push((data, t_us, seq))
+        self._tx_event.set()
+
+    def _answer_request(self):
+        self.requests += 1
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.requests_without_data += 1
+            return
+        t_us, sensors = snapshot
+        if self.binary is True:
+            self._seq = (self._seq+1) & 0xFFFF
+            self._send(sitl_protocol.encode_sensor(self._seq, t_us, sensors), t_us,
+                       self._seq)
+        else:
+            # last comma because the Arduino library separates the
+            # string at commas
+            send = (str(round(sensors[0], 6)) + ","
+                    + str(round(sensors[1], 6)) + ","
+                    + str(round(sensors[2], 6)) + ","
+                    + str(round(sensors[3], 2)) + ",\n")
+            self._send(send.encode("ASCII"), t_us)
+
+    def _reader(self):
+        while self._running is True:
+            try:
+                if self.binary is True:
+                    self._read_binary()
+                else:
+                    self._read_text()
+            except (OSError, ValueError, IndexError):
+                self.read_errors += 1
+
+    def _read_binary(self):
+        waiting = self.serial_port.inWaiting()
+        data = self.serial_port.read(max(waiting, 1))
+        for frame_type, seq, values in self.parser.feed(data):
+            if frame_type == sitl_protocol.REQUEST:
+                self._answer_request()
+            elif frame_type == sitl_protocol.COMMAND:
+                # seq of the SENSOR frame that the board used
+                self._command_received(values[0], values[1], self._sent_t_us[seq])
+
+    def _read_text(self):
+        read0 = self.serial_port.readline()
+        if read0 == b"":
+            return
+        read = read0.decode("ASCII", errors="ignore").strip()
+        if read == "R":
+            # Arduino ready to Read
+            self._answer_request()
+        elif read != "":
+            # Arduino sent the servo and parachute commands
+            read_split = read.split(",")
+            self._command_received(float(read_split[0]), int(read_split[1]),
+                                   self._last_sent_t_us)
+
+    def _command_received(self, servo, parachute, t_us):
+        if self.latency_recorder is not None and t_us is not None:
+            self.latency_recorder.command_received(t_us)
+        self.rx_buffer.push((servo, parachute, t_us))
+
+    def _writer(self):
+        while self._running is True:
+            self._tx_event.wait(0.01)
+            self._tx_event.clear()
+            element = self.tx_buffer.pop()
+            while element is not None:
+                data, t_us, seq = element
+                # Before the write, the answer can arrive before it returns
+                if self.latency_recorder is not None:
+                    self.latency_recorder.sent(t_us)
+                if seq is None:
+                    self._last_sent_t_us = t_us
+                else:
+                    self._sent_t_us[seq] = t_us
+                self.serial_port.write(data)
+                element = self.tx_buffer.pop()
+
+
+class StepStatistics:
+    """
+    Measures the period of the simulation loop.
+
+    Methods:
+        new_step -- Call at the beginning of each step.
+        report -- Print the jitter and the real time factor.
+    """
+
+    def __init__(self, T):
+        self.T = T
+        self._steps = []
+        self._t0 = time.perf_counter()
+
+    def new_step(self):
+        """Store the time of the step."""
+        self._steps.append(time.perf_counter())
+
+    def get_statistics(self, sim_time):
+        """
+        Jitter and real time factor.
+
+        Parameters
+        ----------
+        sim_time : float
+            Simulated time.
+
+        Returns
+        -------
+        dict
+            mean_period, jitter_std, jitter_max [s], real_time_factor.
+        """
+        wall_time = time.perf_counter() - self._t0
+        periods = np.diff(np.array(self._steps))
+        if len(periods) == 0:
+            periods = np.array([0.])
+        jitter = periods - self.T
+        return {"mean_period": float(np.mean(periods)),
+                "jitter_std": float(np.std(jitter)),
+                "jitter_max": float(np.max(np.abs(jitter))),
+                "real_time_factor": sim_time / wall_time if wall_time > 0 else 0.}
+
+    def report(self, sim_time):
+        """Print the jitter and the real time factor."""
+        stats = self.get_statistics(sim_time)
+        print("Step period: {:.1f} us (target {:.1f} us)".format(stats["mean_period"]*1e6,
+                                                               self.T*1e6))
+        print("Step jitter: {:.1f} us std, {:.1f} us max".format(stats["jitter_std"]*1e6,
+                                                               stats["jitter_max"]*1e6))
+        print("Real time factor: {:.3f}".format(stats["real_time_factor"]))
+
+
+def sleep_until(deadline):
+    """Sleep until time.perf_counter() reaches deadline."""
+    remaining = deadline - time.perf_counter()
+    if remaining > 0:
+        time.sleep(remaining)
@@ -36,6 +36,7 @@ class Servo:
     Methods:
         setup -- Set the servo characteristics
         simulate -- Simulate the servo and obtain the current position
+        get_linear_model -- Continuous state space model of the servo
         test -- Test the servo to ensure its speed is correct
     """
 
@@ -106,6 +107,8 @@ class Servo:
         self._t_prev = -0.0001
         self._sample_time = 0.001
         self._timer_run = 0
+        # sitl_latency.LatencyRecorder, it's told when a command is latched
+        self.latency_recorder = None
         self.K = interp1d([10*DEG2RAD, 20*DEG2RAD, 45*DEG2RAD, 90*DEG2RAD],
                           [3761, 2159*1.1, 691.9, 256.9],  # *1.1 because it gives much better results
                           kind="linear",
@@ -262,12 +265,38 @@ class Servo:
         if t_current > (self._timer_run + self._servo_sample_time*0.999 + 0.001):
             self._timer_run = t_current
             u_2_round = u_servo
+            if self.latency_recorder is not None:
+                self.latency_recorder.servo_latched(t_current)
         self._u = self._round_input(u_2_round)
         self._x_dot_s = np.dot(self._A_s, self._x_s) + np.dot(self._B_s, self._u)
         self._out_s = np.dot(self._C_s, self._x_s) + np.dot(self._D_s, self._u)
         self._x_s = self._x_dot_s
         return self._out_s[0,0]
 
+    def get_linear_model(self, u_delta=1*DEG2RAD):
+        """
+        Continuous state space model of the servo for a step of size
+        u_delta, the same one used by simulate() but with K and J fixed.
+
+        Parameters
+        ----------
+        u_delta : float -- Step size used to obtain K and J [rad].
+
+        Returns
+        -------
+        A, B, C, D : numpy arrays -- States are position and velocity.
+        """
+        u_delta = abs(u_delta) * self._actuator_weight_compensation
+        K = float(self.K(u_delta))
+        J = float(self.J(u_delta))
+        A = np.array([[0., 1.],
+                      [-K, -J]])
+        B = np.array([[0.],
+                      [K]])
+        C = np.array([[1., 0.]])
+        D = np.array([[0.]])
+        return A, B, C, D
+
     def _round_input(self, u_inp):
         u_inp *= RAD2DEG
         u_inp /= self._resolution
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:02:45 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import time
+import numpy as np
+
+
+"""
+Measures how old the sensor data is when the board acts on it in the
+hardware SITL.
+
+Classes:
+    LatencyRecorder -- Timestamps of each frame along the SITL loop.
+"""
+
+"""
+A frame is identified by its simulation time in microseconds (the t_us of
+the SENSOR frame), and it's timestamped at each stage:
+    sample -- The simulation computes the sensor readings.
+    sent -- The readings are written to the serial port.
+    command -- The command that answers the frame is read back.
+    servo -- The servo latches that command (simulation time).
+
+In real time a binary COMMAND has the seq of the SENSOR frame the board
+used, the text commands are assigned to the last frame sent (see
+serial_link). A frame is "sent" just before it's written, so the round
+trip can't be negative; if one is (a board that doesn't echo the seq)
+it's counted apart and left out of the latencies and the histogram. In lockstep every frame is
+acknowledged with the last command, even if the program didn't run, so
+only the commands that change are applied, they mark when the program
+computed a new output (a saturated output that doesn't change is not
+counted, so the control rate is a lower bound).
+
+The stages are called from different threads (simulation, reader and
+writer), each one only appends to its own lists.
+"""
+
+
+class LatencyRecorder:
+    """
+    Stores the timestamps of the frames and computes the statistics.
+
+    Methods:
+        sample -- The simulation sampled the sensors.
+        sent -- The frame was written to the port.
+        command_received -- The command of a frame was read.
+        command_applied -- The simulation took the command of a frame.
+        servo_latched -- The servo latched the last applied command.
+        get_frames -- Stages of each frame that was sent.
+        get_statistics -- Latencies, dropped and late frames, control rate.
+        histogram -- Histogram of the round trip latency.
+        report -- Print the statistics.
+        export_csv -- Write the frames to a .csv.
+    """
+
+    def __init__(self, T_program, deadline=None, lockstep=False):
+        """
+        Parameters
+        ----------
+        T_program : float
+            Sample time of the flight computer program [s].
+        deadline : float, optional
+            Round trips longer than this are late. The default is
+            T_program.
+        lockstep : bool, optional
+            The SITL runs in lockstep. The default is False.
+        """
+        self.T_program = T_program
+        self.lockstep = lockstep
+        if deadline is None:
+            deadline = T_program
+        self.deadline = deadline
+        self._t0 = time.perf_counter()
+        self._samples = []
+        self._sent = []
+        self._commands = []
+        self._servo = []
+        self._applied = []
+        self._applied_key = None
+        self._latched_key = None
+
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    def sample(self, t_us):
+        """The simulation sampled the sensors at t_us [us]."""
+        self._samples.append((t_us, self._now()))
+
+    def sent(self, t_us):
+        """The frame t_us was written to the serial port."""
+        self._sent.append((t_us, self._now()))
+
+    def command_received(self, t_us):
+        """The command that answers the frame t_us was read."""
+        self._commands.append((t_us, self._now()))
+
+    def command_applied(self, t_us):
+        """The simulation took the command of the frame t_us."""
+        self._applied.append(t_us)
+        self._applied_key = t_us
+
+    def servo_latched(self, t_sim):
+        """The servo latched the last applied command at t_sim [s]."""
+        key = self._applied_key
+        if key is not None and key != self._latched_key:
+            self._latched_key = key
+            self._servo.append((key, t_sim, self._now()))
+
+    def get_frames(self):
+        """
+        Stages of each frame that was sent, one row per frame.
+
+        Returns
+        -------
+        numpy array
+            Columns: t_us, sample, sent, command [s, wall time since the
+            start], servo [s, simulation time]. NaN if the frame didn't
+            reach the stage.
+        """
+        samples = dict(self._samples)
+        commands = {}
+        for key, t in self._commands:
+            # The first answer is the one that counts
+            commands.setdefault(key, t)
+        servo = {}
+        for key, t_sim, _ in self._servo:
+            servo.setdefault(key, t_sim)
+        sent = {}
+        for key, t in self._sent:
+            sent.setdefault(key, t)
+        frames = np.full((len(sent), 5), np.nan)
+        for i, key in enumerate(sorted(sent)):
+            frames[i] = [key, samples.get(key, np.nan), sent[key],
+                         commands.get(key, np.nan), servo.get(key, np.nan)]
+        return frames
+
+    def get_statistics(self, sim_time):
+        """
+        Latencies, dropped and late frames and achieved control rate.
+
+        Parameters
+        ----------
+        sim_time : float
+            Simulated time [s].
+
+        Returns
+        -------
+        dict
+            round_trip, data_age and servo_age are arrays [s]; frames_sent,
+            frames_dropped, frames_late, commands, negative_round_trips;
+            control_rate and target_rate [Hz].
+        """
+        frames = self.get_frames()
+        answered = frames[~np.isnan(frames[:, 3])]
+        # A command matched to the wrong frame, not a latency
+        negative = answered[:, 3] < answered[:, 2]
+        answered = answered[~negative]
+        # Transport and board computation, sent -> command
+        round_trip = answered[:, 3] - answered[:, 2]
+        # How old the data is when the command arrives, sample -> command
+        data_age = answered[:, 3] - answered[:, 1]
+        data_age = data_age[~np.isnan(data_age)]
+        latched = frames[~np.isnan(frames[:, 4])]
+        # How old the data is when the servo moves, in simulation time
+        servo_age = latched[:, 4] - latched[:, 0]/1000000
+        n_commands = len(answered)
+        if sim_time > 0:
+            control_rate = len(self._applied) / sim_time
+        else:
+            control_rate = 0.
+        return {"round_trip": round_trip,
+                "data_age": data_age,
+                "servo_age": servo_age,
+                "frames_sampled": len(self._samples),
+                "frames_sent": len(frames),
+                "frames_dropped": len(frames) - n_commands - int(np.sum(negative)),
+                "negative_round_trips": int(np.sum(negative)),
+                "frames_late": int(np.sum(round_trip > self.deadline)),
+                "commands": n_commands,
+                "control_rate": control_rate,
+                "target_rate": 1 / self.T_program}
+
+    def histogram(self, bins=10, sim_time=1.):
+        """
+        Histogram of the round trip latency.
+
+        Returns
+        -------
+        counts : numpy array
+        edges : numpy array
+            Bin edges [s].
+        """
+        round_trip = self.get_statistics(sim_time)["round_trip"]
+        if len(round_trip) == 0:
+            return np.zeros(bins, dtype=int), np.zeros(bins+1)
+        return np.histogram(round_trip, bins=bins)
+
+    def report(self, sim_time, bins=10):
+        """Print the statistics and the round trip histogram."""
+        stats = self.get_statistics(sim_time)
+        print("SITL frames: {} sent, {} dropped, {} late (> {:.1f} ms)".format(
+            stats["frames_sent"], stats["frames_dropped"], stats["frames_late"],
+            self.deadline*1000))
+        if stats["negative_round_trips"] > 0:
+            print("Commands before their frame (not counted): {}".format(
+                stats["negative_round_trips"]))
+        if self.lockstep is True:
+            label = "Control rate (outputs that changed)"
+        else:
+            label = "Control rate"
+        print("{}: {:.1f} Hz (T_Program {:.1f} Hz)".format(label, stats["control_rate"],
+                                                         stats["target_rate"]))
+        for name, label in (("round_trip", "Round trip"),
+                            ("data_age", "Data age at command"),
+                            ("servo_age", "Data age at servo")):
+            values = stats[name] * 1000
+            if len(values) == 0:
+                continue
+            print("{}: {:.2f} ms mean, {:.2f} ms p95, {:.2f} ms max".format(
+                label, np.mean(values), np.percentile(values, 95), np.max(values)))
+        counts, edges = self.histogram(bins, sim_time)
+        if np.sum(counts) == 0:
+            return
+        print("Round trip histogram [ms]:")
+        scale = 40 / np.max(counts)
+        for i, count in enumerate(counts):
+            print("{:8.2f} - {:8.2f} | {:<40} {}".format(edges[i]*1000, edges[i+1]*1000,
+                                                        "#" * int(count*scale), count))
+
+    def export_csv(self, file_path):
+        """
+        Write one row per frame to a .csv, times in seconds.
+
+        Parameters
+        ----------
+        file_path : string
+            Path of the .csv.
+
+        Returns
+        -------
+        None.
+        """
+        frames = self.get_frames()
+        to_file = "Frame Time,Sample,Sent,Command,Servo,Round Trip,Data Age at Servo\n"
+        for frame in frames:
+            round_trip = frame[3] - frame[2]
+            servo_age = frame[4] - frame[0]/1000000
+            values = [frame[0]/1000000, frame[1], frame[2], frame[3], frame[4],
+                      round_trip, servo_age]
+            to_file += ",".join("" if np.isnan(e) else str(round(e, 7)) for e in values) + "\n"
+        try:
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(to_file)
+            print("SITL Latency Exported Successfully")
+        except EnvironmentError:
+            print("Error Exporting SITL Latency")
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:11:37 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import time
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from src import python_sitl_functions
+from src.simulation.module_manager import module_manager
+from src.simulation.sweep import apply_overrides
+from src.simulation import seeds
+
+
+"""
+Runs a Python SITL module in its own process.
+
+Classes:
+    SharedMemoryBackend -- Answers the Sim functions inside the process.
+    SITLProcess -- Starts the process and runs void_loop() every step.
+"""
+
+"""
+The simulator and the module exchange the data through a block of shared
+memory (float64):
+    t, gyro, accx, accz, alt, gnss_pos, gnss_vel -- Written by the simulator.
+    servo [º], parachute, ignition, command count -- Written by sendCommand.
+    cpu time of the last void_loop, status, plot variables (10).
+
+Each step the simulator writes the sensors and releases step_ready, the
+module runs void_loop() and releases step_done. The data is only written
+by the side that is running, so it's never read half written.
+
+The CPU time of each void_loop is measured with time.thread_time(), the
+loops that take more than the budget are counted as overruns. If the
+module takes longer than step_timeout the simulation continues with the
+last command and doesn't give it new data until it finishes (skipped
+steps), like a flight computer that misses its deadline. If it takes
+longer than hang_timeout, raises an exception or dies, the run stops.
+"""
+
+
+_T = 0
+_SENSORS = slice(1, 7)
+_SERVO = 7
+_PARACHUTE = 8
+_IGNITION = 9
+_COMMAND_COUNT = 10
+_CPU_TIME = 11
+_STATUS = 12
+_PLOTS = slice(13, 23)
+_SIZE = 23
+
+STATUS_RUNNING = 0
+STATUS_STOP = 1
+STATUS_ERROR = 2
+
+
+class SharedMemoryBackend:
+    """Sim functions of the module, read and written in shared memory."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def millis(self):
+        return int(self.data[_T] * 1000)
+
+    def micros(self):
+        return int(self.data[_T] * 1000000)
+
+    def getSimData(self):
+        return [float(e) for e in self.data[_SENSORS]]
+
+    def sendCommand(self, servo, parachute, ignition=0):
+        self.data[_SERVO] = servo
+        self.data[_PARACHUTE] = int(parachute)
+        self.data[_IGNITION] = int(ignition)
+        self.data[_COMMAND_COUNT] += 1
+
+    def plot_variable(self, var, i):
+        self.data[_PLOTS.start + i-1] = var
+
+
+def _run_module(shm_name, module_path, module_name, overrides, seed,
+                step_ready, step_done, errors):
+    # Main function of the module's process
+    shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray((_SIZE,), dtype=np.float64, buffer=shm.buf)
+    python_sitl_functions.set_backend(SharedMemoryBackend(data))
+    try:
+        seeds.seed_global_generators(seeds.get_seed_sequence(seed))
+        program = module_manager.new_program(module_path, module_name)
+        program.everything_that_is_outside_functions()
+        apply_overrides(program, overrides)
+        program.void_setup()
+        step_done.release()
+        while True:
+            step_ready.acquire()
+            if data[_STATUS] == STATUS_STOP:
+                break
+            t0 = time.thread_time()
+            program.void_loop()
+            data[_CPU_TIME] = time.thread_time() - t0
+            step_done.release()
+    except Exception:
+        errors.put(traceback.format_exc())
+        data[_STATUS] = STATUS_ERROR
+        step_done.release()
+    del data
+    shm.close()
+
+
+class SITLProcess:
+    """
+    Python SITL module running in another process.
+
+    Methods:
+        start -- Start the process, runs the setup of the module.
+        step -- Run void_loop() with the data of this step.
+        get_command -- New command of the module, if there is one.
+        get_plot_variables -- Variables of Sim.plot_variable().
+        stop -- Stop the process.
+        get_statistics -- CPU time per loop, overruns and skipped steps.
+        report -- Print the statistics.
+    """
+
+    def __init__(self, module_path, module_name, cpu_budget=0.001,
+                 step_timeout=0.1, hang_timeout=5., overrides=None, seed=None):
+        """
+        Parameters
+        ----------
+        module_path : string or Path
+            Path of the module.
+        module_name : string
+            Name of the module.
+        cpu_budget : float, optional
+            CPU time available for each void_loop() [s]. The default is
+            0.001.
+        step_timeout : float, optional
+            Time the simulation waits for void_loop() before continuing
+            without it [s]. The default is 0.1.
+        hang_timeout : float, optional
+            Time after which the module is considered hung [s]. The
+            default is 5.
+        overrides : dict, optional
+            Attributes of the SITLProgram, see sweep.apply_overrides().
+            The default is None.
+        seed : numpy.random.SeedSequence, optional
+            Seed of random and numpy.random in the process, see seeds.py.
+            The default is None.
+        """
+        self.module_path = str(module_path)
+        self.module_name = module_name
+        self.cpu_budget = cpu_budget
+        self.step_timeout = step_timeout
+        self.hang_timeout = hang_timeout
+        if overrides is None:
+            overrides = {}
+        self.overrides = overrides
+        self.seed = seed
+        self.cpu_times = []
+        self.overruns = 0
+        self.late_steps = 0
+        self.skipped_steps = 0
+        self.error = ""
+        self._busy = False
+        self._t_step = 0.
+        self._command_count = 0
+        self._new_command = None
+        self._process = None
+        self._shm = None
+        self._data = None
+
+    def start(self):
+        """
+        Start the process and run the setup of the module.
+
+        Returns
+        -------
+        bool
+            False if the module failed.
+        """
+        # spawn, so the process doesn't inherit the simulator or the GUI
+        context = multiprocessing.get_context("spawn")
+        self._shm = shared_memory.SharedMemory(create=True, size=_SIZE*8)
+        self._data = np.ndarray((_SIZE,), dtype=np.float64, buffer=self._shm.buf)
+        self._data[:] = 0
+        self._step_ready = context.Semaphore(0)
+        self._step_done = context.Semaphore(0)
+        self._errors = context.Queue()
+        self._process = context.Process(target=_run_module,
+                                        args=(self._shm.name, self.module_path,
+                                              self.module_name, self.overrides,
+                                              self.seed, self._step_ready,
+                                              self._step_done, self._errors),
+                                        daemon=True)
+        self._process.start()
+        if self._wait_done(self.hang_timeout) is False:
+            return False
+        return self._check_status()
+
+    def _wait_done(self, timeout):
+        deadline = time.perf_counter() + timeout
+        while True:
+            if self._step_done.acquire(timeout=min(timeout, 0.1)) is True:
+                return True
+            if self._process.is_alive() is False:
+                self.error = "The SITL module's process died"
+                return False
+            if time.perf_counter() > deadline:
+                self.error = "The SITL module is not responding"
+                return False
+
+    def _check_status(self):
+        if self._data[_STATUS] == STATUS_ERROR:
+            self.error = self._errors.get(timeout=1)
+            return False
+        return True
+
+    def _collect(self):
+        if self._check_status() is False:
+            return False
+        cpu_time = float(self._data[_CPU_TIME])
+        self.cpu_times.append(cpu_time)
+        if cpu_time > self.cpu_budget:
+            self.overruns += 1
+        if self._data[_COMMAND_COUNT] != self._command_count:
+            self._command_count = self._data[_COMMAND_COUNT]
+            self._new_command = (float(self._data[_SERVO]),
+                                 int(self._data[_PARACHUTE]),
+                                 int(self._data[_IGNITION]))
+        return True
+
+    def step(self, t, sensors):
+        """
+        Run void_loop() with the time and sensors of this step.
+
+        Parameters
+        ----------
+        t : float
+            Simulation time [s].
+        sensors : list
+            gyro, accx, accz, alt, gnss_pos, gnss_vel.
+
+        Returns
+        -------
+        bool
+            False if the module failed, the reason is in error.
+        """
+        if self._busy is True:
+            # Still running the loop of a previous step
+            if self._step_done.acquire(block=False) is False:
+                self.skipped_steps += 1
+                if time.perf_counter() - self._t_step > self.hang_timeout:
+                    self.error = "The SITL module is not responding"
+                    return False
+                if self._process.is_alive() is False:
+                    self.error = "The SITL module's process died"
+                    return False
+                return True
+            self._busy = False
+            if self._collect() is False:
+                return False
+        self._data[_T] = t
+        self._data[_SENSORS] = sensors
+        self._t_step = time.perf_counter()
+        self._step_ready.release()
+        if self._step_done.acquire(timeout=self.step_timeout) is True:
+            return self._collect()
+        self.late_steps += 1
+        self._busy = True
+        if self._process.is_alive() is False:
+            self.error = "The SITL module's process died"
+            return False
+        return True
+
+    def get_command(self):
+        """
+        New command sent by the module since the last call.
+
+        Returns
+        -------
+        tuple or None
+            (servo [º], parachute, ignition), None if there isn't one.
+        """
+        command = self._new_command
+        self._new_command = None
+        return command
+
+    def get_plot_variables(self):
+        """Variables of Sim.plot_variable(), list of 10."""
+        return [float(e) for e in self._data[_PLOTS]]
+
+    def stop(self):
+        """Stop the process and free the shared memory."""
+        if self._process is not None:
+            if self._busy is False and self._process.is_alive() is True:
+                self._data[_STATUS] = STATUS_STOP
+                self._step_ready.release()
+                self._process.join(timeout=1)
+            if self._process.is_alive() is True:
+                self._process.terminate()
+                self._process.join(timeout=1)
+            self._process = None
+        if self._shm is not None:
+            del self._data
+            self._data = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def get_statistics(self):
+        """
+        CPU time of the loops and deadline misses.
+
+        Returns
+        -------
+        dict
+            loops, mean_cpu_time, max_cpu_time, p99_cpu_time [s],
+            overruns, late_steps and skipped_steps.
+        """
+        cpu_times = np.array(self.cpu_times)
+        if len(cpu_times) == 0:
+            cpu_times = np.array([0.])
+        return {"loops": len(self.cpu_times),
+                "mean_cpu_time": float(np.mean(cpu_times)),
+                "max_cpu_time": float(np.max(cpu_times)),
+                "p99_cpu_time": float(np.percentile(cpu_times, 99)),
+                "overruns": self.overruns,
+                "late_steps": self.late_steps,
+                "skipped_steps": self.skipped_steps}
+
+    def report(self):
+        """Print the statistics."""
+        stats = self.get_statistics()
+        print("void_loop CPU time: {:.1f} us mean, {:.1f} us p99, {:.1f} us max".format(
+            stats["mean_cpu_time"]*1e6, stats["p99_cpu_time"]*1e6,
+            stats["max_cpu_time"]*1e6))
+        print("Overruns: {} of {} loops (budget {:.1f} us)".format(
+            stats["overruns"], stats["loops"], self.cpu_budget*1e6))
+        if stats["late_steps"] > 0:
+            print("Late loops: {}, steps without the module: {}".format(
+                stats["late_steps"], stats["skipped_steps"]))
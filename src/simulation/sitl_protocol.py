@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:41:07 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import struct
+
+
+"""
+Handles the binary frames of the hardware SITL serial protocol.
+
+Classes:
+    FrameParser -- Extracts the frames from the received bytes.
+    BinaryLink -- Sends and receives frames through the serial port.
+
+Functions:
+    wait_handshake -- Waits for the board and detects the protocol.
+"""
+
+"""
+Frame (little endian):
+    0xA5 0x5A | version (u8) | type (u8) | seq (u16) | length (u8) |
+    payload (length bytes) | CRC16-CCITT (u16)
+
+The CRC (0x1021, starting at 0xFFFF) covers from the version to the end
+of the payload.
+
+Types:
+    HELLO -- Board -> PC, flags (u8), bit 0 = lockstep.
+    REQUEST -- Board -> PC, no payload, asks for a SENSOR frame (real time).
+    SENSOR -- PC -> Board, t_us (u32), gyro, accx, accz, alt, gnss_pos,
+              gnss_vel (f32).
+    COMMAND -- Board -> PC, servo (f32), parachute (u8). Its seq is the
+               one of the last SENSOR frame the board received, the
+               one it acknowledges in lockstep.
+
+The ASCII protocol is still detected by its handshake ("A" or "L").
+"""
+
+
+MAGIC = b"\xA5\x5A"
+VERSION = 1
+
+HELLO = 0x01
+REQUEST = 0x02
+SENSOR = 0x03
+COMMAND = 0x04
+
+FLAG_LOCKSTEP = 0x01
+
+_HEADER = struct.Struct("<BBHB")
+_CRC = struct.Struct("<H")
+_SENSOR = struct.Struct("<I6f")
+_COMMAND = struct.Struct("<fB")
+_HELLO = struct.Struct("<B")
+_PAYLOADS = {HELLO: _HELLO, REQUEST: None, SENSOR: _SENSOR, COMMAND: _COMMAND}
+
+
+def _crc16_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """Return the CRC16-CCITT (0x1021, 0xFFFF) of data."""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def encode_frame(frame_type, seq, payload=b""):
+    """
+    Build a frame.
+
+    Parameters
+    ----------
+    frame_type : int
+        HELLO, REQUEST, SENSOR or COMMAND.
+    seq : int
+        Sequence number, wraps at 65536.
+    payload : bytes, optional
+        Payload. The default is b"".
+
+    Returns
+    -------
+    bytes
+        Frame.
+    """
+    body = _HEADER.pack(VERSION, frame_type, seq & 0xFFFF, len(payload)) + payload
+    return MAGIC + body + _CRC.pack(crc16_ccitt(body))
+
+
+def encode_sensor(seq, t_us, sensors):
+    """Build a SENSOR frame, sensors = [gyro, accx, accz, alt, gnss_pos, gnss_vel]."""
+    return encode_frame(SENSOR, seq, _SENSOR.pack(t_us & 0xFFFFFFFF, *sensors))
+
+
+def encode_command(seq, servo, parachute):
+    """Build a COMMAND frame (used to emulate a board)."""
+    return encode_frame(COMMAND, seq, _COMMAND.pack(servo, parachute))
+
+
+def encode_hello(lockstep):
+    """Build a HELLO frame (used to emulate a board)."""
+    return encode_frame(HELLO, 0, _HELLO.pack(FLAG_LOCKSTEP if lockstep else 0))
+
+
+class FrameParser:
+    """
+    Extracts the frames from a stream of bytes, the bytes can arrive in
+    any number of pieces. Frames with a wrong CRC or version are
+    discarded and counted.
+
+    Methods:
+        feed -- Add bytes and return the complete frames.
+        pending -- True if there is an incomplete frame.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.crc_errors = 0
+        self.version_errors = 0
+
+    def pending(self):
+        """Return True if there is an incomplete frame in the buffer."""
+        return len(self._buffer) > 0
+
+    def feed(self, data):
+        """
+        Add the received bytes and return the complete frames.
+
+        Parameters
+        ----------
+        data : bytes
+            Received bytes.
+
+        Returns
+        -------
+        list
+            Frames as (type, seq, values), values is a tuple with the
+            payload already unpacked.
+        """
+        self._buffer += data
+        frames = []
+        buffer = self._buffer
+        while True:
+            start = buffer.find(MAGIC)
+            if start < 0:
+                # Keeps a possible half magic number
+                if buffer[-1:] == MAGIC[0:1]:
+                    del buffer[:-1]
+                else:
+                    del buffer[:]
+                break
+            del buffer[:start]
+            if len(buffer) < 2 + _HEADER.size:
+                break
+            version, frame_type, seq, length = _HEADER.unpack_from(buffer, 2)
+            end = 2 + _HEADER.size + length
+            if len(buffer) < end + _CRC.size:
+                break
+            body = bytes(buffer[2:end])
+            (crc,) = _CRC.unpack_from(buffer, end)
+            if crc != crc16_ccitt(body):
+                self.crc_errors += 1
+                # Skips the magic number, the frame could start inside
+                del buffer[:2]
+                continue
+            del buffer[:end + _CRC.size]
+            if version != VERSION:
+                self.version_errors += 1
+                continue
+            payload = body[_HEADER.size:]
+            structure = _PAYLOADS.get(frame_type)
+            if structure is None:
+                values = ()
+            elif len(payload) != structure.size:
+                self.crc_errors += 1
+                continue
+            else:
+                values = structure.unpack(payload)
+            frames.append((frame_type, seq, values))
+        return frames
+
+
+class BinaryLink:
+    """
+    Binary protocol through a serial port (or any object with read, write
+    and inWaiting).
+
+    Methods:
+        send_sensors -- Send a SENSOR frame.
+        read_frames -- Frames received so far.
+        wait_command -- Wait for the COMMAND that acknowledges a frame.
+    """
+
+    def __init__(self, serial_port):
+        self.serial_port = serial_port
+        self.parser = FrameParser()
+        self.seq = 0
+
+    def send_sensors(self, t_us, sensors):
+        """
+        Send a SENSOR frame.
+
+        Parameters
+        ----------
+        t_us : int
+            Simulation time [us].
+        sensors : list
+            gyro, accx, accz, alt, gnss_pos, gnss_vel.
+
+        Returns
+        -------
+        int
+            Sequence number of the frame.
+        """
+        self.seq = (self.seq+1) & 0xFFFF
+        self.serial_port.write(encode_sensor(self.seq, t_us, sensors))
+        return self.seq
+
+    def read_frames(self):
+        """Return the frames received so far, doesn't block."""
+        waiting = self.serial_port.inWaiting()
+        if waiting == 0:
+            return []
+        return self.parser.feed(self.serial_port.read(waiting))
+
+    def wait_command(self, seq):
+        """
+        Wait for the COMMAND frame with the sequence number seq, the
+        serial port timeout is the one used.
+
+        Parameters
+        ----------
+        seq : int
+            Sequence number of the SENSOR frame.
+
+        Returns
+        -------
+        tuple or None
+            (servo, parachute), None if the board didn't answer.
+        """
+        while True:
+            # Reads at least one byte so it blocks with the port timeout
+            data = self.serial_port.read(max(self.serial_port.inWaiting(), 1))
+            if data == b"":
+                return None
+            for frame_type, frame_seq, values in self.parser.feed(data):
+                if frame_type == COMMAND and frame_seq == seq:
+                    return values
+
+
+def wait_handshake(serial_port):
+    """
+    Wait for the board to start and detect the protocol.
+
+    Parameters
+    ----------
+    serial_port : serial.Serial
+        Port.
+
+    Returns
+    -------
+    binary : bool
+        True if the board uses binary frames.
+    lockstep : bool
+        True if the board runs in lockstep.
+    """
+    parser = FrameParser()
+    in_frame = False
+    while True:
+        byte = serial_port.read()
+        if in_frame is False and byte in (b"A", b"L"):
+            serial_port.flushInput()
+            return False, byte == b"L"
+        if in_frame is True or byte == MAGIC[0:1]:
+            for frame_type, _, values in parser.feed(byte):
+                if frame_type == HELLO:
+                    return True, bool(values[0] & FLAG_LOCKSTEP)
+            in_frame = parser.pending()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:48:26 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import struct
+import traceback
+from src import python_sitl_functions
+from src.simulation.module_manager import module_manager
+
+
+"""
+Records what a Python SITL module receives and sends, and replays it to a
+module without running the simulation.
+
+Classes:
+    SITLRecorder -- Writes the log of a run.
+    RecordingBackend -- Records the commands of a module running in this
+                        process.
+    ReplayBackend -- Answers the Sim functions from a log.
+
+Functions:
+    read_log -- Read a log.
+    replay -- Run a module with a log and compare its commands.
+    replay_logs -- replay() for many logs.
+"""
+
+"""
+Log (little endian):
+    b"AVSL" | version (u8) | module name length (u16) | module name (utf-8)
+    records, the first byte is the type:
+        STEP -- t (f64), void_loop() is called at t.
+        SENSORS -- gyro, accx, accz, alt, gnss_pos, gnss_vel (f64), only
+                   when they change, they are the ones of the next steps.
+        COMMAND -- servo [º] (f64), parachute (u8), ignition (u8), sent by
+                   the module in the last step.
+
+Replaying calls void_loop() once per STEP with its time and sensors, as
+fast as it can. A modified module is compared command by command, step by
+step, with the recorded one.
+"""
+
+
+MAGIC = b"AVSL"
+VERSION = 1
+
+STEP = 1
+SENSORS = 2
+COMMAND = 3
+
+_HEADER = struct.Struct("<4sBH")
+_STEP = struct.Struct("<Bd")
+_SENSORS = struct.Struct("<B6d")
+_COMMAND = struct.Struct("<BdBB")
+
+
+class SITLRecorder:
+    """
+    Writes the log of a Python SITL run.
+
+    Methods:
+        step -- A new step, with the sensors the module will read.
+        command -- The module sent a command.
+        save -- Write the log to a file.
+    """
+
+    def __init__(self, module_name=""):
+        name = module_name.encode("utf-8")
+        self._data = bytearray(_HEADER.pack(MAGIC, VERSION, len(name)) + name)
+        self._last_sensors = None
+        self.steps = 0
+        self.commands = 0
+
+    def step(self, t, sensors):
+        """
+        Record a step.
+
+        Parameters
+        ----------
+        t : float
+            Time of the step [s].
+        sensors : list
+            gyro, accx, accz, alt, gnss_pos, gnss_vel.
+
+        Returns
+        -------
+        None.
+        """
+        sensors = tuple(sensors)
+        if sensors != self._last_sensors:
+            self._data += _SENSORS.pack(SENSORS, *sensors)
+            self._last_sensors = sensors
+        self._data += _STEP.pack(STEP, t)
+        self.steps += 1
+
+    def command(self, servo, parachute, ignition=0):
+        """Record a command of the module (servo in º)."""
+        self._data += _COMMAND.pack(COMMAND, servo, int(parachute), int(ignition))
+        self.commands += 1
+
+    def save(self, file_path):
+        """
+        Write the log.
+
+        Parameters
+        ----------
+        file_path : string
+            Path of the log.
+
+        Returns
+        -------
+        None.
+        """
+        try:
+            with open(file_path, "wb") as file:
+                file.write(self._data)
+            print("SITL Log Saved: {} steps, {} commands".format(self.steps, self.commands))
+        except EnvironmentError:
+            print("Error Saving the SITL Log")
+
+
+class RecordingBackend:
+    """Passes the Sim functions to another backend and records the commands."""
+
+    def __init__(self, backend, recorder):
+        self.backend = backend
+        self.recorder = recorder
+
+    def millis(self):
+        return self.backend.millis()
+
+    def micros(self):
+        return self.backend.micros()
+
+    def getSimData(self):
+        return self.backend.getSimData()
+
+    def sendCommand(self, servo, parachute, ignition=0):
+        self.recorder.command(servo, parachute, ignition)
+        self.backend.sendCommand(servo, parachute, ignition)
+
+    def plot_variable(self, var, i):
+        self.backend.plot_variable(var, i)
+
+
+def read_log(file_path):
+    """
+    Read a log.
+
+    Parameters
+    ----------
+    file_path : string
+        Path of the log.
+
+    Returns
+    -------
+    module_name : string
+        Module that was recorded.
+    steps : list
+        (t, sensors, commands) for each step, commands is a list of
+        (servo, parachute, ignition).
+    """
+    with open(file_path, "rb") as file:
+        data = file.read()
+    magic, version, name_length = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a SITL log or wrong version: " + str(file_path))
+    i = _HEADER.size
+    module_name = data[i:i+name_length].decode("utf-8")
+    i += name_length
+    steps = []
+    sensors = (0.,) * 6
+    commands = []
+    while i < len(data):
+        record_type = data[i]
+        if record_type == STEP:
+            t = _STEP.unpack_from(data, i)[1]
+            commands = []
+            steps.append((t, sensors, commands))
+            i += _STEP.size
+        elif record_type == SENSORS:
+            sensors = _SENSORS.unpack_from(data, i)[1:]
+            i += _SENSORS.size
+        elif record_type == COMMAND:
+            commands.append(_COMMAND.unpack_from(data, i)[1:])
+            i += _COMMAND.size
+        else:
+            raise ValueError("Corrupted SITL log: " + str(file_path))
+    return module_name, steps
+
+
+class ReplayBackend:
+    """Answers the Sim functions with the step being replayed."""
+
+    def __init__(self):
+        self.t = 0.
+        self.sensors = (0.,) * 6
+        self.commands = []
+
+    def millis(self):
+        return int(self.t * 1000)
+
+    def micros(self):
+        return int(self.t * 1000000)
+
+    def getSimData(self):
+        return list(self.sensors)
+
+    def sendCommand(self, servo, parachute, ignition=0):
+        self.commands.append((float(servo), int(parachute), int(ignition)))
+
+    def plot_variable(self, var, i):
+        pass
+
+
+def replay(log_path, module_path, tolerance=1e-6):
+    """
+    Run a module with the steps of a log and compare its commands with
+    the recorded ones.
+
+    Parameters
+    ----------
+    log_path : string
+        Path of the log.
+    module_path : string
+        Path of the module (it can be a modified version of the recorded
+        one).
+    tolerance : float, optional
+        Allowed difference of the servo command [º]. The default is 1e-6.
+
+    Returns
+    -------
+    dict
+        steps, commands_recorded, commands_replayed, mismatches,
+        max_servo_error [º], first_mismatch (t, recorded, replayed) or
+        None, and error (traceback of the module) or "".
+    """
+    _, steps = read_log(log_path)
+    result = {"steps": len(steps),
+              "commands_recorded": 0,
+              "commands_replayed": 0,
+              "mismatches": 0,
+              "max_servo_error": 0.,
+              "first_mismatch": None,
+              "error": ""}
+    backend = ReplayBackend()
+    previous_backend = python_sitl_functions._backend
+    python_sitl_functions.set_backend(backend)
+    try:
+        # Loaded once for all the logs, unless it changes
+        program = module_manager.new_program(module_path)
+        program.everything_that_is_outside_functions()
+        program.void_setup()
+        for t, sensors, recorded in steps:
+            backend.t = t
+            backend.sensors = sensors
+            backend.commands = []
+            program.void_loop()
+            _compare_step(result, t, recorded, backend.commands, tolerance)
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        python_sitl_functions.set_backend(previous_backend)
+    return result
+
+
+def _compare_step(result, t, recorded, replayed, tolerance):
+    result["commands_recorded"] += len(recorded)
+    result["commands_replayed"] += len(replayed)
+    for i in range(max(len(recorded), len(replayed))):
+        if i < len(recorded) and i < len(replayed):
+            servo_error = abs(recorded[i][0] - replayed[i][0])
+            result["max_servo_error"] = max(result["max_servo_error"], servo_error)
+            equal = (servo_error <= tolerance
+                     and recorded[i][1:] == replayed[i][1:])
+        else:
+            equal = False
+        if equal is False:
+            result["mismatches"] += 1
+            if result["first_mismatch"] is None:
+                result["first_mismatch"] = (t,
+                                            recorded[i] if i < len(recorded) else None,
+                                            replayed[i] if i < len(replayed) else None)
+
+
+def replay_logs(log_paths, module_path, tolerance=1e-6):
+    """
+    replay() for many logs, prints one line per log.
+
+    Parameters
+    ----------
+    log_paths : list
+        Paths of the logs.
+    module_path : string
+        Path of the module.
+    tolerance : float, optional
+        Allowed difference of the servo command [º]. The default is 1e-6.
+
+    Returns
+    -------
+    dict
+        Result of each log, the key is its path.
+    """
+    results = {}
+    for log_path in log_paths:
+        result = replay(log_path, module_path, tolerance)
+        results[str(log_path)] = result
+        if result["error"] != "":
+            print("ERROR   ", log_path)
+            print(result["error"])
+        elif result["mismatches"] > 0:
+            t, recorded, replayed = result["first_mismatch"]
+            print("DIFFERS ", log_path, "- {} mismatches, first at t = {:.3f} s: {} -> {}".format(
+                result["mismatches"], t, recorded, replayed))
+        else:
+            print("OK      ", log_path)
+    return results
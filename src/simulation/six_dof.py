@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 16:02:37 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import numpy as np
+
+
+"""
+Six degrees of freedom flight model, the attitude is a quaternion.
+
+Classes:
+    SixDOF -- State of one or many rockets, integrated together.
+
+Functions:
+    quaternion_multiply -- Hamilton product.
+    quaternion_to_dcm -- Rotation matrix body to global.
+    quaternion_from_angles -- Quaternion of a pitch, yaw and roll.
+    get_angles -- Pitch, yaw and roll of a rotation matrix.
+    get_crossflow_plane -- Plane of the angle of attack in body axes.
+    get_loads -- Forces and moments in body axes.
+"""
+
+"""
+Axes (the 3 DOF ones plus the third):
+    global -- X up (altitude), Y crossrange, Z downrange.
+    body -- x along the rocket (nose), z the local Z of the 3 DOF, y
+            completes them.
+The attitude is body to global, C = Ry(pitch) Rz(yaw) Rx(roll), with
+the angles zero the rocket points up. Quaternions are [w, x, y, z]. The
+body rates are [p, q, r] (roll, pitch, yaw).
+
+The rocket is axisymmetric, so its aerodynamics are computed once per
+step, by the same Rocket of the 3 DOF, in the plane that contains the
+crossflow (the airspeed perpendicular to the body). The normal force and
+the moment are then rotated out of that plane, the pitch and yaw don't
+cost two evaluations. In the pitch plane (no yaw nor roll) the plane is
+the one of the 3 DOF and the flight is the same.
+
+A two axis TVC deflects the thrust in pitch and yaw, control fins are
+deflected in the crossflow plane (the projection of their deflection on
+it). A positive yaw deflection gives a positive yaw moment, as a positive
+pitch one gives a positive pitch moment, so the same controller works on
+both.
+
+All the state is stored in arrays of n rockets, and every operation is
+done on the n at once. A batch costs little more than one rocket, only
+the aerodynamics (Rocket) are computed one by one. The arrays are
+component major, [3, n] vectors, [4, n] quaternions and [3, 3, n]
+matrices, so a component of the n rockets is a row and the math is a few
+operations on rows (numpy costs about the same for one rocket as for
+hundreds, the number of operations is what matters).
+
+The integration is the same as the 3 DOF's (trapezoidal, from the
+previous and the new accelerations), the attitude is rotated by the mean
+rate of the step.
+"""
+
+
+# Indices of the cross product, a x b = a[_I1]*b[_I2] - a[_I2]*b[_I1]
+_I1 = np.array([1, 2, 0])
+_I2 = np.array([2, 0, 1])
+_IDENTITY = np.eye(3)[:, :, None]
+# [v]x = _SKEW . v (minus the Levi-Civita symbol)
+_SKEW = np.zeros((3, 3, 3))
+_SKEW[0, 1, 2], _SKEW[1, 2, 0], _SKEW[2, 0, 1] = -1., -1., -1.
+_SKEW[0, 2, 1], _SKEW[1, 0, 2], _SKEW[2, 1, 0] = 1., 1., 1.
+
+
+def _cross(a, b):
+    # take() is the cheapest way to permute the rows
+    return a.take(_I1, 0)*b.take(_I2, 0) - a.take(_I2, 0)*b.take(_I1, 0)
+
+
+def quaternion_multiply(a, b):
+    """Hamilton product of quaternions ([4, ...] arrays of the same shape)."""
+    product = np.empty_like(a)
+    product[0] = a[0]*b[0] - (a[1:]*b[1:]).sum(0)
+    product[1:] = a[0]*b[1:] + b[0]*a[1:] + _cross(a[1:], b[1:])
+    return product
+
+
+def quaternion_to_dcm(quaternion):
+    """
+    Rotation matrix of unit quaternions.
+
+    Parameters
+    ----------
+    quaternion : numpy array
+        [4, n].
+
+    Returns
+    -------
+    numpy array
+        [3, 3, n], body to global.
+    """
+    quaternion = np.asarray(quaternion, dtype=float)
+    w = quaternion[0]
+    v = quaternion[1:]
+    # C = (w^2 - v.v) I + 2 v v' + 2 w [v]x
+    dcm = (2*v)[:, None] * v[None, :]
+    dcm += _IDENTITY * (w*w - (v*v).sum(0))
+    dcm += np.einsum("ijk,kn->ijn", _SKEW, 2*w*v)
+    return dcm
+
+
+def quaternion_from_angles(pitch, yaw=0., roll=0.):
+    """
+    Quaternion of C = Ry(pitch) Rz(yaw) Rx(roll), the angles can be
+    arrays.
+
+    Returns
+    -------
+    numpy array
+        [4, ...].
+    """
+    pitch, yaw, roll = np.broadcast_arrays(np.asarray(pitch, dtype=float),
+                                           np.asarray(yaw, dtype=float),
+                                           np.asarray(roll, dtype=float))
+    zero = np.zeros_like(pitch)
+    q_pitch = np.array([np.cos(pitch/2), zero, np.sin(pitch/2), zero])
+    q_yaw = np.array([np.cos(yaw/2), zero, zero, np.sin(yaw/2)])
+    q_roll = np.array([np.cos(roll/2), np.sin(roll/2), zero, zero])
+    return quaternion_multiply(quaternion_multiply(q_pitch, q_yaw), q_roll)
+
+
+def get_angles(dcm):
+    """
+    Pitch, yaw and roll of rotation matrices (see quaternion_from_angles).
+
+    Parameters
+    ----------
+    dcm : numpy array
+        [3, 3, ...].
+
+    Returns
+    -------
+    tuple
+        pitch, yaw, roll [rad], the pitch and roll between -pi and pi, the
+        yaw between -pi/2 and pi/2.
+    """
+    pitch = np.arctan2(-dcm[2, 0], dcm[0, 0])
+    yaw = np.arcsin(np.minimum(np.maximum(dcm[1, 0], -1.), 1.))
+    roll = np.arctan2(-dcm[1, 2], dcm[1, 1])
+    return pitch, yaw, roll
+
+
+def get_crossflow_plane(v_air, omega, deflection=None):
+    """
+    Plane of the crossflow and the 3 DOF inputs of the aerodynamics in it.
+
+    The plane is [0, n_y, n_z] with n_z >= 0, in the pitch plane it's
+    [0, 0, 1] and the inputs are the 3 DOF ones.
+
+    Parameters
+    ----------
+    v_air : numpy array
+        [3, n] airspeed in body axes (velocity minus wind).
+    omega : numpy array
+        [3, n] body rates.
+    deflection : numpy array, optional
+        [2, n] pitch and yaw deflection of the control fins. The default
+        is None (no fins).
+
+    Returns
+    -------
+    u : numpy array
+        [n] axial airspeed.
+    w : numpy array
+        [n] crossflow airspeed (signed, the local Z of the 3 DOF).
+    plane : numpy array
+        [2, n] n_y, n_z.
+    rate : numpy array
+        [n] rate in the plane (the Q of the 3 DOF).
+    fin_deflection : numpy array
+        [n] deflection of the fins in the plane (0 without fins).
+    """
+    crossflow = np.hypot(v_air[1], v_air[2])
+    # n_z >= 0, the sign goes to w (a crossflow in -y is +y with a -w)
+    no_crossflow = crossflow == 0
+    sign = np.copysign(1., v_air[2] + (v_air[2] == 0)*v_air[1])
+    plane = (sign * v_air[1:]) / (crossflow + no_crossflow)
+    plane[1] += no_crossflow
+    rate = omega[1]*plane[1] - omega[2]*plane[0]
+    if deflection is None:
+        fin_deflection = 0. * crossflow
+    else:
+        fin_deflection = deflection[0]*plane[1] - deflection[1]*plane[0]
+    return v_air[0], sign*crossflow, plane, rate, fin_deflection
+
+
+def get_loads(thrust, tvc, cn, cm, ca, qS, d, arm, plane):
+    """
+    Forces and moments in body axes, without gravity.
+
+    Parameters
+    ----------
+    thrust : float or numpy array
+        [n] thrust.
+    tvc : numpy array
+        [2, n] pitch and yaw angles of the thrust.
+    cn, cm, ca : float or numpy array
+        [n] coefficients of the Rocket in the crossflow plane.
+    qS : float or numpy array
+        [n] dynamic pressure times the reference area.
+    d : float or numpy array
+        Reference diameter (of the cm).
+    arm : float or numpy array
+        [n] distance from the CG to the nozzle (xt - xcg).
+    plane : numpy array
+        [2, n] returned by get_crossflow_plane().
+
+    Returns
+    -------
+    force : numpy array
+        [3, n].
+    moment : numpy array
+        [3, n] about the CG.
+    """
+    cos_tvc = np.cos(tvc)
+    sin_tvc = np.sin(tvc)
+    force = np.empty((3, plane.shape[1]))
+    moment = np.empty((3, plane.shape[1]))
+    # Thrust
+    force[0] = thrust * cos_tvc[0] * cos_tvc[1]
+    force[1] = -thrust * cos_tvc[0] * sin_tvc[1]
+    force[2] = thrust * sin_tvc[0]
+    # The nozzle is behind the CG, at -arm in x
+    moment[0] = 0.
+    moment[1] = force[2] * arm
+    moment[2] = -force[1] * arm
+    # Aerodynamics
+    force[0] -= qS * ca
+    force[1:] += (qS * cn) * plane
+    moment_aero = (qS * d * cm) * plane
+    moment[1] += moment_aero[1]
+    moment[2] -= moment_aero[0]
+    return force, moment
+
+
+class SixDOF:
+    """
+    Position, velocity, attitude and rates of n rockets, the inputs can be
+    scalars (the same for all) or arrays of n.
+
+    Methods:
+        read_save_file_section -- Options from the save file.
+        get_save_file_section -- Options as they're stored in the save file.
+        setup -- Initial conditions.
+        get_air_velocity -- Airspeed in body axes.
+        step -- Integrate one time step.
+        get_angles -- Pitch, yaw and roll.
+        get_Ix -- Roll inertia.
+    """
+
+    def __init__(self, n=1):
+        self.n = n
+        # Options of the save file
+        self.dof = 3
+        self.Ix = 0.
+        self.initial_yaw = 0.
+        self.initial_roll = 0.
+        self.initial_yaw_rate = 0.
+        self.initial_roll_rate = 0.
+        self.wind_heading = 0.
+        self.yaw_control = True
+        self.setup(np.zeros(3), np.zeros(3))
+
+    def read_save_file_section(self, section):
+        """
+        Set the options from the save file section.
+
+        Parameters
+        ----------
+        section : list
+            Strings "name, value", the names are dof (3 or 6), Ix [kg*m^2]
+            (0 estimates it), initial_yaw, initial_roll [º],
+            initial_yaw_rate, initial_roll_rate [º/s], wind_heading [º]
+            (0 blows along the downrange, 90 along the crossrange) and
+            yaw_control (True or False).
+
+        Returns
+        -------
+        None.
+        """
+        angles = ("initial_yaw", "initial_roll", "initial_yaw_rate",
+                  "initial_roll_rate", "wind_heading")
+        for row in section:
+            if row == "":
+                continue
+            row = [e.strip() for e in row.split(",")]
+            try:
+                if row[0] == "dof" and row[1] in ("3", "6"):
+                    self.dof = int(row[1])
+                elif row[0] == "Ix":
+                    self.Ix = float(row[1])
+                elif row[0] in angles:
+                    setattr(self, row[0], float(row[1]) * np.pi/180)
+                elif row[0] == "yaw_control" and row[1] in ("True", "False"):
+                    self.yaw_control = row[1] == "True"
+                else:
+                    print("Error Reading the Flight Model: " + ", ".join(row))
+            except (IndexError, ValueError):
+                print("Error Reading the Flight Model: " + ", ".join(row))
+
+    def get_save_file_section(self):
+        """
+        Return the options as they're stored in the save file.
+
+        Returns
+        -------
+        list
+            Strings "name, value".
+        """
+        section = ["dof, " + str(self.dof), "Ix, " + str(self.Ix)]
+        for name in ("initial_yaw", "initial_roll", "initial_yaw_rate",
+                     "initial_roll_rate", "wind_heading"):
+            section.append(name + ", " + str(getattr(self, name) * 180/np.pi))
+        section.append("yaw_control, " + str(self.yaw_control))
+        return section
+
+    def _member_array(self, value, shape=()):
+        # Scalars are used for all the members
+        return np.array(np.broadcast_to(np.asarray(value, dtype=float),
+                                        shape + (self.n,)))
+
+    def setup(self, position, velocity, pitch=0., pitch_rate=0.):
+        """
+        Set the initial conditions, the yaw, roll and their rates are the
+        ones of the options.
+
+        Parameters
+        ----------
+        position : list or numpy array
+            [3] or [3, n] global position.
+        velocity : list or numpy array
+            [3] or [3, n] global velocity.
+        pitch : float or numpy array, optional
+            Pitch angle [rad]. The default is 0.
+        pitch_rate : float or numpy array, optional
+            Pitch rate [rad/s]. The default is 0.
+
+        Returns
+        -------
+        None.
+        """
+        n = self.n
+        self.position = self._member_array(np.asarray(position, dtype=float).reshape(3, -1), (3,))
+        self.velocity = self._member_array(np.asarray(velocity, dtype=float).reshape(3, -1), (3,))
+        self.quaternion = quaternion_from_angles(self._member_array(pitch),
+                                                 self.initial_yaw,
+                                                 self.initial_roll)
+        self.dcm = quaternion_to_dcm(self.quaternion)
+        self.omega = np.array([np.full(n, self.initial_roll_rate),
+                               self._member_array(pitch_rate),
+                               np.full(n, self.initial_yaw_rate)])
+        self.acc_body = np.zeros((3, n))
+        self.acc_global = np.zeros((3, n))
+        self.omega_d = np.zeros((3, n))
+        self._wind_direction = np.array([[0.], [np.sin(self.wind_heading)],
+                                         [np.cos(self.wind_heading)]])
+
+    def get_air_velocity(self, wind):
+        """
+        Airspeed in body axes.
+
+        Parameters
+        ----------
+        wind : float or numpy array
+            Wind [m/s] (n), it blows towards wind_heading.
+
+        Returns
+        -------
+        numpy array
+            [3, n].
+        """
+        v_air = self.velocity - wind * self._wind_direction
+        # C transposed, global to body
+        return (self.dcm * v_air[:, None]).sum(0)
+
+    def step(self, force, moment, m, inertia, g, T, lock=1., hold=False):
+        """
+        Integrate one time step.
+
+        Parameters
+        ----------
+        force : numpy array
+            [3, n] force in body axes, without gravity.
+        moment : numpy array
+            [3, n] moment about the CG in body axes.
+        m : float or numpy array
+            Mass.
+        inertia : list or numpy array
+            Ix, Iy, Iz, [3] or [3, n].
+        g : float
+            Gravity.
+        T : float
+            Time step.
+        lock : float or numpy array, optional
+            0 while in the launch rod (only the axial acceleration), 1
+            after. The default is 1.
+        hold : bool or numpy array, optional
+            True while in the pad, nothing moves. The default is False.
+
+        Returns
+        -------
+        None.
+        """
+        inertia = np.asarray(inertia, dtype=float).reshape(3, -1)
+        omega = self.omega
+        # Gravity in body axes, global [-g, 0, 0]
+        acc = force / m - g * self.dcm[0]
+        # Euler's equations
+        omega_d = (moment - _cross(omega, inertia*omega)) / inertia
+        # Checked because they're scalars in most steps
+        if hold is not False:
+            free = 1. - np.asarray(hold, dtype=float)
+            acc *= free
+            omega_d *= free
+        if isinstance(lock, np.ndarray) or lock != 1:
+            acc[1:] *= lock
+            omega_d *= lock
+
+        # Trapezoidal, as the IntegrableVariable of the 3 DOF
+        new_omega = omega + (0.5*T) * (self.omega_d + omega_d)
+        rotation = (0.5*T) * (omega + new_omega)
+        angle = np.sqrt((rotation*rotation).sum(0))
+        delta = np.empty_like(self.quaternion)
+        delta[0] = np.cos(0.5*angle)
+        # Without rotation the vector is 0 (rotation is 0)
+        delta[1:] = rotation * (np.sin(0.5*angle) / (angle + (angle == 0)))
+        quaternion = quaternion_multiply(self.quaternion, delta)
+        quaternion /= np.sqrt((quaternion*quaternion).sum(0))
+        new_dcm = quaternion_to_dcm(quaternion)
+        # The body accelerations are added with the new attitude
+        delta_v = (0.5*T) * (self.acc_body + acc)
+        new_velocity = self.velocity + (new_dcm * delta_v[None, :]).sum(1)
+        self.position = self.position + (0.5*T) * (self.velocity + new_velocity)
+        self.acc_global = (new_dcm * acc[None, :]).sum(1)
+        self.velocity = new_velocity
+        self.omega = new_omega
+        self.omega_d = omega_d
+        self.acc_body = acc
+        self.quaternion = quaternion
+        self.dcm = new_dcm
+
+    def get_angles(self):
+        """Pitch, yaw and roll [rad] of the n rockets, see get_angles()."""
+        return get_angles(self.dcm)
+
+    def get_Ix(self, m, d):
+        """Ix of the options, or of a solid cylinder of diameter d if it's 0."""
+        if self.Ix > 0:
+            return self.Ix
+        return 0.5 * m * (d/2)**2
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:58:09 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import io
+import sys
+import math
+import argparse
+import itertools
+import contextlib
+import traceback
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from src.simulation import seeds
+
+
+"""
+Sweeps the constants of a Python SITL module.
+
+Functions:
+    apply_overrides -- Set attributes of a SITLProgram.
+    get_combinations -- All the combinations of a grid.
+    run_case -- Run one simulation with overrides and compute its metrics.
+    run_sweep -- run_case() for all the combinations, in parallel.
+    run_monte_carlo -- run_case() with independent noise, in parallel.
+    print_table -- Print the results.
+    save_csv -- Write the results to a .csv.
+    check_isolation -- Check that a case doesn't depend on the ones before.
+
+Check from the folder of AeroVECTOR.py:
+    python -m src.simulation.sweep --check "File 1.txt" "File 2.txt" ...
+"""
+
+"""
+The overrides are set after everything_that_is_outside_functions() and
+before void_setup(), so they replace the constants of the actual flight
+code. A name can go inside the attributes with dots, "pid_pitch.kp" sets
+the kp of the PID object in program.pid_pitch.
+
+Each combination runs headless in a process pool (spawned), a worker
+runs many of them one after the other. Each run sets up all the state of
+the simulation again (main_simulation.setup_from_savefile()), so a case
+gives the same metrics whatever ran before it in the worker,
+check_isolation() checks it. The results come back as a table, a list of
+dicts with the overrides, the seed and the metrics. All the combinations of a sweep use
+the same noise, the runs of a Monte Carlo get independent children of its
+seed (see seeds.py).
+"""
+
+
+def apply_overrides(program, overrides):
+    """
+    Set attributes of a SITLProgram (or any object).
+
+    Parameters
+    ----------
+    program : SITLProgram
+        Instance of the module.
+    overrides : dict
+        {"attribute": value} or {"attribute.sub_attribute": value}.
+
+    Returns
+    -------
+    None.
+    """
+    for name, value in overrides.items():
+        obj = program
+        attributes = name.split(".")
+        for attribute in attributes[:-1]:
+            obj = getattr(obj, attribute)
+        if not hasattr(obj, attributes[-1]):
+            # A typo would run the sweep without changing anything
+            raise AttributeError("Can't override " + name + ", there is no such attribute")
+        setattr(obj, attributes[-1], value)
+
+
+def get_combinations(grid):
+    """
+    All the combinations of a grid.
+
+    Parameters
+    ----------
+    grid : dict
+        {"attribute": [values]}.
+
+    Returns
+    -------
+    list
+        Dicts {"attribute": value}.
+    """
+    names = list(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[grid[e] for e in names])]
+
+
+def get_default_metrics(sim):
+    """
+    Metrics of the last run.
+
+    Parameters
+    ----------
+    sim : module
+        main_simulation after the run.
+
+    Returns
+    -------
+    dict
+        outcome, t_end, apogee, t_apogee, parachute_t, parachute_delay
+        (after the apogee), parachute_altitude, landing_velocity,
+        landing_lateral_velocity, position_error (lateral, at the end) and
+        max_lateral_error.
+    """
+    altitude = [e[0] for e in sim.position_3d[1:]]
+    lateral = [e[1] for e in sim.position_3d[1:]]
+    if len(altitude) > 0:
+        i_apogee = max(range(len(altitude)), key=altitude.__getitem__)
+        apogee = float(altitude[i_apogee])
+        t_apogee = float(sim.t_3d[i_apogee+1]) if len(sim.t_3d) > i_apogee+1 else math.nan
+        max_lateral_error = float(max(abs(e) for e in lateral))
+    else:
+        apogee = t_apogee = max_lateral_error = math.nan
+    landed = bool(sim.position_global[0] < -0.55)
+    if sim.parachute == 1:
+        outcome = "Parachute"
+    elif landed is True:
+        outcome = "Landing" if abs(sim.v_glob[0]) < 2 else "Crash"
+    else:
+        outcome = "Ended"
+    metrics = {"outcome": outcome,
+               "t_end": float(sim.t),
+               "apogee": apogee,
+               "t_apogee": t_apogee,
+               "parachute_t": math.nan,
+               "parachute_delay": math.nan,
+               "parachute_altitude": math.nan,
+               "landing_velocity": math.nan,
+               "landing_lateral_velocity": math.nan,
+               "position_error": abs(float(sim.position_global[1])),
+               "max_lateral_error": max_lateral_error}
+    if outcome == "Parachute":
+        metrics["parachute_t"] = float(sim.t)
+        metrics["parachute_delay"] = float(sim.t) - t_apogee
+        metrics["parachute_altitude"] = float(sim.position_global[0])
+    if landed is True:
+        metrics["landing_velocity"] = float(sim.v_glob[0])
+        metrics["landing_lateral_velocity"] = float(sim.v_glob[1])
+    return metrics
+
+
+def run_case(filepath, overrides, seed=None, metrics=None):
+    """
+    Run the headless Python SITL simulation of a save file with
+    overrides, nothing is printed.
+
+    Parameters
+    ----------
+    filepath : string
+        Save file, it must use the Python SITL.
+    overrides : dict
+        Attributes of the SITLProgram, see apply_overrides().
+    seed : int or string, optional
+        Seed of the noise, see seeds.py. The default is None.
+    metrics : function, optional
+        Function(sim) -> dict with the metrics, it must be a function of
+        a module (so it can be sent to other processes). The default is
+        get_default_metrics.
+
+    Returns
+    -------
+    dict
+        The overrides, seed (the one used, it repeats the run), the
+        metrics and error ("" or the traceback).
+    """
+    from src.simulation import main_simulation as sim
+    if metrics is None:
+        metrics = get_default_metrics
+    result = dict(overrides)
+    sim.python_sitl_overrides = overrides
+    sim.noise_seed = seed
+    sim.noise_seed_used = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.run_simulation_headless(str(filepath))
+        result["seed"] = sim.noise_seed_used
+        result.update(metrics(sim))
+        result["error"] = ""
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        sim.python_sitl_overrides = {}
+    return result
+
+
+def run_sweep(filepath, grid, seed=None, metrics=None, processes=None):
+    """
+    Run all the combinations of a grid in a process pool.
+
+    Parameters
+    ----------
+    filepath : string
+        Save file, it must use the Python SITL.
+    grid : dict
+        {"attribute": [values]}, see apply_overrides().
+    seed : int or string, optional
+        Seed of the noise, the same for all the runs so only the overrides
+        change. The default is None (one new seed for all of them).
+    metrics : function, optional
+        See run_case(). The default is get_default_metrics.
+    processes : int, optional
+        Number of processes, 1 runs them here one after the other. The
+        default is the number of CPUs.
+
+    Returns
+    -------
+    list
+        One dict per combination, in the order of the grid.
+    """
+    combinations = get_combinations(grid)
+    # Drawn here so all the workers use the same one
+    seed = seeds.to_string(seeds.get_seed_sequence(seed))
+    return _run_cases(filepath, combinations, [seed]*len(combinations),
+                      metrics, processes)
+
+
+def run_monte_carlo(filepath, runs, seed=None, overrides=None, metrics=None,
+                    processes=None):
+    """
+    Run a save file many times, each one with its own noise.
+
+    Parameters
+    ----------
+    filepath : string
+        Save file, it must use the Python SITL.
+    runs : int
+        Number of runs.
+    seed : int or string, optional
+        Seed of the set, each run gets an independent child of it (see
+        seeds.spawn()), so the same seed repeats all the runs. The default
+        is None.
+    overrides : dict, optional
+        Attributes of the SITLProgram, the same for all the runs. The
+        default is None.
+    metrics : function, optional
+        See run_case(). The default is get_default_metrics.
+    processes : int, optional
+        Number of processes, 1 runs them here one after the other. The
+        default is the number of CPUs.
+
+    Returns
+    -------
+    list
+        One dict per run, with the seed that repeats it.
+    """
+    if overrides is None:
+        overrides = {}
+    return _run_cases(filepath, [overrides]*runs, seeds.spawn(seed, runs),
+                      metrics, processes)
+
+
+def _run_cases(filepath, combinations, case_seeds, metrics, processes):
+    filepath = str(Path(filepath).resolve())
+    if processes == 1:
+        return [run_case(filepath, e, seed, metrics)
+                for e, seed in zip(combinations, case_seeds)]
+    # spawn, so the workers don't inherit the GUI
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        futures = [executor.submit(run_case, filepath, e, seed, metrics)
+                   for e, seed in zip(combinations, case_seeds)]
+        return [e.result() for e in futures]
+
+
+def _run_in_order(cases, seed, metrics):
+    return [run_case(filepath, overrides, seed, metrics) for filepath, overrides in cases]
+
+
+def _is_same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def check_isolation(cases, seed=0, metrics=None):
+    """
+    Check that each case gives the same metrics run alone in a new
+    process as run after the others in the same process.
+
+    Parameters
+    ----------
+    cases : list
+        (save file, overrides), different files, motors and controllers
+        are the ones that could leak state.
+    seed : int or string, optional
+        Seed of the noise of all the runs. The default is 0.
+    metrics : function, optional
+        See run_case(). The default is get_default_metrics.
+
+    Returns
+    -------
+    bool
+        True if all of them are the same.
+    """
+    cases = [(str(Path(filepath).resolve()), overrides) for filepath, overrides in cases]
+    context = multiprocessing.get_context("spawn")
+    alone = []
+    for case in cases:
+        # A new process for each one
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            alone += executor.submit(_run_in_order, [case], seed, metrics).result()
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        in_order = executor.submit(_run_in_order, cases, seed, metrics).result()
+    passed = True
+    for (filepath, overrides), first, after in zip(cases, alone, in_order):
+        different = [e for e in set(first) | set(after)
+                     if e != "error" and not _is_same(first.get(e), after.get(e))]
+        if first["error"] != "" or after["error"] != "":
+            different.append("error")
+        passed = passed and len(different) == 0
+        name = Path(filepath).stem + (" " + str(overrides) if overrides else "")
+        print("{:<40}{}".format(name, "passed" if not different else
+                                "DIFFERENT: " + ", ".join(sorted(different))))
+    return passed
+
+
+def _format(value):
+    if isinstance(value, float):
+        return "{:.4g}".format(value)
+    return str(value)
+
+
+def _get_names(results):
+    # A run with an error doesn't have the metrics
+    names = []
+    for result in results:
+        names += [e for e in result if e not in names]
+    return names
+
+
+def print_table(results):
+    """Print the results, the errors are shortened to their last line."""
+    if len(results) == 0:
+        return
+    names = _get_names(results)
+    rows = []
+    for result in results:
+        row = []
+        for name in names:
+            value = result.get(name, "")
+            if name == "error" and value != "":
+                value = value.strip().split("\n")[-1]
+            row.append(_format(value))
+        rows.append(row)
+    widths = [max(len(name), *[len(row[i]) for row in rows])
+              for i, name in enumerate(names)]
+    print("  ".join(name.ljust(widths[i]) for i, name in enumerate(names)))
+    for row in rows:
+        print("  ".join(e.ljust(widths[i]) for i, e in enumerate(row)))
+
+
+def save_csv(results, file_path):
+    """
+    Write the results to a .csv.
+
+    Parameters
+    ----------
+    results : list
+        Results of run_sweep().
+    file_path : string
+        Path of the .csv.
+
+    Returns
+    -------
+    None.
+    """
+    if len(results) == 0:
+        return
+    names = _get_names(results)
+    to_file = ",".join(names) + "\n"
+    for result in results:
+        values = []
+        for name in names:
+            value = result.get(name, "")
+            if name == "error" and value != "":
+                value = value.strip().split("\n")[-1]
+            values.append(_format(value).replace(",", ";"))
+        to_file += ",".join(values) + "\n"
+    try:
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(to_file)
+        print("Sweep Exported Successfully")
+    except EnvironmentError:
+        print("Error Exporting the Sweep")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR sweeps")
+    parser.add_argument("--check", nargs="+", metavar="SAVE_FILE", required=True,
+                        help="check that each file gives the same metrics run "
+                        "alone and after the other ones in the same process")
+    args = parser.parse_args()
+    passed = check_isolation([(e, {}) for e in args.check])
+    return 0 if passed is True else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,723 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 21:14:37 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import io
+import re
+import sys
+import json
+import math
+import time
+import argparse
+import itertools
+import contextlib
+import traceback
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from src.simulation import seeds
+from src.simulation import sweep
+
+
+"""
+Studies of many variants of a save file.
+
+Classes:
+    Study -- A base save file and the overrides of its variants.
+    ResultTable -- Results of a study, a column per value.
+
+Functions:
+    load_study -- Read a study from a .json or .yaml.
+    apply_overrides -- Change fields of the save file.
+    run_variant -- Run one variant and compute its metrics.
+    run_study -- Run all the variants in a process pool.
+    load_results -- Columns of the results of a study.
+
+Run from the folder of AeroVECTOR.py:
+    python -m src.simulation.variants "Study.json"
+    python -m src.simulation.variants "Study.json" --processes 4
+"""
+
+"""
+A study is a base save file and the overrides of its fields, by the names
+of the save file ("Kp", "Wind", "Mass Liftoff", "Launch Rod Angle", ...)
+and, for the rocket dimensions, the list of the Draw Rocket tab and the
+index of the line ("Body[1]", "Fins_s[0]", "Fins_c[1]", "Checkbox[0]"):
+
+    {"base": "Example Rocket TVC.txt",
+     "seed": 0,
+     "matrix": {"Kp": [0.3, 0.4, 0.5],
+                "Wind": [0, 2, 4],
+                "Body[1]": [[0.2, 0.066], [0.25, 0.066]]},
+     "cases": [{"Motor": "Estes_F15.csv"},
+               {"Motor": "Estes_E12.csv", "Mass Liftoff": 0.62}]}
+
+The variants are every case (only the base without "cases") with every
+combination of the matrix, 2 x 3 x 3 x 2 = 36 here, the last name of the
+matrix changes first. A variant is computed from its index, the
+combinations are never listed, so a study of 100000 variants is generated
+while it runs. The base is relative to the folder of the study. A .yaml
+has the same structure (it needs PyYAML).
+
+Each worker reads the base file once (it's cached, see configuration.py),
+and for each variant changes the text of the fields and sets up the
+simulation again, as if the file had them. The variants go to the workers
+in chunks, with only a few chunks waiting. A worker runs many variants,
+as sweep.run_sweep() does; setting up a run resets all the state of the
+simulation, the rocket, its fins and the controller, so a variant gives
+the same results whatever the worker flew before it (another motor,
+rocket or controller), see sweep.check_isolation(). All the variants use
+the same noise (seed).
+
+The results are a folder, a .npy per column memory mapped, with a row per
+variant (the row is the index of the variant): status (0 not run, 1 ok,
+2 error), the value of each override (empty where a case doesn't change
+it) and each metric (see sweep.get_default_metrics()). Text (the outcome,
+a motor, the points) is stored as the index of its category, columns.json
+has them. A row is written when its variant ends, so the memory doesn't
+grow with the number of variants, and a study that was stopped continues
+with the variants that didn't run if its matrix and cases didn't change.
+The last line of each error goes to errors.txt.
+"""
+
+
+STATUS_NOT_RUN = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# "Body[1]", lists of the rocket dimensions as _destring_rocket_dim() reads them
+_ROCKET_DIM_FIELD = re.compile(r"(Checkbox|Body|Fins_s|Fins_c)\[([0-9]+)\]")
+
+
+class Study:
+    """
+    A base save file and the overrides of its variants.
+
+    Methods:
+        get_fields -- Names of all the overridden fields.
+        get_variant -- Overrides of a variant.
+        iterate_variants -- Variants one after the other.
+        to_dict -- The study as it's stored.
+    """
+
+    def __init__(self, base, matrix=None, cases=None, seed=None):
+        """
+        Parameters
+        ----------
+        base : string or Path
+            Base save file.
+        matrix : dict, optional
+            {"field": [values]}, all the combinations. The default is None.
+        cases : list, optional
+            Dicts {"field": value}, each one with every combination of the
+            matrix. The default is None (only the base).
+        seed : int or string, optional
+            Seed of the noise of all the variants. The default is None.
+        """
+        self.base = Path(base)
+        self.matrix = dict(matrix or {})
+        self.cases = list(cases or [{}])
+        self.seed = seed
+        for name, values in self.matrix.items():
+            if not isinstance(values, list) or len(values) == 0:
+                raise ValueError("The matrix needs a list of values for " + name)
+        for case in self.cases:
+            if not isinstance(case, dict):
+                raise ValueError("Each case must be {field: value}")
+            repeated = [e for e in case if e in self.matrix]
+            if repeated:
+                raise ValueError("In the matrix and in a case: " + ", ".join(repeated))
+        self._names = list(self.matrix)
+        self._sizes = [len(self.matrix[e]) for e in self._names]
+        self.n_variants = len(self.cases) * math.prod(self._sizes)
+
+    def get_fields(self):
+        """Names of the overridden fields, the cases first."""
+        fields = []
+        for case in self.cases:
+            fields += [e for e in case if e not in fields]
+        return fields + self._names
+
+    def get_variant(self, i):
+        """
+        Overrides of a variant.
+
+        Parameters
+        ----------
+        i : int
+            Index of the variant.
+
+        Returns
+        -------
+        dict
+            {"field": value}.
+        """
+        if not 0 <= i < self.n_variants:
+            raise IndexError("There is no variant " + str(i))
+        values = []
+        # The last name changes first, as in itertools.product()
+        for name, size in zip(reversed(self._names), reversed(self._sizes)):
+            i, j = divmod(i, size)
+            values.append((name, self.matrix[name][j]))
+        overrides = dict(self.cases[i])
+        overrides.update(reversed(values))
+        return overrides
+
+    def iterate_variants(self, indexes=None):
+        """
+        Variants one after the other, generated when they're needed.
+
+        Parameters
+        ----------
+        indexes : iterable, optional
+            Indexes of the variants. The default is all of them.
+
+        Yields
+        ------
+        i : int
+            Index of the variant.
+        overrides : dict
+            {"field": value}.
+        """
+        if indexes is None:
+            indexes = range(self.n_variants)
+        for i in indexes:
+            yield i, self.get_variant(i)
+
+    def to_dict(self):
+        """The study as the .json has it, the base as it is."""
+        return {"base": self.base.as_posix(), "seed": self.seed,
+                "matrix": self.matrix, "cases": self.cases}
+
+
+def load_study(file_path):
+    """
+    Read a study from a .json or a .yaml.
+
+    Parameters
+    ----------
+    file_path : string or Path
+        Study.
+
+    Returns
+    -------
+    Study
+        With the base relative to the folder of the study.
+    """
+    file_path = Path(file_path)
+    with open(file_path, "r", encoding="utf-8") as file:
+        text = file.read()
+    if file_path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("A .yaml study needs PyYAML (pip install pyyaml)")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict) or "base" not in data:
+        raise ValueError("The study needs the base save file")
+    return Study(file_path.parent / data["base"], data.get("matrix"),
+                 data.get("cases"), data.get("seed"))
+
+
+def _to_text(value):
+    # As the save file has it
+    if isinstance(value, bool):
+        return "True" if value is True else "False"
+    if isinstance(value, (list, tuple)):
+        return ",".join(_to_text(e) for e in value)
+    return str(value)
+
+
+def _get_fields(savefile):
+    # {"field": (section, index)} of the save file
+    fields = {}
+    for section, names in savefile.get_section_names().items():
+        for i, name in enumerate(names):
+            fields[name] = (section, i)
+    counts = {"Checkbox": 0, "Body": 0, "Fins_s": 0, "Fins_c": 0}
+    flag = "Checkbox"
+    for i, element in enumerate(savefile.rocket_dim):
+        if element in ("Fins_s", "Fins_c"):
+            flag = element
+            continue
+        if element == "":
+            continue
+        if flag == "Checkbox" and element not in ("True", "False"):
+            flag = "Body"
+        fields[flag + "[" + str(counts[flag]) + "]"] = ("rocket_dim", i)
+        counts[flag] += 1
+    return fields
+
+
+def _check_fields(savefile, names):
+    fields = _get_fields(savefile)
+    for name in names:
+        if name not in fields:
+            if _ROCKET_DIM_FIELD.fullmatch(name):
+                raise ValueError("Can't override " + name + ", the rocket doesn't have that line")
+            # A typo would run the study without changing anything
+            raise ValueError("Can't override " + name + ", the save file has no such field")
+
+
+def apply_overrides(savefile, overrides):
+    """
+    Change fields of the save file (not the actual file).
+
+    Parameters
+    ----------
+    savefile : files.SaveFile
+        After read_file().
+    overrides : dict
+        {"field": value}, numbers, bools, text or [x, y] points.
+
+    Returns
+    -------
+    None.
+    """
+    fields = _get_fields(savefile)
+    edited = {}
+    for name, value in overrides.items():
+        if name not in fields:
+            raise ValueError("Can't override " + name + ", the save file has no such field")
+        section, i = fields[name]
+        if section not in edited:
+            edited[section] = getattr(savefile, "get_" + section)()
+        edited[section][i] = _to_text(value)
+    for section, data in edited.items():
+        getattr(savefile, "set_" + section)(data)
+
+
+def run_variant(filepath, overrides, seed=None, metrics=None):
+    """
+    Run the headless simulation of a save file with its fields changed,
+    nothing is printed.
+
+    Parameters
+    ----------
+    filepath : string
+        Base save file, without SITL or with the Python SITL.
+    overrides : dict
+        {"field": value}, see apply_overrides().
+    seed : int or string, optional
+        Seed of the noise, see seeds.py. The default is None.
+    metrics : function, optional
+        Function(sim) -> dict, see sweep.run_case(). The default is
+        sweep.get_default_metrics.
+
+    Returns
+    -------
+    dict
+        The metrics and error ("" or the traceback).
+    """
+    from src.simulation import main_simulation as sim
+    if metrics is None:
+        metrics = sweep.get_default_metrics
+    result = {}
+    sim.noise_seed = seed
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.gui.savefile.update_path(Path(filepath).as_posix())
+            sim.gui.savefile.read_file()
+            if sim.gui.savefile.error_opening_file_flag is True:
+                raise EnvironmentError("Error Opening " + str(filepath))
+            apply_overrides(sim.gui.savefile, overrides)
+            sim.setup_from_savefile()
+            sim.run_selected_simulation()
+        result.update(metrics(sim))
+        result["error"] = ""
+    except Exception:
+        result["error"] = traceback.format_exc()
+    return result
+
+
+def _run_chunk(filepath, chunk, seed, metrics):
+    return [(i, run_variant(filepath, overrides, seed, metrics))
+            for i, overrides in chunk]
+
+
+class ResultTable:
+    """
+    Results of a study, a memory mapped column per value and a row per
+    variant.
+
+    Methods:
+        create -- Start a new table.
+        open -- Open the table of the folder.
+        add_column -- Add a column.
+        set_row -- Store the results of a variant.
+        flush -- Write the changes to the files.
+        close -- Flush and close the columns.
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : string or Path
+            Folder of the table.
+        """
+        self.path = Path(path)
+        self.n_rows = 0
+        self.info = {}
+        # name: {"file", "kind" ("float" or "category"), "categories"}
+        self.columns = {}
+        self.arrays = {}
+        self._codes = {}
+
+    def create(self, n_rows, info):
+        """
+        Start a new table, it replaces the one of the folder.
+
+        Parameters
+        ----------
+        n_rows : int
+            Number of variants.
+        info : dict
+            Stored with the table (the study, the seed).
+
+        Returns
+        -------
+        None.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        for e in self.path.glob("column_*.npy"):
+            e.unlink()
+        (self.path / "errors.txt").write_text("", encoding="utf-8")
+        self.n_rows = n_rows
+        self.info = info
+        self.columns = {}
+        self.arrays = {}
+        self._codes = {}
+        self.add_column("status", "status")
+
+    def open(self):
+        """
+        Open the table of the folder.
+
+        Returns
+        -------
+        bool
+            False if the folder doesn't have one.
+        """
+        try:
+            with open(self.path / "columns.json", "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (EnvironmentError, ValueError):
+            return False
+        self.n_rows = data["n_rows"]
+        self.info = data["info"]
+        self.columns = data["columns"]
+        self.arrays = {name: np.load(self.path / column["file"], mmap_mode="r+")
+                       for name, column in self.columns.items()}
+        self._codes = {name: {e: i for i, e in enumerate(column["categories"])}
+                       for name, column in self.columns.items()}
+        return True
+
+    def _save_columns(self):
+        data = {"n_rows": self.n_rows, "info": self.info, "columns": self.columns}
+        with open(self.path / "columns.json", "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=1)
+
+    def add_column(self, name, kind, categories=None):
+        """
+        Add a column, empty (NaN or -1).
+
+        Parameters
+        ----------
+        name : string
+            Name.
+        kind : string
+            "float", "category" (text, stored as the index of its
+            category) or "status".
+        categories : list, optional
+            Categories known beforehand. The default is None.
+
+        Returns
+        -------
+        None.
+        """
+        file_name = "column_{}.npy".format(len(self.columns))
+        dtype = {"float": np.float64, "category": np.int32, "status": np.int8}[kind]
+        array = np.lib.format.open_memmap(self.path / file_name, mode="w+",
+                                          dtype=dtype, shape=(self.n_rows,))
+        array[:] = {"float": np.nan, "category": -1, "status": STATUS_NOT_RUN}[kind]
+        self.columns[name] = {"file": file_name, "kind": kind,
+                              "categories": list(categories or [])}
+        self.arrays[name] = array
+        self._codes[name] = {e: i for i, e in enumerate(self.columns[name]["categories"])}
+        self._save_columns()
+
+    def _get_code(self, name, value):
+        text = value if isinstance(value, str) else json.dumps(value)
+        codes = self._codes[name]
+        if text not in codes:
+            codes[text] = len(codes)
+            self.columns[name]["categories"].append(text)
+            # Before the row that uses it
+            self._save_columns()
+        return codes[text]
+
+    def set_row(self, i, values, status=STATUS_OK):
+        """
+        Store the results of a variant.
+
+        Parameters
+        ----------
+        i : int
+            Index of the variant.
+        values : dict
+            {name: value}, the new names are new columns.
+        status : int, optional
+            STATUS_OK or STATUS_ERROR. The default is STATUS_OK.
+
+        Returns
+        -------
+        None.
+        """
+        for name, value in values.items():
+            if name not in self.columns:
+                self.add_column(name, _get_kind([value]))
+            if self.columns[name]["kind"] == "category":
+                self.arrays[name][i] = self._get_code(name, value)
+            else:
+                try:
+                    self.arrays[name][i] = float(value)
+                except (TypeError, ValueError):
+                    self.arrays[name][i] = np.nan
+        # Last, a row is done only with all its values
+        self.arrays["status"][i] = status
+
+    def add_error(self, i, error):
+        """Store the last line of the error of a variant."""
+        with open(self.path / "errors.txt", "a", encoding="utf-8") as file:
+            file.write(str(i) + "\t" + error.strip().split("\n")[-1] + "\n")
+
+    def flush(self):
+        """Write the changes of the columns to their files."""
+        for array in self.arrays.values():
+            array.flush()
+
+    def close(self):
+        """Flush and close the columns."""
+        self.flush()
+        self.arrays = {}
+
+
+def _get_kind(values):
+    numbers = all(isinstance(e, (int, float)) for e in values)
+    return "float" if numbers is True else "category"
+
+
+def _get_chunks(variants, chunksize):
+    while True:
+        chunk = list(itertools.islice(variants, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_study(study, path, metrics=None, processes=None, chunksize=4):
+    """
+    Run the variants of a study that didn't run yet, in a process pool.
+
+    Parameters
+    ----------
+    study : Study
+        Study.
+    path : string or Path
+        Folder of the results, if it has the results of the same study
+        it continues them.
+    metrics : function, optional
+        See sweep.run_case(). The default is sweep.get_default_metrics.
+    processes : int, optional
+        Number of processes, 1 runs them here one after the other. The
+        default is the number of CPUs.
+    chunksize : int, optional
+        Variants sent to a process at a time. The default is 4.
+
+    Returns
+    -------
+    ResultTable or None
+        Closed, None if the folder has the results of another study.
+    """
+    from src.simulation import main_simulation as sim
+    filepath = str(study.base.resolve())
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.gui.savefile.update_path(Path(filepath).as_posix())
+        sim.gui.savefile.read_file()
+    if sim.gui.savefile.error_opening_file_flag is True:
+        raise ValueError("Error Opening the Base Save File: " + filepath)
+    _check_fields(sim.gui.savefile, study.get_fields())
+    table = ResultTable(path)
+    stored = study.to_dict()
+    del stored["base"]
+    if table.open() is True:
+        if table.info.get("study") != json.loads(json.dumps(stored)):
+            print("The results of " + str(path) + " are of another study")
+            return None
+    else:
+        # Drawn here so all the workers use the same one
+        seed = seeds.to_string(seeds.get_seed_sequence(study.seed))
+        table.create(study.n_variants, {"study": stored, "seed": seed})
+        for name in study.get_fields():
+            values = [e[name] for e in study.cases if name in e]
+            values += study.matrix.get(name, [])
+            kind = _get_kind(values)
+            categories = None
+            if kind == "category":
+                categories = [e if isinstance(e, str) else json.dumps(e) for e in values]
+                categories = list(dict.fromkeys(categories))
+            table.add_column(name, kind, categories)
+    seed = table.info["seed"]
+    status = table.arrays["status"]
+    pending = (i for i in range(table.n_rows) if status[i] == STATUS_NOT_RUN)
+    chunks = _get_chunks(study.iterate_variants(pending), chunksize)
+    progress = _Progress(table)
+    try:
+        if processes == 1:
+            for chunk in chunks:
+                _store(table, study, _run_chunk(filepath, chunk, seed, metrics))
+                progress.update()
+        else:
+            _run_pool(table, study, filepath, chunks, seed, metrics, processes, progress)
+    finally:
+        table.close()
+    progress.report()
+    return table
+
+
+def _run_pool(table, study, filepath, chunks, seed, metrics, processes, progress):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    # spawn, so the workers don't inherit the GUI
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        waiting = set()
+        try:
+            for chunk in chunks:
+                # Only a few chunks wait, the rest aren't generated yet
+                if len(waiting) >= 2*processes:
+                    done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+                    for e in done:
+                        _store(table, study, e.result())
+                    progress.update()
+                waiting.add(executor.submit(_run_chunk, filepath, chunk, seed, metrics))
+            while waiting:
+                done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+                for e in done:
+                    _store(table, study, e.result())
+                progress.update()
+        except BaseException:
+            for e in waiting:
+                e.cancel()
+            raise
+
+
+def _store(table, study, results):
+    for i, result in results:
+        error = result.pop("error", "")
+        values = study.get_variant(i)
+        values.update(result)
+        if error != "":
+            table.add_error(i, error)
+            table.set_row(i, values, STATUS_ERROR)
+        else:
+            table.set_row(i, values)
+
+
+class _Progress:
+    # Prints the variants that ran every some seconds, and flushes the table
+
+    def __init__(self, table, interval=10):
+        self.table = table
+        self.interval = interval
+        self.t0 = time.perf_counter()
+        self.t_last = self.t0
+
+    def update(self):
+        t = time.perf_counter()
+        if t - self.t_last < self.interval:
+            return
+        self.t_last = t
+        self.table.flush()
+        print("{} of {} Variants".format(self._count_done(), self.table.n_rows))
+
+    def _count_done(self):
+        return int(np.count_nonzero(self.table.arrays["status"] != STATUS_NOT_RUN))
+
+    def report(self):
+        status = np.load(self.table.path / self.table.columns["status"]["file"],
+                         mmap_mode="r")
+        print("{} of {} Variants, {} with errors, {:.1f} s".format(
+            int(np.count_nonzero(status != STATUS_NOT_RUN)), self.table.n_rows,
+            int(np.count_nonzero(status == STATUS_ERROR)),
+            time.perf_counter() - self.t0))
+
+
+def load_results(path, decode=True):
+    """
+    Columns of the results of a study.
+
+    Parameters
+    ----------
+    path : string or Path
+        Folder of the results.
+    decode : bool, optional
+        Replace the indexes of the categories with their text (None for
+        the empty ones). The default is True.
+
+    Returns
+    -------
+    dict
+        {"variant": indexes, name: array}, the floats and the indexes
+        memory mapped (read only).
+    """
+    table = ResultTable(path)
+    if table.open() is False:
+        raise FileNotFoundError("There are no results in " + str(path))
+    columns = {"variant": np.arange(table.n_rows)}
+    for name, column in table.columns.items():
+        array = np.load(table.path / column["file"], mmap_mode="r")
+        if decode is True and column["kind"] == "category":
+            # -1 is the last one, None
+            categories = np.array(column["categories"] + [None], dtype=object)
+            array = categories[array]
+        columns[name] = array
+    table.arrays = {}
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeroVECTOR variant studies")
+    parser.add_argument("study", help=".json or .yaml study")
+    parser.add_argument("--output", help="folder of the results, the default is "
+                        "the name of the study + Results")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="processes, the default is the number of CPUs")
+    parser.add_argument("--chunksize", type=int, default=4,
+                        help="variants sent to a process at a time")
+    args = parser.parse_args()
+    study_path = Path(args.study)
+    output = args.output
+    if output is None:
+        output = study_path.parent / (study_path.stem + " Results")
+    try:
+        study = load_study(study_path)
+        print("{} Variants".format(study.n_variants))
+        table = run_study(study, output, processes=args.processes,
+                          chunksize=args.chunksize)
+    except (EnvironmentError, ValueError) as error:
+        print("Error Reading the Study: " + str(error))
+        return 1
+    return 0 if table is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
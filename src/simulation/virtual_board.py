@@ -0,0 +1,563 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:26:13 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import os
+import threading
+import time
+import math
+from src.simulation import sitl_protocol
+
+
+"""
+Emulates a flight computer running the SITL Arduino library, so the
+hardware SITL can be tested without hardware.
+
+Classes:
+    VirtualSerialPort -- One end of an in-process serial port.
+    PtySerialPort -- Board end of a pseudo terminal (Linux/macOS).
+    VirtualBoard -- Runs a program with the same API as SITL.cpp.
+    ExampleRocketProgram -- Example_Rocket_SITL.ino in Python.
+
+Functions:
+    create_virtual_serial_pair -- Two connected VirtualSerialPorts.
+    create_pty_serial_pair -- Pseudo terminal, the PC opens it with pyserial.
+    run_virtual_sitl -- Runs a save file against a virtual board.
+"""
+
+"""
+The program of the board has the same structure as an Arduino sketch:
+
+class Program:
+    def setup(self, Sim):
+        Sim.StartSITL()
+    def loop(self, Sim):
+        Sim.tick()
+        gyro, accx, accz, alt, gnss_pos, gnss_vel = Sim.getSimData()
+        Sim.sendCommand(servo, parachute)
+
+Sim has the methods of the SITL library (StartSITL, tick, millis, micros,
+getSimData, sendCommand). getSimData returns the values instead of
+writing them into references, the GNSS is zero with the text protocol.
+"""
+
+
+class _Pipe:
+    # Bytes going in one direction
+    def __init__(self):
+        self.buffer = bytearray()
+        self.condition = threading.Condition()
+
+    def put(self, data):
+        with self.condition:
+            self.buffer += data
+            self.condition.notify_all()
+
+    def get(self, size, timeout, line=False):
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = time.perf_counter() + timeout
+        with self.condition:
+            while True:
+                if line is True and b"\n" in self.buffer:
+                    size = self.buffer.index(b"\n") + 1
+                if len(self.buffer) >= size and (line is False or b"\n" in self.buffer):
+                    data = bytes(self.buffer[:size])
+                    del self.buffer[:size]
+                    return data
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        # Like pyserial, returns what arrived until the timeout
+                        data = bytes(self.buffer[:size])
+                        del self.buffer[:size]
+                        return data
+                    self.condition.wait(remaining)
+
+
+class VirtualSerialPort:
+    """
+    One end of an in-process serial port, has the pyserial methods used
+    by the simulator.
+
+    Methods:
+        read -- Read size bytes (waits up to timeout).
+        readline -- Read a line (waits up to timeout).
+        write -- Write bytes.
+        inWaiting -- Bytes available.
+        flushInput -- Discard the received bytes.
+        close -- Does nothing, for compatibility.
+    """
+
+    def __init__(self, rx_pipe, tx_pipe):
+        self._rx = rx_pipe
+        self._tx = tx_pipe
+        self.timeout = None
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def read(self, size=1):
+        data = self._rx.get(size, self.timeout)
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self):
+        data = self._rx.get(1, self.timeout, line=True)
+        self.bytes_read += len(data)
+        return data
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self._tx.put(bytes(data))
+        return len(data)
+
+    def inWaiting(self):
+        return len(self._rx.buffer)
+
+    @property
+    def in_waiting(self):
+        return self.inWaiting()
+
+    def flushInput(self):
+        with self._rx.condition:
+            self._rx.buffer.clear()
+
+    def reset_input_buffer(self):
+        self.flushInput()
+
+    def close(self):
+        pass
+
+
+def create_virtual_serial_pair():
+    """
+    Create an in-process serial port.
+
+    Returns
+    -------
+    pc_port : VirtualSerialPort
+        End used by the simulator (run_sim_sitl).
+    board_port : VirtualSerialPort
+        End used by the VirtualBoard.
+    """
+    pc_to_board = _Pipe()
+    board_to_pc = _Pipe()
+    pc_port = VirtualSerialPort(board_to_pc, pc_to_board)
+    board_port = VirtualSerialPort(pc_to_board, board_to_pc)
+    return pc_port, board_port
+
+
+class PtySerialPort:
+    """
+    Board end of a pseudo terminal, the simulator opens the other end
+    (name) with pyserial as if it was a real board. Only Linux/macOS.
+
+    Methods:
+        read, readline, write, inWaiting, flushInput, close
+    """
+
+    def __init__(self):
+        import pty
+        import tty
+        self._master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.name = os.ttyname(slave)
+        self._slave = slave
+        self._buffer = bytearray()
+        self.timeout = None
+
+    def _fill(self, timeout):
+        import select
+        ready, _, _ = select.select([self._master], [], [], timeout)
+        if ready:
+            self._buffer += os.read(self._master, 4096)
+
+    def _fill_available(self):
+        self._fill(0)
+
+    def read(self, size=1):
+        if self.timeout is None:
+            deadline = None
+        else:
+            deadline = time.perf_counter() + self.timeout
+        while len(self._buffer) < size:
+            if deadline is None:
+                self._fill(None)
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._fill(remaining)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self):
+        if self.timeout is None:
+            deadline = None
+        else:
+            deadline = time.perf_counter() + self.timeout
+        while b"\n" not in self._buffer:
+            if deadline is None:
+                self._fill(None)
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._fill(remaining)
+        if b"\n" in self._buffer:
+            size = self._buffer.index(b"\n") + 1
+        else:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        return os.write(self._master, bytes(data))
+
+    def inWaiting(self):
+        self._fill_available()
+        return len(self._buffer)
+
+    def flushInput(self):
+        self._fill_available()
+        self._buffer.clear()
+
+    def close(self):
+        os.close(self._master)
+        os.close(self._slave)
+
+
+def create_pty_serial_pair():
+    """
+    Create a pseudo terminal.
+
+    Returns
+    -------
+    name : string
+        Device that the simulator opens with serial.Serial(name).
+    board_port : PtySerialPort
+        End used by the VirtualBoard.
+    """
+    board_port = PtySerialPort()
+    return board_port.name, board_port
+
+
+class VirtualBoard:
+    """
+    Runs a program on a thread as if it was the flight computer, with
+    the same protocol as the SITL Arduino library.
+
+    Methods:
+        start -- Start the board (runs setup and then loop).
+        stop -- Stop the board.
+        StartSITL, tick, millis, micros, getSimData, sendCommand -- API of
+            the SITL library, used by the program.
+        get_statistics -- Loops, requests and their latency.
+    """
+
+    def __init__(self, program, serial_port):
+        self.program = program
+        self.serial_port = serial_port
+        self.serial_port.timeout = 0.01
+        self._lockstep = False
+        self._binary = False
+        self._running = False
+        self._thread = None
+        self._t0 = time.perf_counter()
+        self._t_us = 0
+        self._frame_pending = False
+        self._servo = 0.
+        self._parachute = 0
+        self._seq = 0
+        self._rx_seq = 0
+        self._sensors = (0.,) * 6
+        self._parser = sitl_protocol.FrameParser()
+        self.loops = 0
+        self.requests = 0
+        self.requests_answered = 0
+        self.latencies = []
+
+    def start(self):
+        """Start the board, runs setup() and then loop() on a thread."""
+        self._running = True
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the board."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        self.program.setup(self)
+        while self._running is True:
+            self.program.loop(self)
+            self.loops += 1
+            if self._lockstep is False:
+                # The loop of a real board doesn't take zero time, it also
+                # leaves the simulator some CPU
+                time.sleep(0.0001)
+
+    def StartSITL(self, lockstep=False, binary=False):
+        """Start the simulation, same as the SITL library."""
+        self._lockstep = lockstep
+        self._binary = binary
+        time.sleep(0.1)
+        if self._binary is True:
+            self.serial_port.write(sitl_protocol.encode_hello(self._lockstep))
+        elif self._lockstep is True:
+            self.serial_port.write(b"L\r\n")
+        else:
+            self.serial_port.write(b"A\r\n")
+
+    def tick(self):
+        """
+        In lockstep acknowledge the last frame with the last command and
+        wait for the next one. Does nothing in real time.
+        """
+        if self._lockstep is False:
+            return True
+        if self._frame_pending is True:
+            if self._binary is True:
+                frame = sitl_protocol.encode_command(self._rx_seq, self._servo,
+                                                     self._parachute)
+                self.serial_port.write(frame)
+            else:
+                send = "K," + "{:.6f}".format(self._servo) + "," + str(self._parachute) + "\n"
+                self.serial_port.write(send.encode("ASCII"))
+            self._frame_pending = False
+        while self._running is True:
+            if self._binary is True:
+                if self._read_sensor_frame() is True:
+                    self._frame_pending = True
+                    return True
+            else:
+                read = self.serial_port.readline().decode("ASCII", errors="ignore").strip()
+                read_split = read.split(",")
+                if read_split[0] == "S" and len(read_split) >= 6:
+                    self._t_us = int(read_split[1])
+                    self._sensors = tuple(float(e) for e in read_split[2:6]) + (0., 0.)
+                    self._frame_pending = True
+                    return True
+        return False
+
+    def millis(self):
+        """Simulation time in lockstep, board time in real time [ms]."""
+        return self.micros() // 1000
+
+    def micros(self):
+        """Simulation time in lockstep, board time in real time [us]."""
+        if self._lockstep is True:
+            return self._t_us
+        return int((time.perf_counter()-self._t0) * 1000000)
+
+    def _read_sensor_frame(self):
+        data = self.serial_port.read(max(self.serial_port.inWaiting(), 1))
+        found = False
+        for frame_type, seq, values in self._parser.feed(data):
+            if frame_type == sitl_protocol.SENSOR:
+                self._rx_seq = seq
+                self._t_us = values[0]
+                self._sensors = values[1:]
+                found = True
+        return found
+
+    def getSimData(self):
+        """
+        Get the sensors.
+
+        Returns
+        -------
+        gyro, accx, accz, alt, gnss_pos, gnss_vel : floats
+            Readings, the GNSS is zero with the text protocol.
+        """
+        if self._lockstep is True:
+            return self._sensors
+        self.requests += 1
+        t_request = time.perf_counter()
+        deadline = t_request + 0.003
+        if self._binary is True:
+            self._seq = (self._seq+1) & 0xFFFF
+            self.serial_port.write(sitl_protocol.encode_frame(sitl_protocol.REQUEST,
+                                                              self._seq))
+            # Returns as soon as the data arrives, 3 ms at most
+            while time.perf_counter() < deadline:
+                if self._read_sensor_frame() is True:
+                    self.requests_answered += 1
+                    self.latencies.append(time.perf_counter()-t_request)
+                    break
+            return self._sensors
+        self.serial_port.write(b"R\r\n")
+        # Like the library, reads during the whole 3 ms window
+        answered = False
+        while time.perf_counter() < deadline:
+            self.serial_port.timeout = max(deadline-time.perf_counter(), 0)
+            read = self.serial_port.readline().decode("ASCII", errors="ignore").strip()
+            read_split = read.split(",")
+            if len(read_split) >= 4:
+                try:
+                    self._sensors = tuple(float(e) for e in read_split[0:4]) + (0., 0.)
+                except ValueError:
+                    continue
+                if answered is False:
+                    self.latencies.append(time.perf_counter()-t_request)
+                    answered = True
+        self.serial_port.timeout = 0.01
+        if answered is True:
+            self.requests_answered += 1
+        return self._sensors
+
+    def sendCommand(self, servo, parachute):
+        """Send the servo [º] and parachute commands."""
+        self._servo = servo
+        self._parachute = parachute
+        if self._lockstep is True:
+            # Sent with the acknowledge in tick()
+            return
+        if self._binary is True:
+            # The seq of the data it used
+            self.serial_port.write(sitl_protocol.encode_command(self._rx_seq, servo,
+                                                                parachute))
+        else:
+            send = "{:.6f}".format(servo) + "," + str(parachute) + "\n"
+            self.serial_port.write(send.encode("ASCII"))
+
+    def get_statistics(self):
+        """
+        Loops, requests and their latency (real time only).
+
+        Returns
+        -------
+        dict
+            loops, requests, requests_answered, mean_latency and
+            max_latency [s].
+        """
+        if len(self.latencies) > 0:
+            mean_latency = sum(self.latencies) / len(self.latencies)
+            max_latency = max(self.latencies)
+        else:
+            mean_latency = 0.
+            max_latency = 0.
+        return {"loops": self.loops,
+                "requests": self.requests,
+                "requests_answered": self.requests_answered,
+                "mean_latency": mean_latency,
+                "max_latency": max_latency}
+
+
+class ExampleRocketProgram:
+    """
+    Example_Rocket_SITL.ino in Python, a PID with the same structure as
+    the one in the sketch.
+    """
+
+    def __init__(self, lockstep=True, binary=False):
+        self.lockstep = lockstep
+        self.binary = binary
+        self.T_Program = 0.01
+        self.kp = 0.4
+        self.ki = 0.0
+        self.kd = 0.136
+        self.actuator_reduction = 5
+        self.max_servo_angle = 10 * math.pi/180 * self.actuator_reduction
+        self.setpoint = 10 * math.pi/180
+        self.timer_run = 0
+        self.previous_time = 0
+        self.last_error = 0
+        self.cum_error = 0
+        self.theta = 0
+        self.alt_prev = 0
+        self.parachute = 0
+
+    def setup(self, Sim):
+        Sim.StartSITL(self.lockstep, self.binary)
+
+    def loop(self, Sim):
+        Sim.tick()
+        if Sim.micros() >= self.timer_run + self.T_Program*1000000:
+            dt = (Sim.micros()-self.timer_run) / 1000000
+            self.timer_run = Sim.micros()
+            gyro, accx, accz, alt, gnss_pos, gnss_vel = Sim.getSimData()
+            # Integrate the Gyros to find the angle.
+            self.theta += gyro * math.pi/180 * dt
+            out = self.pid(Sim, self.setpoint, self.theta)
+            servo_command = out * self.actuator_reduction
+            servo_command = min(max(servo_command, -self.max_servo_angle),
+                                self.max_servo_angle)
+            if alt > 10 and self.alt_prev > alt:
+                self.parachute = 1
+            self.alt_prev = alt
+            Sim.sendCommand(servo_command * 180/math.pi, self.parachute)
+
+    def pid(self, Sim, setpoint, inp):
+        current_time = Sim.micros()
+        elapsed_time = (current_time-self.previous_time) / 1000000
+        error = setpoint - inp
+        if elapsed_time > 0:
+            rate_error = (error-self.last_error) / elapsed_time
+        else:
+            rate_error = 0
+        self.cum_error += (self.last_error + (error-self.last_error)/2) * elapsed_time
+        self.last_error = error
+        self.previous_time = current_time
+        return self.kp*error + self.ki*self.cum_error + self.kd*rate_error
+
+
+def run_virtual_sitl(filepath, program=None, use_pty=False):
+    """
+    Run the hardware SITL of a save file against a virtual board.
+
+    Parameters
+    ----------
+    filepath : string
+        Path of the save file.
+    program : object, optional
+        Program of the board (setup and loop methods). The default is
+        ExampleRocketProgram().
+    use_pty : bool, optional
+        Connect through a pseudo terminal opened with pyserial instead
+        of the in-process port. The default is False.
+
+    Returns
+    -------
+    dict
+        Statistics of the board.
+    """
+    from src.simulation import main_simulation as sim
+    if program is None:
+        program = ExampleRocketProgram()
+    if use_pty is True:
+        import serial
+        name, board_port = create_pty_serial_pair()
+        pc_port = serial.Serial(name, writeTimeout=0)
+    else:
+        pc_port, board_port = create_virtual_serial_pair()
+    board = VirtualBoard(program, board_port)
+    board.start()
+    try:
+        sim.run_simulation_headless(filepath, pc_port)
+    finally:
+        board.stop()
+        if use_pty is True:
+            pc_port.close()
+            board_port.close()
+    statistics = board.get_statistics()
+    print("Board loops: ", statistics["loops"])
+    if statistics["requests"] > 0:
+        print("Requests answered: {} of {}".format(statistics["requests_answered"],
+                                                  statistics["requests"]))
+        print("Request latency: {:.1f} us mean, {:.1f} us max".format(
+            statistics["mean_latency"]*1e6, statistics["max_latency"]*1e6))
+    return statistics
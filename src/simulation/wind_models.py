@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:41:32 2026
+
+@author: Guido di Pasquo
+"""
+
+
+import csv
+import math
+from pathlib import Path
+import numpy as np
+from scipy import signal
+
+
+"""
+Wind of the simulation, a mean profile that depends on the altitude plus
+turbulence that depends on the time.
+
+Classes:
+    WindModel -- Wind profile and turbulence of a run.
+"""
+
+"""
+Profiles (mean wind at height h above the launch site):
+    constant -- wind.
+    power -- wind * (h/reference_altitude)**exponent.
+    log -- wind * ln(h/roughness) / ln(reference_altitude/roughness).
+    csv -- Interpolated from a file with the columns altitude [m] and
+           wind [m/s], wind scales it (1 leaves it as it is).
+
+Turbulence (horizontal, standard deviation = intensity):
+    steps -- A new random gust every 0.1 s, the original model.
+    dryden -- Dryden lateral spectrum.
+    von_karman -- Von Karman lateral spectrum (rational approximation).
+    none -- No turbulence.
+
+The spectra are in space, they are converted to time with the mean wind
+at the reference altitude (frozen turbulence that the wind carries past
+the launch site). Both the turbulence (for the whole run) and the profile
+(for a range of altitudes) are computed in setup() and stored in tables
+with a uniform step, get_wind() only interpolates.
+"""
+
+
+class WindModel:
+    """
+    Wind profile and turbulence.
+
+    Methods:
+        setup -- Compute the tables of a run.
+        get_wind -- Wind at time t and height h.
+        get_profile -- Mean wind at height h.
+        read_save_file_section -- Model from the save file.
+        get_save_file_section -- Model as it's stored in the save file.
+    """
+
+    profiles = ["constant", "power", "log", "csv"]
+    turbulence_models = ["steps", "dryden", "von_karman", "none"]
+
+    def __init__(self):
+        self.profile = "constant"
+        self.reference_altitude = 10.
+        self.exponent = 1/7
+        self.roughness = 0.03
+        self.csv_path = ""
+        self.turbulence = "steps"
+        self.length_scale = 100.
+        self.max_altitude = 5000.
+        self.altitude_step = 1.
+        self.time_step = 0.01
+        self._profile_table = [0.]
+        self._turbulence_table = [0.]
+        self._turbulence_step = 0.1
+
+    def read_save_file_section(self, section, directory=""):
+        """
+        Set the model from the save file section.
+
+        Parameters
+        ----------
+        section : list
+            Strings "name, value", the names are profile, reference_altitude,
+            exponent, roughness, csv, turbulence and length_scale.
+        directory : string, optional
+            Directory of the save file, the csv is relative to it. The
+            default is "".
+
+        Returns
+        -------
+        None.
+        """
+        for row in section:
+            if row == "":
+                continue
+            row = [e.strip() for e in row.split(",")]
+            try:
+                if row[0] == "profile" and row[1] in self.profiles:
+                    self.profile = row[1]
+                elif row[0] == "turbulence" and row[1] in self.turbulence_models:
+                    self.turbulence = row[1]
+                elif row[0] == "csv":
+                    self.csv_path = str(Path(directory) / row[1])
+                elif row[0] in ("reference_altitude", "exponent", "roughness",
+                                "length_scale"):
+                    setattr(self, row[0], float(row[1]))
+                else:
+                    print("Error Reading the Wind Model: " + ", ".join(row))
+            except (IndexError, ValueError):
+                print("Error Reading the Wind Model: " + ", ".join(row))
+
+    def get_save_file_section(self):
+        """
+        Return the model as it's stored in the save file.
+
+        Returns
+        -------
+        list
+            Strings "name, value".
+        """
+        section = ["profile, " + self.profile,
+                   "reference_altitude, " + str(self.reference_altitude),
+                   "exponent, " + str(self.exponent),
+                   "roughness, " + str(self.roughness),
+                   "turbulence, " + self.turbulence,
+                   "length_scale, " + str(self.length_scale)]
+        if self.csv_path != "":
+            section.append("csv, " + self.csv_path)
+        return section
+
+    def setup(self, wind, intensity, duration, seed=None):
+        """
+        Compute the profile and turbulence tables of a run.
+
+        Parameters
+        ----------
+        wind : float
+            Mean wind at the reference altitude [m/s] (scale of the csv).
+        intensity : float
+            Standard deviation of the turbulence [m/s].
+        duration : float
+            Duration of the run [s].
+        seed : numpy.random.SeedSequence or int, optional
+            Seed of the turbulence. The default is None (random).
+
+        Returns
+        -------
+        None.
+        """
+        self.wind = wind
+        self.intensity = intensity
+        self._setup_profile(wind)
+        rng = np.random.default_rng(seed)
+        self._setup_turbulence(wind, intensity, duration, rng)
+
+    def _profile_function(self, wind, h):
+        if self.profile == "power":
+            return wind * (h/self.reference_altitude)**self.exponent
+        if self.profile == "log":
+            h = np.maximum(h, self.roughness)
+            return (wind * np.log(h/self.roughness)
+                    / np.log(self.reference_altitude/self.roughness))
+        if self.profile == "csv":
+            altitude, speed = self._read_csv()
+            return wind * np.interp(h, altitude, speed)
+        return wind * np.ones_like(h)
+
+    def _read_csv(self):
+        altitude = []
+        speed = []
+        try:
+            with open(self.csv_path, "r", encoding="utf-8") as file:
+                for row in csv.reader(file):
+                    try:
+                        altitude.append(float(row[0]))
+                        speed.append(float(row[1]))
+                    except (ValueError, IndexError):
+                        # Header or empty line
+                        continue
+        except EnvironmentError:
+            print("Error Opening the Wind Profile: " + self.csv_path)
+        if len(altitude) == 0:
+            return np.array([0.]), np.array([1.])
+        order = np.argsort(altitude)
+        return np.array(altitude)[order], np.array(speed)[order]
+
+    def _setup_profile(self, wind):
+        h = np.arange(0, self.max_altitude+self.altitude_step, self.altitude_step)
+        self._profile_table = self._profile_function(wind, h).tolist()
+
+    def _setup_turbulence(self, wind, intensity, duration, rng):
+        if self.turbulence == "none" or intensity == 0:
+            self._turbulence_step = duration + 1
+            self._turbulence_table = [0., 0.]
+            return
+        if self.turbulence == "steps":
+            self._turbulence_step = 0.1
+            n = int(duration/self._turbulence_step) + 2
+            self._turbulence_table = (intensity * rng.standard_normal(n)).tolist()
+            return
+        dt = self.time_step
+        n = int(duration/dt) + 2
+        b, a = self._get_filter(abs(wind), dt)
+        # White noise filtered, scaled so the standard deviation is the
+        # intensity (energy of the impulse response of the filter)
+        tau = self.length_scale / max(abs(wind), 1.)
+        impulse = np.zeros(int(20*tau/dt) + 100)
+        impulse[0] = 1
+        h = signal.lfilter(b, a, impulse)
+        # Starts in steady state, the first part of the series is discarded
+        n_warmup = len(impulse)
+        noise = rng.standard_normal(n + n_warmup)
+        turbulence = signal.lfilter(b, a, noise)[n_warmup:]
+        turbulence *= intensity / np.sqrt(np.sum(h**2))
+        self._turbulence_step = dt
+        self._turbulence_table = turbulence.tolist()
+
+    def _get_filter(self, V, dt):
+        # Spatial spectra converted to time with the speed V, at least 1 m/s
+        V = max(V, 1.)
+        L = self.length_scale
+        if self.turbulence == "dryden":
+            # (1 + 2*sqrt(3)*L/V s) / (1 + 2L/V s)^2
+            num = [2*math.sqrt(3)*L/V, 1]
+            den = np.polymul([2*L/V, 1], [2*L/V, 1])
+        else:
+            # Rational approximation of von Karman's lateral spectrum
+            k = 2*L/V
+            num = [0.3398*k**2, 2.7478*k, 1]
+            den = [0.1539*k**3, 1.9754*k**2, 2.9958*k, 1]
+        b, a, _ = signal.cont2discrete((num, den), dt, method="bilinear")
+        return np.ravel(b), np.ravel(a)
+
+    def get_profile(self, h):
+        """Mean wind at height h above the launch site [m/s]."""
+        x = h / self.altitude_step
+        table = self._profile_table
+        if x <= 0:
+            return table[0]
+        i = int(x)
+        if i >= len(table)-1:
+            return table[-1]
+        return table[i] + (table[i+1]-table[i]) * (x-i)
+
+    def get_wind(self, t, h):
+        """
+        Wind at time t and height h.
+
+        Parameters
+        ----------
+        t : float
+            Time [s].
+        h : float
+            Height above the launch site [m].
+
+        Returns
+        -------
+        float
+            Wind [m/s], positive right to left.
+        """
+        table = self._turbulence_table
+        x = t / self._turbulence_step
+        i = int(x)
+        if i >= len(table)-1:
+            gust = table[-1]
+        elif self.turbulence == "steps":
+            gust = table[i]
+        else:
+            gust = table[i] + (table[i+1]-table[i]) * (x-i)
+        return self.get_profile(h) + gust